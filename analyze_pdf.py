@@ -1,16 +1,29 @@
+import collections
+import functools
+import logging
 import math
+from concurrent.futures import ProcessPoolExecutor
 from pprint import pprint
 import re
-from langchain_openai import ChatOpenAI
+from dataclasses import dataclass
+from flowgraph import FlowGraph
 from langchain_core.documents import Document
 from langchain_ollama import OllamaLLM
+import numpy as np
 import pandas as pd
 import categorize
-from utils import load_pdf, export_to_csv, check_categorized_data, all_pdfs_in_folder, all_csvs_in_folder, load_pdf_as_dataframes, read_csv, count_categories, fmt_sankeymatic
+from manifest import RunManifest
+from memo import file_sha256
+from models import DEFAULT_MODEL, REQUEST_TIMEOUT_SECONDS, create_model
+from pipeline import DEFAULT_QUEUE_SIZE, run_statement_pipeline
+from timing import timed
+from utils import load_pdf, export_to_csv, check_categorized_data, all_pdfs_in_folder, all_csvs_in_folder, load_pdf_as_dataframes, load_pdfs_as_dataframes, read_csv, count_categories, sankey_graph
 from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 def month_name_to_number(month: str) -> str:
     """Converts a month abbreviation (e.g. 'jan') to a date prefix (e.g. '01/')."""
     prefixes = {
@@ -40,10 +53,19 @@ def categorize_pdf_to_csv_v2(pdf_path: str, extract_dataframes: callable, catego
     # print(f'Extracted {len(dataframes)} dataframes')
     transactions = extract_dataframes(dataframes, pdf_path)
     # print(f'Extracted {len(transactions)} transactions from dataframes')
+    categorize_transactions_to_csv(pdf_path, transactions, categorize, model)
+
+
+def categorize_transactions_to_csv(pdf_path: str, transactions: list[list[str]], categorize: callable, model: OllamaLLM) -> str:
     categorized_data = categorize(model, transactions)
+    return write_categorized_csv(pdf_path, categorized_data)
+
+
+def write_categorized_csv(pdf_path: str, categorized_data: list[dict]) -> str:
     check_categorized_data(categorized_data)
     output_csv = pdf_path.replace(".pdf", "_categorized.csv").replace(".PDF", "_categorized.csv")
     export_to_csv(categorized_data, output_csv)
+    return output_csv
 
 
 def get_possible_column(cols: pd.Index, colname: str) -> int | None:
@@ -84,6 +106,11 @@ AMOUNT_COLUMN_CANDIDATES = [
     "Amount",
 ]
 
+# A non-empty Credits cell overrides the amount column (see convert_dfs)
+CREDITS_COLUMN_CANDIDATES = [
+    "Credits",
+]
+
 def first_matching_column_index(cols: pd.Index, candidates: list[str]) -> int | None:
     for candidate in candidates:
         index = get_possible_column(cols, candidate)
@@ -91,22 +118,92 @@ def first_matching_column_index(cols: pd.Index, candidates: list[str]) -> int |
             return index
     return None
 
+
+@dataclass(frozen=True)
+class ColumnRoles:
+    """Position of each column role in a table header; None where no column matches."""
+    date: int | None = None
+    description: int | None = None
+    amount: int | None = None
+    credits: int | None = None
+
+
+class ColumnResolver:
+    """
+    Resolves every column role of a table header at once.
+
+    Gives the same answers as ``first_matching_column_index`` over each role's
+    candidates, but the candidate patterns are compiled once, the header is
+    scanned once for all of them, and results are memoized by header, since
+    Docling repeats the same header on every page of a statement. Labels that
+    are not strings never match a pattern.
+    """
+
+    def __init__(self, roles: dict[str, list[str]], cache_size: int = 256):
+        self.roles = {role: list(candidates) for role, candidates in roles.items()}
+        candidates = dict.fromkeys(candidate for role_candidates in self.roles.values() for candidate in role_candidates)
+        self._patterns = [(candidate, re.compile(candidate)) for candidate in candidates]
+        self._resolve = functools.lru_cache(maxsize=cache_size)(self._resolve_header)
+
+    def resolve(self, cols: pd.Index) -> ColumnRoles:
+        return self._resolve(tuple(cols))
+
+    def _resolve_header(self, labels: tuple) -> ColumnRoles:
+        first_position = {}
+        duplicated = set()
+        first_match = {}
+        for position, label in enumerate(labels):
+            if label in first_position:
+                duplicated.add(label)
+                continue
+            first_position[label] = position
+            if not isinstance(label, str):
+                continue
+            for candidate, pattern in self._patterns:
+                if candidate not in first_match and pattern.search(label):
+                    first_match[candidate] = label
+
+        def locate(candidate: str) -> int | None:
+            # exact label first, then the first label the pattern finds; as
+            # with get_loc, a duplicated label has no single position
+            if candidate in first_position and candidate not in duplicated:
+                return first_position[candidate]
+            if candidate in first_match and first_match[candidate] not in duplicated:
+                return first_position[first_match[candidate]]
+            return None
+
+        def role_position(candidates: list[str]) -> int | None:
+            for candidate in candidates:
+                index = locate(candidate)
+                if index is not None:
+                    return index
+            return None
+
+        return ColumnRoles(**{role: role_position(candidates) for role, candidates in self.roles.items()})
+
+
+column_resolver = ColumnResolver({
+    "date": DATE_COLUMN_CANDIDATES,
+    "description": DESCRIPTION_COLUMN_CANDIDATES,
+    "amount": AMOUNT_COLUMN_CANDIDATES,
+    "credits": CREDITS_COLUMN_CANDIDATES,
+})
+
+
 def description_column_index(df: pd.DataFrame) -> int | None:
-    return first_matching_column_index(df.columns, DESCRIPTION_COLUMN_CANDIDATES)
+    return column_resolver.resolve(df.columns).description
 
 
 def date_column_index(df: pd.DataFrame) -> int | None:
-    return first_matching_column_index(df.columns, DATE_COLUMN_CANDIDATES)
+    return column_resolver.resolve(df.columns).date
 
 
 def amount_column_index(df: pd.DataFrame) -> int | None:
-    return first_matching_column_index(df.columns, AMOUNT_COLUMN_CANDIDATES)
+    return column_resolver.resolve(df.columns).amount
 
 def columns_for_df(df) -> list[int]:
-    date_idx = date_column_index(df)
-    desc_idx = description_column_index(df)
-    amount_idx = amount_column_index(df)
-    return [date_idx, desc_idx, amount_idx]
+    roles = column_resolver.resolve(df.columns)
+    return [roles.date, roles.description, roles.amount]
 
 def is_valid_df(cols: list[int]) -> bool: 
     return len(cols) == 3 and cols[0] is not None and cols[1] is not None and cols[2] is not None
@@ -126,36 +223,41 @@ def parse_money(s):
     return float(cleaned)
 
 
+def parse_money_column(values: pd.Series) -> pd.Series:
+    """Vectorized parse_money: the float value of each money string, NaN for anything else."""
+    try:
+        cleaned = values.str.replace(r'[^\d.-]', '', regex=True)
+    except AttributeError:
+        # .str refuses columns without any strings in them; nothing to parse
+        return pd.Series(math.nan, index=values.index)
+    return pd.to_numeric(cleaned, errors='coerce').astype(float)
+
+
+def is_none_or_empty(values: pd.Series) -> np.ndarray:
+    """Mask of cells that are None or the empty string (NaN is neither)."""
+    return np.equal(values.to_numpy(dtype=object), None) | values.eq("").to_numpy()
+
+
 def convert_dfs(df: pd.DataFrame, cols: list[int]) -> list[list[str]]:
-    to_return = []
-    credits_idx = get_possible_column(df.columns, "Credits")
-
-    for index, row in df.iterrows():
-        try:
-            date = row.iloc[cols[0]]
-            desc = row.iloc[cols[1]]
-            orig_amt = row.iloc[cols[2]]
-            if credits_idx is not None and row.iloc[credits_idx] is not None and row.iloc[credits_idx] != "":
-                orig_amt = row.iloc[credits_idx]
-            amt = math.nan
-            # print(f'Extracted {date}:{desc}:{orig_amt}')
-            if type(orig_amt) == str:
-                amt = parse_money(orig_amt)
-            if math.isnan(amt):
-                # print(f"bad amt {orig_amt}")
-                continue
-            if date is None or date == "":
-                # print(f"empty date: skipping")
-                continue
-            if desc is None or desc == "":
-                # print(f"empty description: skipping")
-                continue
-            to_return.append([date, desc, amt])
-        except IndexError:
-            print(f"bad row {row}")
-            continue
-    return to_return
+    """
+    Extract [date, description, amount] rows from a statement table.
+
+    A non-empty Credits cell takes precedence over the amount column. Rows whose
+    amount is not a parseable money string, or whose date or description is
+    None or empty, are dropped. Works column-wise rather than row by row.
+    """
+    dates = df.iloc[:, cols[0]]
+    descriptions = df.iloc[:, cols[1]]
+    amounts = df.iloc[:, cols[2]]
+    credits_idx = column_resolver.resolve(df.columns).credits
+    if credits_idx is not None:
+        credits = df.iloc[:, credits_idx]
+        amounts = amounts.where(is_none_or_empty(credits), credits)
+    parsed = parse_money_column(amounts)
+    keep = parsed.notna().to_numpy() & ~is_none_or_empty(dates) & ~is_none_or_empty(descriptions)
+    return [list(row) for row in zip(dates[keep].tolist(), descriptions[keep].tolist(), parsed[keep].tolist())]
 
+@timed()
 def extract_dataframes(dataframes: list[pd.DataFrame], origin: str) -> list[str]:
     valid_dataframes = []
     for df in dataframes:
@@ -165,64 +267,134 @@ def extract_dataframes(dataframes: list[pd.DataFrame], origin: str) -> list[str]
             rows = convert_dfs(df, cols)
             valid_dataframes.extend(rows)
         else:
-            print(f'Skipping invalid dataframe in file:{origin} \n{", ".join(str(c) for c in df.columns)}\n')
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Skipping invalid dataframe in file:%s\n%s", origin, ", ".join(str(c) for c in df.columns))
     # print(f'Extracted {len(valid_dataframes)} transactions from dataframes')
     return valid_dataframes
 
-def categorize_all_pdfs_in_folder(pdf_folder: str, pdf_to_csv: callable):
-    print(f'\nReading folder {pdf_folder}\n')
-    pdfs = all_pdfs_in_folder(pdf_folder)
-    for pdf_file in pdfs:
-        pdf_to_csv(pdf_file)
+def extract_pdf_transactions(pdf_path: str) -> list[list[str]]:
+    """Extract the transactions of one statement. Top-level so process pools can pickle it."""
+    return extract_dataframes(load_pdf_as_dataframes(pdf_path), pdf_path)
 
-models = {
-    "gemma2:27b": OllamaLLM(model="gemma2:27b", temperature=0.0, request_timeout=60), # Most accurate free model. Not very fast.
-    "gpt-4": ChatOpenAI(model="gpt-4", temperature=0.0, request_timeout=60), # Works best, but slow & most expensive.
-    "gpt-4o-mini": ChatOpenAI(model="gpt-4o-mini", temperature=0.0, request_timeout=60), # Works slightly faster than gpt-4, less accurate, still costs money
-}
 
-# Main function
-def main(month: str | None = None):
-    # Models. TODO: parameterize this
-    model = models["gemma2:27b"]
-    # First categorize all PDFs
-    # Most LLMs are not really good at directly reading PDFs. We have to extract the data for them.
-    categorize_all_pdfs_in_folder("data/boa_cc", lambda pdf_path: categorize_pdf_to_csv_v2(pdf_path, extract_dataframes, categorize.categorize, model))
-    categorize_all_pdfs_in_folder("data/schwab", lambda pdf_path: categorize_pdf_to_csv_v2(pdf_path, extract_dataframes, categorize.categorize, model))
-    categorize_all_pdfs_in_folder("data/barclays", lambda pdf_path: categorize_pdf_to_csv_v2(pdf_path, extract_dataframes, categorize.categorize, model))
-    categorize_all_pdfs_in_folder("data/paypal", lambda pdf_path: categorize_pdf_to_csv_v2(pdf_path, extract_dataframes, categorize.categorize, model))
+def extract_all_pdfs(pdf_paths: list[str], workers: int = 1) -> list[list[list[str]]]:
+    """
+    Extract the transactions of every statement, returned in the order of ``pdf_paths``.
 
+    Docling extraction is CPU-bound, so with ``workers`` above 1 the statements
+    are spread over a process pool (each worker builds its own converter). With
+    a single worker, uncached statements are converted in one Docling batch.
+    """
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(extract_pdf_transactions, pdf_paths))
+    all_dataframes = load_pdfs_as_dataframes(pdf_paths)
+    return [extract_dataframes(dataframes, pdf_path) for pdf_path, dataframes in zip(pdf_paths, all_dataframes)]
 
-    # then gather all csvs that the pdfs generated
-    csvs = []
-    boa_csvs = all_csvs_in_folder("data/boa_cc")
-    csvs.extend(boa_csvs)
-    schwab_csvs = all_csvs_in_folder("data/schwab")
-    csvs.extend(schwab_csvs)
-    barclays_csvs = all_csvs_in_folder("data/barclays")
-    csvs.extend(barclays_csvs)
-    paypal_csvs = all_csvs_in_folder("data/paypal")
-    csvs.extend(paypal_csvs)
-
-    rollup_csv = []
-    data = {}
-    for csv_file_path in csvs:
+def load_rollup(csv_paths: list[str], month: str | None = None) -> pd.DataFrame:
+    """
+    Concatenate the categorized CSVs into one frame, with a categorical ``source`` column.
+
+    Rows keep the order of ``csv_paths``; with ``month`` set, only rows whose
+    date starts with that month are kept. Returns an empty frame if no rows are left.
+    """
+    frames = []
+    sources = []
+    for csv_file_path in csv_paths:
         csv_data_df = read_csv(csv_file_path)
         if month is not None and 'date' in csv_data_df.columns:
             csv_data_df = csv_data_df[csv_data_df['date'].astype(str).str.startswith(month_name_to_number(month))]
         if csv_data_df.empty:
             continue
-        records = csv_data_df.to_dict('records')
-        for record in records:
-            record['source'] = csv_file_path
-        rollup_csv.extend(records)
-        data = count_categories(csv_data_df, data)
+        # store the source as a small integer code; it becomes a categorical after the concat
+        frames.append(csv_data_df.assign(source=len(sources)))
+        sources.append(csv_file_path)
+    if not frames:
+        return pd.DataFrame()
+    rollup = pd.concat(frames, ignore_index=True)
+    rollup['source'] = pd.Categorical.from_codes(rollup['source'], categories=sources)
+    return rollup
+
+STATEMENT_FOLDERS = ["data/boa_cc", "data/schwab", "data/barclays", "data/paypal"]
+
+
+def rollup_diagram(folders: list[str], month: str | None = None) -> tuple[pd.DataFrame, FlowGraph]:
+    """The rollup of every categorized CSV in ``folders`` and its Sankey flow graph."""
+    csvs = [csv for folder in folders for csv in all_csvs_in_folder(folder)]
+    # one frame for the whole rollup, aggregated in a single pass
+    rollup = load_rollup(csvs, month)
+    data = count_categories(rollup, {}) if not rollup.empty else {}
+    return rollup, sankey_graph(data)
+
+
+# Main function
+def main(month: str | None = None, concurrency: int = 1, workers: int = 1, force: bool = False, similarity_threshold: float | None = categorize.DEFAULT_SIMILARITY_THRESHOLD, pipeline: bool = False, queue_size: int = DEFAULT_QUEUE_SIZE, batch_size: int = 1, model_name: str = DEFAULT_MODEL, on_diagram: callable = None):
+    # The client is built here, not at import; see models.MODEL_FACTORIES for the choices
+    model = create_model(model_name, REQUEST_TIMEOUT_SECONDS)
+    # concurrency > 1 resolves uncached descriptions through a bounded pool of LLM calls
+    # near duplicates of already-categorized descriptions reuse their category; None always asks the LLM
+    # batch_size > 1 sends that many uncached descriptions per LLM request
+    categorize_transactions = functools.partial(categorize.categorize, max_concurrency=concurrency, request_timeout=REQUEST_TIMEOUT_SECONDS, max_retries=2, similarity_threshold=similarity_threshold, batch_size=batch_size)
+    # First categorize all PDFs
+    # Most LLMs are not really good at directly reading PDFs. We have to extract the data for them.
+    # Extraction for every folder runs first (in a process pool when workers > 1);
+    # categorization then runs here, in order, so only this process writes the LLM cache.
+    # With pipeline set, the stages overlap instead, still categorizing in order
+    # on a single thread.
+    # Statements whose CSV was already built from the same PDF contents, prompt
+    # and model are skipped unless force is set.
+    # on_diagram, if given, is called with the FlowGraph of the folders finished
+    # so far: first for the folders that are already up to date, then each time
+    # a folder's last statement is written.
+    pdf_folders = {pdf: folder for folder in STATEMENT_FOLDERS for pdf in all_pdfs_in_folder(folder)}
+    pdfs = list(pdf_folders)
+    fingerprint = categorize.prompt_fingerprint(model_name)
+    run_manifest = RunManifest()
+    pdf_hashes = {pdf: file_sha256(pdf) for pdf in pdfs}
+    stale_pdfs = [pdf for pdf in pdfs if force or not run_manifest.is_up_to_date(pdf, pdf_hashes[pdf], fingerprint)]
+    print(f'\nExtracting {len(stale_pdfs)} of {len(pdfs)} statements from {", ".join(STATEMENT_FOLDERS)} with {workers} worker(s)'
+          f' ({len(pdfs) - len(stale_pdfs)} up to date)\n')
+    categorize.reset_stats()
+    statements_left = collections.Counter(pdf_folders[pdf] for pdf in stale_pdfs)
+
+    def publish_finished_folders():
+        if on_diagram is not None:
+            finished = [folder for folder in STATEMENT_FOLDERS if statements_left[folder] == 0]
+            if finished:
+                on_diagram(rollup_diagram(finished, month)[1])
+
+    def statement_written(pdf_path):
+        folder = pdf_folders[pdf_path]
+        statements_left[folder] -= 1
+        if statements_left[folder] == 0:
+            publish_finished_folders()
+
+    publish_finished_folders()
+    if pipeline:
+        # overlap extraction, categorization and CSV writing across statements
+        def write(pdf_path, categorized_data):
+            output_csv = write_categorized_csv(pdf_path, categorized_data)
+            run_manifest.record(pdf_path, pdf_hashes[pdf_path], fingerprint, output_csv)
+            statement_written(pdf_path)
+        pipeline_stats = run_statement_pipeline(stale_pdfs, extract_pdf_transactions, functools.partial(categorize_transactions, model), write, workers, queue_size)
+        print(pipeline_stats.summary())
+    else:
+        extracted = extract_all_pdfs(stale_pdfs, workers)
+        for pdf_path, transactions in zip(stale_pdfs, extracted):
+            output_csv = categorize_transactions_to_csv(pdf_path, transactions, categorize_transactions, model)
+            run_manifest.record(pdf_path, pdf_hashes[pdf_path], fingerprint, output_csv)
+            statement_written(pdf_path)
+    print(categorize.stats.summary())
+
+
+    # then gather all csvs that the pdfs generated
+    rollup, graph = rollup_diagram(STATEMENT_FOLDERS, month)
     rollup_filename = f"rollup_{month}.csv" if month else "rollup.csv"
-    export_to_csv(rollup_csv, rollup_filename)
-    print(f"Wrote {len(rollup_csv)} transactions to {rollup_filename}")
+    export_to_csv(rollup, rollup_filename)
+    print(f"Wrote {len(rollup)} transactions to {rollup_filename}")
     print("\n")
     # ouput sankeymatic for copying
-    sankey = fmt_sankeymatic(data)
+    sankey = graph.to_text()
     print(sankey)
     return sankey
 
@@ -0,0 +1,83 @@
+"""Benchmark: analyze_pdf.convert_dfs versus the previous iterrows loop.
+
+Builds a synthetic Schwab-style table (Date Posted / Description / Debits /
+Credits, with blank and malformed cells mixed in), checks both versions return
+the same rows, and times them.
+
+Run with: uv run python benchmarks/bench_convert_dfs.py --rows 100000
+"""
+import argparse
+import math
+import random
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from analyze_pdf import columns_for_df, convert_dfs, get_possible_column, parse_money  # noqa: E402
+
+
+def convert_dfs_iterrows(df: pd.DataFrame, cols: list[int]) -> list[list[str]]:
+    """The row-by-row implementation convert_dfs replaced, kept as the baseline."""
+    to_return = []
+    credits_idx = get_possible_column(df.columns, "Credits")
+    for _, row in df.iterrows():
+        date = row.iloc[cols[0]]
+        desc = row.iloc[cols[1]]
+        orig_amt = row.iloc[cols[2]]
+        if credits_idx is not None and row.iloc[credits_idx] is not None and row.iloc[credits_idx] != "":
+            orig_amt = row.iloc[credits_idx]
+        amt = math.nan
+        if type(orig_amt) == str:
+            amt = parse_money(orig_amt)
+        if math.isnan(amt):
+            continue
+        if date is None or date == "":
+            continue
+        if desc is None or desc == "":
+            continue
+        to_return.append([date, desc, amt])
+    return to_return
+
+
+def synthetic_table(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = random.Random(seed)
+    dates, descriptions, debits, credits = [], [], [], []
+    for i in range(rows):
+        dates.append("" if rng.random() < 0.02 else f"{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}")
+        descriptions.append("" if rng.random() < 0.02 else f"MERCHANT {rng.randint(1, 5000)} #{i}")
+        is_credit = rng.random() < 0.2
+        amount = f"${rng.randint(1, 5000):,}.{rng.randint(0, 99):02d}"
+        debits.append("" if is_credit else (amount if rng.random() > 0.03 else "N/A"))
+        credits.append(amount if is_credit else "")
+    return pd.DataFrame({"Date Posted": dates, "Description": descriptions, "Debits": debits, "Credits": credits})
+
+
+def timed(fn, *args) -> tuple[float, object]:
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    df = synthetic_table(args.rows)
+    cols = columns_for_df(df)
+    baseline_s, expected = timed(convert_dfs_iterrows, df, cols)
+    vectorized_s, actual = timed(convert_dfs, df, cols)
+    if actual != expected:
+        sys.exit("convert_dfs and the iterrows baseline disagree")
+
+    print(f"{args.rows} rows, {len(actual)} transactions kept")
+    print(f"iterrows baseline:  {baseline_s * 1000:10.1f} ms")
+    print(f"convert_dfs:        {vectorized_s * 1000:10.1f} ms  ({baseline_s / vectorized_s:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
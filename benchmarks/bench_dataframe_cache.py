@@ -0,0 +1,71 @@
+"""Benchmark: cost of a dataframe cache hit, legacy JSON versus pickled blob.
+
+The legacy cache stored each statement's tables as a JSON string nested in a
+JSON document, so a hit paid for two JSON parses plus DataFrame construction.
+The content-addressed cache reads one pickle per statement.
+
+Run with: uv run python benchmarks/bench_dataframe_cache.py
+"""
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from memo import DataframeBlobCache  # noqa: E402
+
+
+def synthetic_statement(tables: int, rows: int) -> list[pd.DataFrame]:
+    return [
+        pd.DataFrame({
+            "Date Posted": [f"01/{r % 28 + 1:02d}" for r in range(rows)],
+            "Description": [f"MERCHANT {t}-{r}" for r in range(rows)],
+            "Amount": [f"-{r % 500}.{r % 100:02d}" for r in range(rows)],
+        })
+        for t in range(tables)
+    ]
+
+
+def median_ms(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tables", type=int, default=6)
+    parser.add_argument("--rows", type=int, default=500, help="rows per table")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    dataframes = synthetic_statement(args.tables, args.rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = Path(tmp) / "legacy.json"
+        legacy_path.write_text(json.dumps({"statement.pdf": json.dumps([df.to_dict(orient="records") for df in dataframes])}))
+        blobs = DataframeBlobCache(Path(tmp) / "blobs")
+        blobs.put("digest", dataframes)
+
+        def legacy_hit():
+            document = json.loads(legacy_path.read_text())
+            return [pd.DataFrame(data) for data in json.loads(document["statement.pdf"])]
+
+        legacy = median_ms(legacy_hit, args.repeat)
+        blob = median_ms(lambda: blobs.get("digest"), args.repeat)
+
+    print(f"{args.tables} tables x {args.rows} rows per statement")
+    print(f"legacy JSON hit:   median {legacy:8.2f} ms")
+    print(f"pickled blob hit:  median {blob:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
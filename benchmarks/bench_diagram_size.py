@@ -0,0 +1,157 @@
+"""Benchmark: serve_frontend.compute_diagram_size versus the previous BFS on 10k-flow diagrams.
+
+Generates three diagram shapes with ``--flows`` flows each:
+
+* ``budget`` — what fmt_sankeymatic emits: income into Budget, Budget into
+  categories, categories into sub-categories;
+* ``layered`` — a wide DAG, every node flowing into a few nodes of the next
+  layers, so there are many parallel paths of different lengths;
+* ``diamonds`` — a chain of diamonds, each node flowing into the next both
+  directly and through a side node: the bad case for the previous BFS, which
+  re-queued a node (and everything after it) each time it found a longer path
+  to it, so its time grows with the square of the chain length.
+
+Each is sized cold (cache cleared) and warm (same text again), and checked to
+give the same size as the baseline. The baseline is skipped on shapes where it
+needs more than ``--baseline-limit`` seconds for the smaller probe diagram.
+
+Run with: uv run python benchmarks/bench_diagram_size.py --flows 10000
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import serve_frontend  # noqa: E402
+from serve_frontend import compute_diagram_size  # noqa: E402
+
+
+def compute_diagram_size_bfs(diagram: str) -> tuple[int, int]:
+    """The implementation compute_diagram_size replaced, kept as the baseline."""
+    flow_re = re.compile(
+        r"^([^/'\[\n][^\[\n]*?)\s+\[(\d+(?:\.\d+)?)\]\s+([^\n#]+)",
+        re.MULTILINE,
+    )
+    incoming: dict[str, float] = {}
+    outgoing: dict[str, float] = {}
+    adj: dict[str, list[str]] = defaultdict(list)
+    for m in flow_re.finditer(diagram):
+        src = m.group(1).strip()
+        amt = float(m.group(2))
+        tgt = m.group(3).strip()
+        outgoing[src] = outgoing.get(src, 0) + amt
+        incoming[tgt] = incoming.get(tgt, 0) + amt
+        adj[src].append(tgt)
+    all_nodes = set(incoming) | set(outgoing)
+    if not all_nodes:
+        return 1200, 800
+    origins = [n for n in all_nodes if n not in incoming]
+    stages: dict[str, int] = {n: 0 for n in origins}
+    queue = list(origins)
+    head = 0
+    while head < len(queue):
+        node = queue[head]
+        head += 1
+        for neighbor in adj.get(node, []):
+            new_stage = stages[node] + 1
+            if stages.get(neighbor, -1) < new_stage:
+                stages[neighbor] = new_stage
+                queue.append(neighbor)
+    for n in all_nodes:
+        if n not in stages:
+            stages[n] = 0
+    num_columns = max(stages.values()) + 1
+    by_column: dict[int, list[float]] = defaultdict(list)
+    for node in all_nodes:
+        by_column[stages[node]].append(max(incoming.get(node, 0.0), outgoing.get(node, 0.0)))
+    all_vals = [v for vals in by_column.values() for v in vals if v > 0]
+    min_val = min(all_vals) if all_vals else 1.0
+    max_col_needed = max(10 * sum(vals) / min_val + max(0, len(vals) - 1) * 8 for vals in by_column.values())
+    height = int(min(2000, max(600, max_col_needed + 18 + 20 + 50)))
+    width = int((num_columns - 1) * 200 + 9 + 12 + 12 + 50)
+    return max(400, width), max(300, height)
+
+
+def budget_diagram(flows: int, rng: random.Random) -> str:
+    lines = [f"Income {i} [{rng.randint(1000, 5000)}] Budget" for i in range(5)]
+    categories = max(1, flows // 20)
+    lines += [f"Budget [{rng.randint(100, 2000)}] Category {c}" for c in range(categories)]
+    while len(lines) < flows:
+        c = rng.randrange(categories)
+        lines.append(f"Category {c} [{rng.randint(1, 300)}] Category {c} item {len(lines)}")
+    return "\n".join(lines)
+
+
+def layered_diagram(flows: int, rng: random.Random) -> str:
+    width, fan_out = 50, 4
+    layers = max(2, flows // (width * fan_out) + 1)
+    lines = []
+    while len(lines) < flows:
+        layer = rng.randrange(layers - 1)
+        target_layer = min(layers - 1, layer + rng.choice([1, 1, 2, 3]))
+        lines.append(f"L{layer} N{rng.randrange(width)} [{rng.randint(1, 500)}] L{target_layer} N{rng.randrange(width)}")
+    return "\n".join(lines)
+
+
+def diamonds_diagram(flows: int, rng: random.Random) -> str:
+    lines = []
+    for i in range(max(1, flows // 3)):
+        amount = rng.randint(1, 500)
+        lines += [f"Step {i} [{amount}] Step {i + 1}", f"Step {i} [{amount}] Side {i}", f"Side {i} [{amount}] Step {i + 1}"]
+    return "\n".join(lines)
+
+
+SHAPES = {"budget": budget_diagram, "layered": layered_diagram, "diamonds": diamonds_diagram}
+
+
+def best_of(fn, text: str, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def cold(text: str) -> tuple[int, int]:
+    serve_frontend._size_cache.clear()
+    return compute_diagram_size(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--flows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline-limit", type=float, default=2.0, help="Seconds the baseline may take on a 1/10-size probe before it is skipped")
+    args = parser.parse_args()
+
+    print(f"{'shape':<10} {'flows':>7} {'baseline ms':>12} {'cold ms':>10} {'warm ms':>10}")
+    for name, make_diagram in SHAPES.items():
+        text = make_diagram(args.flows, random.Random(0))
+        probe = make_diagram(max(1, args.flows // 10), random.Random(0))
+        start = time.perf_counter()
+        compute_diagram_size_bfs(probe)
+        baseline = "skipped"
+        if time.perf_counter() - start < args.baseline_limit:
+            start = time.perf_counter()
+            expected = compute_diagram_size_bfs(text)
+            seconds = time.perf_counter() - start
+            if cold(text) != expected:
+                raise SystemExit(f"{name}: sizes differ, {cold(text)} != {expected}")
+            # A baseline slower than a second is timed once
+            if seconds < 1:
+                seconds = best_of(compute_diagram_size_bfs, text, args.repeat)
+            baseline = f"{seconds * 1000:.2f}"
+        cold_ms = best_of(cold, text, args.repeat) * 1000
+        compute_diagram_size(text)
+        warm_ms = best_of(compute_diagram_size, text, args.repeat) * 1000
+        print(f"{name:<10} {text.count(chr(10)) + 1:>7} {baseline:>12} {cold_ms:>10.2f} {warm_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Benchmark: per-file Docling conversion time, fresh converter versus shared.
+
+Before the converter was shared, ``load_pdf_as_dataframes`` built a new
+``DocumentConverter`` for every PDF and paid for loading Docling's layout and
+table models each time. This converts the same statements three ways:
+
+* fresh   -- a new converter per file (the old behaviour);
+* shared  -- one converter reused for every file;
+* batch   -- one converter, all files passed to ``convert_all``.
+
+It needs the full dependency set (``uv sync``) and real statements; by default
+it uses every PDF under ``data/``. The memo cache is bypassed.
+
+Run with: uv run python benchmarks/bench_docling_converter.py [PDF ...]
+"""
+import argparse
+import glob
+import statistics
+import time
+
+from docling.document_converter import DocumentConverter
+
+
+def time_fresh(pdfs: list[str]) -> list[float]:
+    timings = []
+    for pdf in pdfs:
+        start = time.perf_counter()
+        DocumentConverter().convert(pdf)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def time_shared(pdfs: list[str]) -> list[float]:
+    converter = DocumentConverter()
+    timings = []
+    for pdf in pdfs:
+        start = time.perf_counter()
+        converter.convert(pdf)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def time_batch(pdfs: list[str]) -> float:
+    start = time.perf_counter()
+    for _ in DocumentConverter().convert_all(pdfs):
+        pass
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdfs", nargs="*", help="statements to convert (default: data/*/*.pdf)")
+    args = parser.parse_args()
+    pdfs = args.pdfs or sorted(glob.glob("data/*/*.pdf") + glob.glob("data/*/*.PDF"))
+    if not pdfs:
+        parser.error("no PDFs given and none found under data/")
+
+    fresh = time_fresh(pdfs)
+    shared = time_shared(pdfs)
+    batch = time_batch(pdfs)
+
+    print(f"{len(pdfs)} files")
+    print(f"fresh converter per file:  {sum(fresh):8.2f} s total, median {statistics.median(fresh):6.2f} s/file")
+    print(f"shared converter:          {sum(shared):8.2f} s total, median {statistics.median(shared):6.2f} s/file")
+    print(f"shared, convert_all:       {batch:8.2f} s total, mean   {batch / len(pdfs):6.2f} s/file")
+
+
+if __name__ == "__main__":
+    main()
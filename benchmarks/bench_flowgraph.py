@@ -0,0 +1,145 @@
+"""Benchmark: rendering a budget through FlowGraph versus the previous text passes.
+
+The previous render built the diagram text with ``+=``, re-parsed it with
+sort_budget's regex, re-serialized it, and compute_diagram_size parsed the
+result a third time. Now fmt_sankeymatic builds a FlowGraph, sort_budget orders
+it, and the graph is sized directly and serialized once. Both renders are run on
+synthetic category totals with ``--categories`` sub-categories (integer
+amounts, which the old regex handled) and checked to produce the same text and
+size.
+
+Run with: uv run python benchmarks/bench_flowgraph.py --categories 100 1000 10000
+"""
+import argparse
+import logging
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from flowgraph import FlowGraph  # noqa: E402
+from serve_frontend import diagram_size  # noqa: E402
+from utils import INCOME_CATEGORIES, fmt_capitalize, sankey_graph  # noqa: E402
+
+
+def sort_budget_text(budget_data: str, meta: dict) -> str:
+    """sort_budget as it was, re-parsing the text with a regex; kept as the baseline."""
+    pattern = re.compile(r"(\w+(?: \w+)*) \[(\d+)\](?: (\w+))?")
+    parsed_data = [(match.group(1), int(match.group(2)), match.group(3) or "") for match in pattern.finditer(budget_data)]
+    sorted_budget = sorted(parsed_data, key=lambda x: meta[x[0]] if x[0] in meta else f"{x[0]} {x[1]}")
+    result = ""
+    for item in sorted_budget:
+        if item[1] == 0:
+            continue
+        if item[0] == 'Overbudget' or item[2] == 'Savings':
+            continue
+        result += f"{fmt_capitalize(item[0])} [{item[1]}] {fmt_capitalize(item[2])}\n"
+    for item in sorted_budget:
+        if item[0] == 'Overbudget' or item[2] == 'Savings':
+            result += f"{fmt_capitalize(item[0])} [{item[1]}] {fmt_capitalize(item[2])}\n"
+            break
+    return result
+
+
+def fmt_sankeymatic_text(data: dict) -> str:
+    """fmt_sankeymatic as it was, building text with += before sort_budget_text; kept as the baseline."""
+    wages_total = 0
+    total_expenses = 0
+    data = dict(data)
+    subcategories = data.pop('_map', {})
+    expense_sub_totals = {}
+    for sub, parent in subcategories.items():
+        if parent not in INCOME_CATEGORIES and sub in data:
+            expense_sub_totals[parent] = expense_sub_totals.get(parent, 0) + data[sub]
+    sankeymatic_str = ""
+    for category, amount in data.items():
+        if category in subcategories:
+            continue
+        if category in INCOME_CATEGORIES and amount != 0:
+            wages_total += amount
+            if fmt_capitalize(category) != "Wages":
+                sankeymatic_str += f"{category} [{amount}] Wages\n"
+        else:
+            if amount <= 0:
+                continue
+            effective = expense_sub_totals.get(category, amount)
+            total_expenses += effective
+            sankeymatic_str += f"Budget [{effective}] {category}\n"
+    sankeymatic_str += "\n\n # TOTALS"
+    sankeymatic_str += f"\nWages [{wages_total}] Budget\n"
+    if total_expenses > wages_total:
+        sankeymatic_str += f"\nBudget [{total_expenses - wages_total}] Overspending\n"
+    if total_expenses < wages_total:
+        sankeymatic_str += f"\nBudget [{wages_total - total_expenses}] Savings\n"
+    for subcategory, category in subcategories.items():
+        if subcategory in data and data[subcategory] != 0:
+            if category in INCOME_CATEGORIES:
+                sankeymatic_str += f"\n{subcategory} [{data[subcategory]}] {category}\n"
+            else:
+                sankeymatic_str += f"\n{category} [{data[subcategory]}] {subcategory}\n"
+    for parent, sub_total in expense_sub_totals.items():
+        if parent in data:
+            direct = data[parent] - sub_total
+            if direct > 0:
+                sankeymatic_str += f"\n{parent} [{direct}] {parent}_DIRECT\n"
+    return sort_budget_text(sankeymatic_str, subcategories)
+
+
+def synthetic_totals(categories: int, seed: int = 0) -> dict:
+    """Category totals shaped like count_categories output: parents with sub-categories, plus income."""
+    rng = random.Random(seed)
+    data = {"_map": {}, "WAGES": 0}
+    parents = [f"PARENT_{i}" for i in range(max(1, categories // 20))]
+    for i in range(categories):
+        parent = rng.choice(parents)
+        sub = f"{parent}_ITEM_{i}"
+        amount = rng.randint(1, 500)
+        data[parent] = data.get(parent, 0) + amount + rng.randint(0, 20)
+        data[sub] = amount
+        data["_map"][sub] = parent
+    data["WAGES"] = int(sum(data[parent] for parent in parents) * 1.1)
+    return data
+
+
+def render_text(data: dict) -> tuple[str, tuple[int, int]]:
+    text = fmt_sankeymatic_text(data)
+    return text, diagram_size(FlowGraph.parse(text))
+
+
+def render_graph(data: dict) -> tuple[str, tuple[int, int]]:
+    graph = sankey_graph(data)
+    return graph.to_text(), diagram_size(graph)
+
+
+def best_of(fn, data: dict, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(data)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--categories", type=int, nargs="+", default=[100, 1_000, 10_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    # the per-category debug and zero-value messages are not part of the render cost
+    logging.disable(logging.WARNING)
+
+    print(f"{'categories':>10} {'text passes ms':>15} {'flow graph ms':>14} {'speedup':>8}")
+    for categories in args.categories:
+        data = synthetic_totals(categories)
+        if render_text(data) != render_graph(data):
+            raise SystemExit(f"renders differ at {categories} categories")
+        before = best_of(render_text, data, args.repeat)
+        after = best_of(render_graph, data, args.repeat)
+        print(f"{categories:>10} {before * 1000:>15.2f} {after * 1000:>14.2f} {before / after:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Benchmark: the frontend server under concurrent local clients.
+
+Serves ``frontend/build`` with the previous single-threaded
+``SimpleHTTPRequestHandler`` and with ``serve_frontend.make_server``, and lets
+``--clients`` threads fetch the page and its assets over keep-alive
+connections, as a browser loading the diagram would. The first pass of each
+client is a cold load; later passes revalidate with ``If-None-Match`` the way
+a browser reload does. Reports requests per second and bytes on the wire.
+
+Run with: uv run python benchmarks/bench_frontend_server.py --clients 16
+"""
+import argparse
+import functools
+import http.client
+import http.server
+import socketserver
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from serve_frontend import DIRECTORY, make_server  # noqa: E402
+
+PATHS = ["/", "/build.css", "/constants.js", "/lz-string.min.js", "/sankey.js", "/sankeymatic.js"]
+
+
+class QuietSimpleHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def start(server) -> threading.Thread:
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return thread
+
+
+def client(port: int, passes: int, paths: list[str], totals: dict, lock: threading.Lock) -> None:
+    etags: dict[str, str] = {}
+    requests = transferred = 0
+    connection = http.client.HTTPConnection("localhost", port, timeout=30)
+    for _ in range(passes):
+        for path in paths:
+            headers = {"Accept-Encoding": "br, gzip"}
+            if path in etags:
+                headers["If-None-Match"] = etags[path]
+            try:
+                connection.request("GET", path, headers=headers)
+                response = connection.getresponse()
+            except (http.client.HTTPException, OSError):
+                # HTTP/1.0 servers close after every response
+                connection.close()
+                connection = http.client.HTTPConnection("localhost", port, timeout=30)
+                connection.request("GET", path, headers=headers)
+                response = connection.getresponse()
+            transferred += len(response.read())
+            requests += 1
+            if response.getheader("ETag"):
+                etags[path] = response.getheader("ETag")
+            if response.getheader("Connection", "").lower() == "close" or response.version == 10:
+                connection.close()
+                connection = http.client.HTTPConnection("localhost", port, timeout=30)
+    connection.close()
+    with lock:
+        totals["requests"] += requests
+        totals["bytes"] += transferred
+
+
+def run_load(port: int, clients: int, passes: int, paths: list[str]) -> tuple[float, dict]:
+    totals = {"requests": 0, "bytes": 0}
+    lock = threading.Lock()
+    threads = [threading.Thread(target=client, args=(port, passes, paths, totals, lock)) for _ in range(clients)]
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start_time, totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--passes", type=int, default=20, help="Page loads per client; all but the first revalidate")
+    args = parser.parse_args()
+
+    paths = [path for path in PATHS if path == "/" or (Path(DIRECTORY) / path.lstrip("/")).is_file()]
+    print(f"{args.clients} clients x {args.passes} loads of {', '.join(paths)}")
+
+    simple_handler = functools.partial(QuietSimpleHandler, directory=DIRECTORY)
+    servers = {
+        "SimpleHTTPRequestHandler (before)": socketserver.TCPServer(("localhost", 0), simple_handler),
+        "make_server (threaded, in memory)": make_server(0),
+    }
+    for name, server in servers.items():
+        start(server)
+        port = server.server_address[1]
+        run_load(port, 1, 1, paths)  # warm up: load and compress the assets
+        seconds, totals = run_load(port, args.clients, args.passes, paths)
+        server.shutdown()
+        server.server_close()
+        print(f"{name:<36} {totals['requests'] / seconds:9.0f} req/s  {totals['bytes'] / 1e6:9.2f} MB transferred  ({seconds:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
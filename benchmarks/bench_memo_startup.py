@@ -0,0 +1,86 @@
+"""Benchmark: cost of importing memo.py with large cache files on disk.
+
+Writes a synthetic description cache and dataframe cache (tens of MB, the
+size a few years of statements produce) into a scratch directory, then times
+in fresh interpreters:
+
+* ``import memo`` -- what every ``main.py`` start pays now that the caches are
+  opened lazily;
+* ``import memo`` plus the first cache lookups -- what the import used to cost
+  when both files were ``json.load``-ed eagerly.
+
+Run with: uv run python benchmarks/bench_memo_startup.py
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# pandas is imported before the timer starts: every entry point imports it
+# anyway, and its import time would otherwise swamp the numbers.
+_TIMED_IMPORT = """
+import time
+import pandas
+start = time.perf_counter()
+import memo
+{touch}
+print(time.perf_counter() - start)
+"""
+
+_TOUCH_CACHES = """
+memo.memoized_description_data.get("__warmup__")
+memo.memoized_df_data.get("__warmup__")
+"""
+
+
+def write_synthetic_caches(folder: Path, descriptions: int, statements: int, rows_per_statement: int) -> None:
+    description_data = {f"MERCHANT {i} STORE #{i % 997}": "FOOD" for i in range(descriptions)}
+    (folder / "memoized_descriptions_to_categories.json").write_text(json.dumps(description_data, indent=4))
+    df_data = {}
+    for s in range(statements):
+        table = [
+            {"Date Posted": f"01/{r % 28 + 1:02d}", "Description": f"MERCHANT {r}", "Amount": f"-{r % 500}.00"}
+            for r in range(rows_per_statement)
+        ]
+        df_data[f"data/boa_cc/statement_{s}.pdf"] = json.dumps([table])
+    (folder / "memoized_files_to_dataframes.json").write_text(json.dumps(df_data, indent=4))
+
+
+def time_import(folder: Path, touch: str, repeat: int) -> list[float]:
+    env = dict(os.environ, PYTHONPATH=str(REPO_ROOT), MEMO_BACKEND="json")
+    code = _TIMED_IMPORT.format(touch=touch)
+    timings = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", code], cwd=folder, env=env, check=True, capture_output=True, text=True)
+        timings.append(float(out.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--descriptions", type=int, default=20_000)
+    parser.add_argument("--statements", type=int, default=60)
+    parser.add_argument("--rows", type=int, default=2_000, help="rows per synthetic statement")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp)
+        write_synthetic_caches(folder, args.descriptions, args.statements, args.rows)
+        size_mb = sum(f.stat().st_size for f in folder.iterdir()) / 1e6
+        lazy = time_import(folder, "", args.repeat)
+        eager = time_import(folder, _TOUCH_CACHES, args.repeat)
+
+    print(f"cache files on disk: {size_mb:.1f} MB")
+    print(f"import memo (lazy):             median {statistics.median(lazy) * 1000:8.2f} ms")
+    print(f"import memo + load caches:      median {statistics.median(eager) * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Benchmark: nearest-neighbour lookup latency as the categorized cache grows.
+
+Fills a scratch ``NeighbourIndex`` with synthetic merchant descriptions (a few
+thousand merchant names, each seen with several store suffixes) and times
+``lookup`` for near-duplicate and unknown descriptions at each size. Lookups
+should stay well under a millisecond at 100k entries.
+
+Run with: uv run python benchmarks/bench_neighbours.py
+"""
+import argparse
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from neighbours import NeighbourIndex  # noqa: E402
+
+SUFFIXES = ["STORE", "STORES", "INC", "LLC", "MARKET", "BOSTON MA", "ONLINE", "CAFE"]
+
+
+def synthetic_descriptions(count: int, rng: random.Random) -> list[tuple[str, str]]:
+    items = []
+    while len(items) < count:
+        name = " ".join("".join(rng.choices(string.ascii_uppercase, k=rng.randint(3, 9))) for _ in range(rng.randint(1, 3)))
+        category = rng.choice(["FOOD", "GAS", "TRAVEL", "SHOPPING", "SUBSCRIPTION"])
+        items.extend((f"{name} {suffix}", category) for suffix in rng.sample(SUFFIXES, 3))
+    return items[:count]
+
+
+def time_lookups(index: NeighbourIndex, queries: list[str]) -> list[float]:
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        index.lookup(query)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=1_000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as scratch:
+        index = NeighbourIndex(Path(scratch) / "neighbours.sqlite3")
+        indexed = []
+        for size in sorted(args.sizes):
+            start = time.perf_counter()
+            new_items = synthetic_descriptions(size - len(indexed), rng)
+            index.add_many(new_items)
+            indexed.extend(new_items)
+            build = time.perf_counter() - start
+            near = [f"{description}S" for description, _ in rng.sample(indexed, min(args.queries, len(indexed)))]
+            unknown = [description for description, _ in synthetic_descriptions(args.queries, rng)]
+            for label, queries in (("near duplicate", near), ("unknown", unknown)):
+                timings = time_lookups(index, queries)
+                print(f"{len(index):>7} entries, {label:>14}: median {statistics.median(timings) * 1e6:7.1f} us, "
+                      f"p95 {statistics.quantiles(timings, n=20)[-1] * 1e6:7.1f} us")
+            print(f"{'':>7} indexed {len(new_items)} entries in {build:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Benchmark suite: the data-path hot spots on synthetic statements, as JSON.
+
+Times, at each size:
+
+* ``convert_dfs`` on a synthetic table in every bank layout (see synthetic.py);
+* ``count_categories`` on a categorized rollup;
+* ``fmt_sankeymatic`` and ``compute_diagram_size`` on the resulting diagram;
+* description cache lookups and writes, and a dataframe cache round trip.
+
+Each measurement is repeated and the median and minimum are kept. Results are
+written as JSON; pass a previous file with ``--compare`` to print the ratio of
+every measurement's best time and exit non-zero if one slowed down past
+``--tolerance`` (and by more than ``--noise-ms``, so sub-millisecond jitter on
+a busy machine is not reported):
+
+    uv run python benchmarks/bench_suite.py --output before.json
+    git switch my-branch
+    uv run python benchmarks/bench_suite.py --output after.json --compare before.json
+
+Run with: uv run python benchmarks/bench_suite.py --sizes 1000 10000 100000 1000000
+"""
+import argparse
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from analyze_pdf import columns_for_df, convert_dfs, is_valid_df  # noqa: E402
+from memo import DataframeBlobCache, SqliteDescriptionCache, description_cache_keys  # noqa: E402
+import serve_frontend  # noqa: E402
+from serve_frontend import compute_diagram_size  # noqa: E402
+from synthetic import LAYOUTS, categorized_rollup  # noqa: E402
+from utils import count_categories, fmt_sankeymatic  # noqa: E402
+
+# Description cache operations are per entry; beyond this they only measure SQLite
+MAX_MEMO_ENTRIES = 100_000
+
+
+def measure(fn, repeat: int) -> dict:
+    """Run ``fn`` ``repeat`` times; return the median and minimum seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {"median_s": statistics.median(timings), "min_s": min(timings), "repeat": repeat}
+
+
+def quietly(fn):
+    """count_categories and fmt_sankeymatic log every skipped category; keep those messages out of the timings."""
+    def run():
+        logging.disable(logging.WARNING)
+        try:
+            return fn()
+        finally:
+            logging.disable(logging.NOTSET)
+    return run
+
+
+def bench_convert_dfs(size: int, repeat: int) -> dict:
+    results = {}
+    for layout, make_table in LAYOUTS.items():
+        df = make_table(size)
+        cols = columns_for_df(df)
+        if not is_valid_df(cols):
+            raise SystemExit(f"synthetic {layout} table is not accepted by extract_dataframes: {list(df.columns)}")
+        results[f"convert_dfs/{layout}/{size}"] = measure(lambda: convert_dfs(df, cols), repeat)
+    return results
+
+
+def size_uncached(diagram: str) -> tuple[int, int]:
+    """compute_diagram_size without its cache, which would answer every repeat after the first."""
+    serve_frontend._size_cache.clear()
+    return compute_diagram_size(diagram)
+
+
+def bench_rollup(size: int, repeat: int) -> dict:
+    rollup = categorized_rollup(size)
+    data = quietly(lambda: count_categories(rollup, {}))()
+    diagram = quietly(lambda: fmt_sankeymatic(data))()
+    return {
+        f"count_categories/{size}": measure(quietly(lambda: count_categories(rollup, {})), repeat),
+        f"fmt_sankeymatic/{size}": measure(quietly(lambda: fmt_sankeymatic(data)), repeat),
+        f"compute_diagram_size/{size}": measure(lambda: size_uncached(diagram), repeat),
+    }
+
+
+def merchant_word(number: int) -> str:
+    """A letters-only word per number (A, B, ..., Z, BA, ...), which normalization keeps."""
+    word = ""
+    while True:
+        number, digit = divmod(number, 26)
+        word = chr(ord("A") + digit) + word
+        if number == 0:
+            return word
+
+
+def bench_memo(size: int, repeat: int, scratch: Path) -> dict:
+    entries = min(size, MAX_MEMO_ENTRIES)
+    # Distinct after normalize_description, so every entry has its own canonical key
+    descriptions = [f"MERCHANT {merchant_word(i)} STORE {i}" for i in range(entries)]
+    categories = {description: "SHOPPING" for description in descriptions}
+    path = scratch / f"descriptions_{size}.sqlite3"
+    cache = SqliteDescriptionCache(path, json_path=None)
+
+    def write():
+        cache.update({key: category for description, category in categories.items()
+                      for key in description_cache_keys("fingerprint", description)})
+
+    def read():
+        for description in descriptions:
+            cache.get(description_cache_keys("fingerprint", description)[0])
+
+    blobs = DataframeBlobCache(scratch / f"dataframes_{size}")
+    tables = [make_table(size) for make_table in LAYOUTS.values()]
+
+    def round_trip():
+        blobs.put("statement", tables)
+        blobs.get("statement")
+
+    return {
+        f"memo_write/{entries}": measure(write, repeat),
+        f"memo_read/{entries}": measure(read, repeat),
+        f"dataframe_cache_round_trip/{size}": measure(round_trip, repeat),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, previous: dict, tolerance: float, noise_ms: float) -> list[str]:
+    """Print each measurement's best time against the previous run; return the names that regressed."""
+    regressions = []
+    for name, current in results.items():
+        before = previous.get(name)
+        if before is None:
+            print(f"{name:<45} {current['min_s'] * 1000:10.2f} ms   (new)")
+            continue
+        ratio = current["min_s"] / before["min_s"] if before["min_s"] else float("inf")
+        flag = ""
+        if ratio > tolerance and (current["min_s"] - before["min_s"]) * 1000 > noise_ms:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<45} {before['min_s'] * 1000:10.2f} -> {current['min_s'] * 1000:10.2f} ms  {ratio:5.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", type=Path, default=Path("benchmark_results.json"))
+    parser.add_argument("--compare", type=Path, default=None, help="Previous results to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="Slowdown ratio reported as a regression")
+    parser.add_argument("--noise-ms", type=float, default=1.0, help="Slowdowns smaller than this many milliseconds are never reported")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        for size in args.sizes:
+            print(f"Running size {size}...", file=sys.stderr)
+            results.update(bench_convert_dfs(size, args.repeat))
+            results.update(bench_rollup(size, args.repeat))
+            results.update(bench_memo(size, args.repeat, Path(scratch)))
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    args.output.write_text(json.dumps(report, indent=2))
+    print(f"Wrote {len(results)} measurements to {args.output}", file=sys.stderr)
+
+    if args.compare is None:
+        for name, result in results.items():
+            print(f"{name:<45} {result['median_s'] * 1000:10.2f} ms")
+        return
+    previous = json.loads(args.compare.read_text())
+    print(f"Comparing with {args.compare} (commit {previous.get('commit')})")
+    regressions = compare(results, previous["results"], args.tolerance, args.noise_ms)
+    if regressions:
+        sys.exit(f"{len(regressions)} measurement(s) slower than {args.tolerance}x: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
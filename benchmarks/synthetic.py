@@ -0,0 +1,113 @@
+"""Synthetic statement tables and categorized rollups for the benchmarks.
+
+Tables come in the column layouts the banks' Docling tables arrive in, so
+``analyze_pdf.extract_dataframes`` accepts every one of them; a few percent of
+cells are blank or malformed, as in real extractions. Generation is seeded, so
+the same arguments always produce the same frame.
+"""
+import random
+
+import pandas as pd
+
+MERCHANTS = [
+    "SHELL OIL", "STOP & SHOP", "STARBUCKS STORE", "AMZN MKTP US", "NETFLIX.COM", "UBER TRIP",
+    "WHOLE FOODS MARKET", "ATT BILL PAYMENT", "MBTA", "TRADER JOE'S", "CVS PHARMACY", "APPLE.COM BILL",
+]
+
+# Category paths as the LLM returns them: a parent and optional sub-category
+CATEGORIES = [
+    "FOOD GROCERIES", "FOOD RESTAURANTS", "GAS", "SHOPPING", "SUBSCRIPTION", "TRANSPORT MBTA",
+    "TRANSPORT UBER", "PHONE_BILL", "HEALTH PHARMACY", "WANTS FUN", "NEEDS HOUSING", "TRAVEL HOTEL",
+]
+INCOME_CATEGORIES = ["WAGES", "ZUS ZUS_CREDIT", "INCOME"]
+
+
+def _date(rng: random.Random) -> str:
+    return f"{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}"
+
+
+def _description(rng: random.Random, i: int) -> str:
+    return f"{rng.choice(MERCHANTS)} {rng.randint(1000, 99999)} #{i}"
+
+
+def _maybe_blank(rng: random.Random, value: str, rate: float = 0.02) -> str:
+    return "" if rng.random() < rate else value
+
+
+def boa(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Bank of America credit card: signed plain amounts."""
+    rng = random.Random(seed)
+    data = {"Transaction Date": [], "Posting Date": [], "Description": [], "Reference Number": [], "Amount": []}
+    for i in range(rows):
+        date = _date(rng)
+        data["Transaction Date"].append(_maybe_blank(rng, date))
+        data["Posting Date"].append(date)
+        data["Description"].append(_maybe_blank(rng, _description(rng, i)))
+        data["Reference Number"].append(f"{rng.randint(10**11, 10**12 - 1)}")
+        data["Amount"].append(f"{rng.choice(['', '-'])}{rng.randint(1, 2500)}.{rng.randint(0, 99):02d}")
+    return pd.DataFrame(data)
+
+
+def schwab(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Schwab checking: nested Docling headers and separate Debits/Credits columns."""
+    rng = random.Random(seed)
+    prefix = "Schwab Bank Investor Checking TM (continued).Activity (continued)."
+    data = {f"{prefix}{name}": [] for name in ("Date Posted", "Description", "Debits", "Credits", "Balance")}
+    for i in range(rows):
+        is_credit = rng.random() < 0.2
+        amount = f"${rng.randint(1, 5000):,}.{rng.randint(0, 99):02d}"
+        data[f"{prefix}Date Posted"].append(_maybe_blank(rng, _date(rng)))
+        data[f"{prefix}Description"].append(_maybe_blank(rng, _description(rng, i)))
+        data[f"{prefix}Debits"].append("" if is_credit else (amount if rng.random() > 0.03 else "N/A"))
+        data[f"{prefix}Credits"].append(amount if is_credit else "")
+        data[f"{prefix}Balance"].append(f"${rng.randint(0, 50000):,}.00")
+    return pd.DataFrame(data)
+
+
+def barclays(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Barclays credit card: dollar amounts with a leading minus for credits."""
+    rng = random.Random(seed)
+    data = {"Transaction Date": [], "Description": [], "Category": [], "Amount": []}
+    for i in range(rows):
+        data["Transaction Date"].append(_maybe_blank(rng, _date(rng)))
+        data["Description"].append(_maybe_blank(rng, _description(rng, i)))
+        data["Category"].append(rng.choice(["Merchandise", "Dining", "Travel", "Payment"]))
+        data["Amount"].append(f"{'-' if rng.random() < 0.1 else ''}${rng.randint(1, 2500):,}.{rng.randint(0, 99):02d}")
+    return pd.DataFrame(data)
+
+
+def paypal(rows: int, seed: int = 0) -> pd.DataFrame:
+    """PayPal activity: currency-suffixed amounts and a separate fee column."""
+    rng = random.Random(seed)
+    data = {"Activity Posted": [], "Description": [], "Currency": [], "Amount": [], "Fees": []}
+    for i in range(rows):
+        data["Activity Posted"].append(_maybe_blank(rng, _date(rng)))
+        data["Description"].append(_maybe_blank(rng, f"PAYPAL *{_description(rng, i)}"))
+        data["Currency"].append("USD")
+        data["Amount"].append(_maybe_blank(rng, f"-${rng.randint(1, 500)}.{rng.randint(0, 99):02d} USD", rate=0.03))
+        data["Fees"].append("$0.00")
+    return pd.DataFrame(data)
+
+
+LAYOUTS = {
+    "boa": boa,
+    "schwab": schwab,
+    "barclays": barclays,
+    "paypal": paypal,
+}
+
+
+def categorized_rollup(rows: int, seed: int = 0) -> pd.DataFrame:
+    """A categorized rollup as read back from the CSVs: what count_categories consumes."""
+    rng = random.Random(seed)
+    data = {"raw_transaction": [], "description": [], "date": [], "amount": [], "category": []}
+    for i in range(rows):
+        income = rng.random() < 0.05
+        description = _description(rng, i)
+        amount = rng.randint(1000, 5000) + rng.random() if income else rng.randint(1, 300) + rng.random()
+        data["raw_transaction"].append(f"['{_date(rng)}', '{description}', {amount:.2f}]")
+        data["description"].append(description)
+        data["date"].append(_date(rng))
+        data["amount"].append(round(amount, 2))
+        data["category"].append(rng.choice(INCOME_CATEGORIES if income else CATEGORIES + ["INPUT NEEDED"]))
+    return pd.DataFrame(data)
@@ -1,5 +1,16 @@
-from memo import memoized_invoke_chain_transaction
-from utils import CATEGORY_PROMPT, TRANSACTION_PARAM, UNCERTAINTY, ONLY_PRINT_CATEGORY, CATEGORY_SINGLE_WORD, CATEGORY_UPPERCASE, output_parser, extract_date_and_amount_from_transaction, load_local_category_hints
+import hashlib
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from memo import memoized_invoke_chain_transaction, invoke_chain_transaction, cached_description_category, cached_description_items, description_cache_keys, store_description_categories
+from neighbours import DEFAULT_SIMILARITY_THRESHOLD, NeighbourIndex, neighbour_index_path
+from rules import MerchantIndex, description_items
+from timing import timed
+from utils import BATCH_CATEGORY_PROMPT, ONLY_PRINT_NUMBERED_CATEGORIES, CATEGORY_PROMPT, TRANSACTION_PARAM, UNCERTAINTY, ONLY_PRINT_CATEGORY, CATEGORY_SINGLE_WORD, CATEGORY_UPPERCASE, output_parser, extract_date_and_amount_from_transaction, load_local_category_hints, read_local_category_hint_lines
 from langchain_core.prompts import PromptTemplate
 
 BA_CATEGORIES = "BA ELECTRONIC PAYMENT is a CREDIT CARD PAYMENT. "
@@ -10,7 +21,7 @@ SUBSCRIPTION_CATEGORIES = "1PASSWORD and APPLE.COM are each a SUBSCRIPTION categ
 # category_hints.example.txt), never from committed source.
 LOCAL_CATEGORY_HINTS = load_local_category_hints()
 
-categorize_prompt = PromptTemplate.from_template(CATEGORY_PROMPT
+CATEGORIZE_TEMPLATE = (CATEGORY_PROMPT
     + BA_CATEGORIES
     + BILL_CATEGORIES
     + SUBSCRIPTION_CATEGORIES
@@ -22,18 +33,376 @@ categorize_prompt = PromptTemplate.from_template(CATEGORY_PROMPT
     + ONLY_PRINT_CATEGORY 
     + TRANSACTION_PARAM)
 
+categorize_prompt = PromptTemplate.from_template(CATEGORIZE_TEMPLATE)
+
+# Same hints and rules, but for a numbered list of transactions answered one
+# per line. Results are memoized under the single-call fingerprint, so either
+# mode reuses what the other cached.
+BATCH_CATEGORIZE_TEMPLATE = (BATCH_CATEGORY_PROMPT
+    + BA_CATEGORIES
+    + BILL_CATEGORIES
+    + SUBSCRIPTION_CATEGORIES
+    + INTEREST_CATEGORIES
+    + LOCAL_CATEGORY_HINTS
+    + CATEGORY_UPPERCASE
+    + UNCERTAINTY
+    + CATEGORY_SINGLE_WORD
+    + ONLY_PRINT_NUMBERED_CATEGORIES
+    + TRANSACTION_PARAM)
+
+batch_categorize_prompt = PromptTemplate.from_template(BATCH_CATEGORIZE_TEMPLATE)
+
+_NUMBERED_LINE_RE = re.compile(r"^\s*(\d+)\s*[.):-]\s*(.+?)\s*$")
+
+# Placeholder category of descriptions planned for the LLM in plan_llm_calls
+_PLANNED = "PLANNED"
+
+# Seconds to wait before the first retry of a failed LLM call; doubles on
+# every further attempt.
+RETRY_BACKOFF_SECONDS = 1.0
+
+
+# Merchant rules consulted before the LLM, one index per prompt/model
+# fingerprint so one model's answers never stand in for another's. Built on
+# first use from the description cache and the local hints, then extended with
+# every category the LLM returns during the run.
+_merchant_indexes: dict[str, MerchantIndex] = {}
+
+
+def merchant_index(fingerprint: str) -> MerchantIndex:
+    index = _merchant_indexes.get(fingerprint)
+    if index is None:
+        index = _merchant_indexes[fingerprint] = MerchantIndex.build(cached_description_items(fingerprint), read_local_category_hint_lines())
+    return index
+
+
+# Near-duplicate lookup consulted after the merchant rules, one per
+# fingerprint. Persisted on disk; filled from the description cache the first
+# time it is opened empty.
+_neighbour_indexes: dict[str, NeighbourIndex] = {}
+
+
+def neighbour_index(fingerprint: str) -> NeighbourIndex:
+    index = _neighbour_indexes.get(fingerprint)
+    if index is None:
+        index = NeighbourIndex(neighbour_index_path(fingerprint))
+        if len(index) == 0:
+            index.add_many(description_items(cached_description_items(fingerprint)))
+        _neighbour_indexes[fingerprint] = index
+    return index
+
+
+def learn_category(fingerprint: str, description: str, category: str) -> None:
+    """Make an LLM result available to the merchant rules and the neighbour index."""
+    merchant_index(fingerprint).add(description, category)
+    neighbour_index(fingerprint).add(description, category)
+
+
+@dataclass
+class CategorizeStats:
+    """How each categorized transaction was resolved; everything but llm_calls is an LLM call saved."""
+    transactions: int = 0
+    rule_hits: int = 0
+    neighbour_hits: int = 0
+    # descriptions categorized by the LLM, and the requests it took (fewer in batch mode)
+    llm_calls: int = 0
+    llm_requests: int = 0
+
+    @property
+    def cache_hits(self) -> int:
+        return self.transactions - self.rule_hits - self.neighbour_hits - self.llm_calls
+
+    def summary(self) -> str:
+        saved = self.transactions - self.llm_calls
+        rate = saved / self.transactions if self.transactions else 0.0
+        return (f"Categorized {self.transactions} transactions: {self.cache_hits} cache hits, "
+                f"{self.rule_hits} rule hits, {self.neighbour_hits} neighbour hits, "
+                f"{self.llm_calls} LLM calls in {self.llm_requests} requests ({rate:.1%} served without the LLM)")
+
+
+# Running totals for the current run; see reset_stats.
+stats = CategorizeStats()
+
+
+def reset_stats() -> None:
+    global stats
+    stats = CategorizeStats()
+
+
+def local_category(fingerprint: str, description: str, similarity_threshold: float | None = DEFAULT_SIMILARITY_THRESHOLD) -> tuple[str | None, str | None]:
+    """
+    Return (category, source) from the merchant rules or, failing that, the
+    closest already-categorized neighbour; source is "rule", "neighbour" or None.
+
+    ``similarity_threshold`` of None disables the neighbour lookup.
+    """
+    category = merchant_index(fingerprint).lookup(description)
+    if category is not None:
+        return category, "rule"
+    if similarity_threshold is not None:
+        category = neighbour_index(fingerprint).lookup(description, similarity_threshold)
+        if category is not None:
+            return category, "neighbour"
+    return None, None
+
+
+def run_cache_key(fingerprint: str, description: str) -> str:
+    """
+    The key under which a categorized description answers later descriptions of
+    the same run: its canonical key, or the description itself if it has none.
+    """
+    canonical_key, description_key = description_cache_keys(fingerprint, description)
+    return canonical_key or description_key
 
-def categorize(model: any, transactions: list[list[str]]) -> list[dict]:
-    chain = categorize_prompt | model | output_parser
+
+def plan_llm_calls(fingerprint: str, descriptions: list[str], cached: dict[str, str | None], similarity_threshold: float | None = DEFAULT_SIMILARITY_THRESHOLD) -> list[str]:
+    """
+    Return the descriptions a sequential run would send to the LLM, in order.
+
+    Walks the descriptions as ``categorize`` does, counting each planned one as
+    answered: later descriptions sharing its cache key are cache hits, and
+    later ones its merchant words or trigrams match are rule or neighbour hits.
+    The answers are not known yet, so those matches are checked against
+    scratch indexes, and the plan is only a prediction; ``categorize`` still
+    resolves every row in order.
+    """
+    planned_keys = set()
+    rules = MerchantIndex()
+    neighbours = NeighbourIndex(Path(":memory:"))
+    plan = []
+    for description in descriptions:
+        key = run_cache_key(fingerprint, description)
+        if cached[description] is not None or key in planned_keys:
+            continue
+        if local_category(fingerprint, description, similarity_threshold)[0] is not None or rules.lookup(description) is not None:
+            continue
+        if similarity_threshold is not None and neighbours.lookup(description, similarity_threshold) is not None:
+            continue
+        planned_keys.add(key)
+        rules.add(description, _PLANNED)
+        neighbours.add(description, _PLANNED)
+        plan.append(description)
+    return plan
+
+
+def prompt_fingerprint(model_name: str) -> str:
+    """Return a stable hash of the categorization prompt and the model it is sent to."""
+    return hashlib.sha256(f"{CATEGORIZE_TEMPLATE}|{model_name}".encode()).hexdigest()
+
+
+def model_name(model: any) -> str:
+    """Name of the model behind a LangChain client (``model`` on Ollama, ``model_name`` on OpenAI)."""
+    return getattr(model, "model", None) or getattr(model, "model_name", None) or type(model).__name__
+
+
+def build_chain(model: any):
+    return categorize_prompt | model | output_parser
+
+
+def build_batch_chain(model: any):
+    return batch_categorize_prompt | model | output_parser
+
+
+def format_batch(descriptions: list[str]) -> str:
+    """Number the descriptions one per line, the input of the batch prompt."""
+    return "\n".join(f"{number}. {' '.join(str(description).split())}" for number, description in enumerate(descriptions, start=1))
+
+
+def parse_batch_categories(response: str, count: int) -> dict[int, str] | None:
+    """
+    Return {position: category} from a numbered batch response.
+
+    Positions the response skips are left out, for the caller to retry one at
+    a time. A response with unnumbered lines, repeated or out-of-range numbers
+    cannot be trusted to line up with the input and returns None.
+    """
+    categories = {}
+    for line in response.strip().splitlines():
+        if not line.strip():
+            continue
+        match = _NUMBERED_LINE_RE.match(line)
+        if match is None:
+            return None
+        position = int(match.group(1)) - 1
+        if position in categories or not 0 <= position < count:
+            return None
+        categories[position] = match.group(2).strip("'\"`*")
+    return categories
+
+
+def call_with_timeout(func, *args, timeout: float | None = None, slots: threading.Semaphore | None = None):
+    """
+    Return ``func(*args)``, raising TimeoutError if it takes more than ``timeout`` seconds.
+
+    The call runs on a daemon thread, so a call that is given up on does not
+    hold the worker that made it, nor keep the interpreter from exiting. Python
+    cannot stop the call itself; the client's own request timeout (see
+    ``models.create_model``) ends it. Until it does, it keeps one of ``slots``,
+    so abandoned calls and their retries never put more requests in flight
+    than there are slots.
+    """
+    if timeout is None:
+        return func(*args)
+    if slots is not None:
+        slots.acquire()
+    outcome = {}
+
+    def run():
+        try:
+            outcome["result"] = func(*args)
+        except BaseException as error:
+            outcome["error"] = error
+        finally:
+            if slots is not None:
+                slots.release()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        raise TimeoutError(f"No response within {timeout} seconds")
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+
+def invoke_with_retries(chain, description: str, max_retries: int = 0, request_timeout: float | None = None, slots: threading.Semaphore | None = None) -> str:
+    """
+    Invoke the chain for one description, retrying failed calls with exponential backoff.
+
+    A call that takes longer than ``request_timeout`` seconds counts as a
+    failed attempt and is retried like any other; see ``call_with_timeout``
+    for ``slots``.
+    """
+    attempt = 0
+    while True:
+        try:
+            return call_with_timeout(invoke_chain_transaction, chain, description, timeout=request_timeout, slots=slots)
+        except Exception:
+            if attempt >= max_retries:
+                raise
+            time.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
+            attempt += 1
+
+
+def invoke_batch(chain, batch_chain, descriptions: list[str], max_retries: int = 0, request_timeout: float | None = None, slots: threading.Semaphore | None = None) -> tuple[dict[str, str], int]:
+    """
+    Categorize descriptions with one numbered-list request through ``batch_chain``.
+
+    Descriptions the response does not answer, or all of them if it is
+    malformed, are sent one at a time through ``chain``. A single description
+    always goes through ``chain``. Returns the categories and the number of
+    requests made.
+    """
+    if len(descriptions) == 1:
+        return {descriptions[0]: invoke_with_retries(chain, descriptions[0], max_retries, request_timeout, slots)}, 1
+    response = invoke_with_retries(batch_chain, format_batch(descriptions), max_retries, request_timeout, slots)
+    categories = parse_batch_categories(response, len(descriptions)) or {}
+    results = {}
+    requests = 1
+    for position, description in enumerate(descriptions):
+        if position in categories:
+            results[description] = categories[position]
+        else:
+            results[description] = invoke_with_retries(chain, description, max_retries, request_timeout, slots)
+            requests += 1
+    return results, requests
+
+
+def prefetch_categories(chain, fingerprint: str, descriptions: list[str], max_concurrency: int, request_timeout: float | None = None, max_retries: int = 0, batch_chain=None, batch_size: int = 1) -> dict[str, str]:
+    """
+    Resolve every uncached description through the chain concurrently and memoize the results.
+
+    Cache misses are found up front and de-duplicated, then sent to the chain on a
+    bounded thread pool of ``max_concurrency`` workers. With ``batch_size`` above
+    1, each request carries up to that many descriptions through ``batch_chain``
+    (see ``invoke_batch``). ``request_timeout`` is the number of seconds each
+    chain call may take before it is retried (see ``invoke_with_retries``);
+    at most ``max_concurrency`` calls are in flight, counting those given up on.
+    Results are written to the memo cache from this thread only, so the cache
+    file never sees concurrent writers; whatever finished is saved even if a
+    later call fails.
+
+    Returns the categories of the descriptions that were sent to the chain.
+    """
+    misses = list(dict.fromkeys(
+        description for description in descriptions
+        if cached_description_category(fingerprint, description) is None
+    ))
+    results = {}
+    if not misses:
+        return results
+    if batch_chain is None:
+        batch_size = 1
+    batches = [misses[start:start + batch_size] for start in range(0, len(misses), batch_size)]
+    # Held by each chain call until it returns, even one given up on after request_timeout
+    slots = threading.BoundedSemaphore(max_concurrency)
+    pool = ThreadPoolExecutor(max_workers=max_concurrency)
+    try:
+        futures = [pool.submit(invoke_batch, chain, batch_chain, batch, max_retries, request_timeout, slots) for batch in batches]
+        for future in futures:
+            categories, requests = future.result()
+            results.update(categories)
+            stats.llm_requests += requests
+    finally:
+        pool.shutdown(cancel_futures=True)
+        store_description_categories(fingerprint, results)
+    return results
+
+
+@timed()
+def categorize(model: any, transactions: list[list[str]], max_concurrency: int = 1, request_timeout: float | None = None, max_retries: int = 0, similarity_threshold: float | None = DEFAULT_SIMILARITY_THRESHOLD, batch_size: int = 1) -> list[dict]:
+    """
+    Categorize transactions with the LLM chain, memoizing every description.
+
+    Exact cache hits come first, then the merchant rules, then near duplicates
+    of already-categorized descriptions at or above ``similarity_threshold``;
+    only descriptions none of them knows are sent to the LLM, and each answer
+    is learned before the next transaction. With ``max_concurrency`` or
+    ``batch_size`` above 1, the descriptions ``plan_llm_calls`` expects to reach
+    the LLM are resolved up front by ``prefetch_categories``, ``batch_size`` at
+    a time. The loop below still walks the transactions in order against the
+    cache as it was before prefetching, taking prefetched answers in place of
+    LLM calls, so the output is the same as the sequential path.
+    """
+    chain = build_chain(model)
+    fingerprint = prompt_fingerprint(model_name(model))
+    for transaction in transactions:
+        if(len(transaction) != 3):
+            raise Exception(f"Invalid transaction: {transaction}")
+    cached = {description: cached_description_category(fingerprint, description) for description in dict.fromkeys(transaction[1] for transaction in transactions)}
+    prefetched = {}
+    if max_concurrency > 1 or batch_size > 1:
+        planned = plan_llm_calls(fingerprint, [transaction[1] for transaction in transactions], cached, similarity_threshold)
+        batch_chain = build_batch_chain(model) if batch_size > 1 else None
+        prefetched = prefetch_categories(chain, fingerprint, planned, max_concurrency, request_timeout, max_retries, batch_chain, batch_size)
+    # Categories the LLM gave this run, by run_cache_key
+    answered = {}
     categorized_data = []
     for transaction in transactions:
         raw_transaction = f"{transaction}"
-        if(len(transaction) != 3):
-            raise Exception(f"Invalid transaction: {raw_transaction}")
         date = transaction[0]
         description = transaction[1]
         amount = transaction[2]
-        category = memoized_invoke_chain_transaction(chain, description)
+        key = run_cache_key(fingerprint, description)
+        category = cached[description]
+        if category is None:
+            category = answered.get(key)
+        if category is None:
+            category, source = local_category(fingerprint, description, similarity_threshold)
+            if source == "rule":
+                stats.rule_hits += 1
+            elif source == "neighbour":
+                stats.neighbour_hits += 1
+        if category is None:
+            category = prefetched.get(description)
+            if category is None:
+                category = memoized_invoke_chain_transaction(chain, description, fingerprint)
+                stats.llm_requests += 1
+            learn_category(fingerprint, description, category)
+            answered[key] = category
+            stats.llm_calls += 1
+        stats.transactions += 1
         categorized_data.append({"raw_transaction": raw_transaction, "description": description, "date": date, "amount": amount, "category": category})
 
     return categorized_data
@@ -0,0 +1,196 @@
+"""A Sankey diagram as a graph of flows between named nodes.
+
+fmt_sankeymatic builds one, sort_budget orders and labels it, and
+serve_frontend sizes it, so a diagram is only turned into Sankeymatic text
+once, at the end. Node names are interned to integer IDs and the flows kept in
+parallel arrays, so walking a large diagram touches no strings. ``parse``
+reads existing Sankeymatic text back into a graph.
+"""
+
+import logging
+import re
+from array import array
+from collections.abc import Iterator
+
+logger = logging.getLogger(__name__)
+
+# One "Source [Amount] Target" flow line; comments (') and settings (/) are skipped
+FLOW_RE = re.compile(
+    r"^([^/'\[\n][^\[\n]*?)\s+\[(\d+(?:\.\d+)?)\]\s+([^\n#]+)",
+    re.MULTILINE,
+)
+
+
+def format_amount(amount: float) -> str:
+    """Amounts as Sankeymatic text: whole numbers without a decimal point."""
+    return str(int(amount)) if amount == int(amount) else repr(amount)
+
+
+class FlowGraph:
+    """
+    Flows between named nodes, in the order they were added.
+
+    Node ``i`` is named ``names[i]``; flow ``i`` carries ``amounts[i]`` from
+    node ``sources[i]`` to node ``targets[i]``.
+    """
+
+    def __init__(self):
+        self.names: list[str] = []
+        self._ids: dict[str, int] = {}
+        self.sources = array("l")
+        self.targets = array("l")
+        self.amounts = array("d")
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    def node_id(self, name: str) -> int:
+        """The ID of the named node, added if it is new."""
+        node = self._ids.get(name)
+        if node is None:
+            node = self._ids[name] = len(self.names)
+            self.names.append(name)
+        return node
+
+    def add(self, source: str, amount: float, target: str) -> None:
+        self.sources.append(self.node_id(source))
+        self.targets.append(self.node_id(target))
+        self.amounts.append(amount)
+
+    def flows(self) -> Iterator[tuple[str, float, str]]:
+        """Every flow as (source name, amount, target name)."""
+        names = self.names
+        for source, amount, target in zip(self.sources, self.amounts, self.targets):
+            yield names[source], amount, names[target]
+
+    @classmethod
+    def parse(cls, text: str) -> "FlowGraph":
+        """The flows of Sankeymatic text; comments, settings and blank lines are skipped."""
+        graph = cls()
+        for match in FLOW_RE.finditer(text):
+            graph.add(match.group(1).strip(), float(match.group(2)), match.group(3).strip())
+        return graph
+
+    def to_text(self) -> str:
+        """Sankeymatic text with one ``Source [Amount] Target`` line per flow."""
+        return "".join(f"{source} [{format_amount(amount)}] {target}\n" for source, amount, target in self.flows())
+
+    def node_values(self) -> list[float]:
+        """Each node's height in the diagram: the larger of its total inflow and outflow."""
+        incoming = [0.0] * len(self.names)
+        outgoing = [0.0] * len(self.names)
+        for source, amount, target in zip(self.sources, self.amounts, self.targets):
+            outgoing[source] += amount
+            incoming[target] += amount
+        return [max(inflow, outflow) for inflow, outflow in zip(incoming, outgoing)]
+
+    def stages(self) -> list[int]:
+        """
+        Column of every node: the length of the longest path reaching it from a
+        node without inflows, in O(V + E) by walking the nodes in topological order.
+
+        Sankeymatic cannot draw cycles. If the flows contain one, the walk stalls
+        with every remaining node waiting on another; it then continues from a
+        node on a cycle that nothing else still unplaced feeds, preferring one
+        the placed nodes flow into, and ignores that node's remaining inflows.
+        """
+        count = len(self.names)
+        successors: list[list[int]] = [[] for _ in range(count)]
+        indegree = [0] * count
+        for source, target in zip(self.sources, self.targets):
+            successors[source].append(target)
+            indegree[target] += 1
+
+        stages = [0] * count
+        placed = [False] * count
+        ready = [node for node in range(count) if indegree[node] == 0]
+        placed_count = 0
+        cycle_order = None
+        next_unplaced = 0
+        cycle_nodes = []
+        while placed_count < count:
+            if not ready:
+                # Every remaining node waits on another. Break the cycle in the
+                # first strongly connected component (in topological order)
+                # with unplaced nodes: only its own members feed it.
+                if cycle_order is None:
+                    component = _components(successors)
+                    cycle_order = sorted(range(count), key=lambda node: -component[node])
+                while placed[cycle_order[next_unplaced]]:
+                    next_unplaced += 1
+                first = cycle_order[next_unplaced]
+                node = first
+                for candidate in cycle_order[next_unplaced:]:
+                    if component[candidate] != component[first]:
+                        break
+                    # a stage above 0 means a placed node flows into it
+                    if not placed[candidate] and stages[candidate] > 0:
+                        node = candidate
+                        break
+                cycle_nodes.append(self.names[node])
+                ready.append(node)
+            while ready:
+                node = ready.pop()
+                placed[node] = True
+                placed_count += 1
+                for target in successors[node]:
+                    if placed[target]:
+                        continue
+                    stages[target] = max(stages[target], stages[node] + 1)
+                    indegree[target] -= 1
+                    if indegree[target] == 0:
+                        ready.append(target)
+        if cycle_nodes:
+            logger.warning("Diagram flows form a cycle through %s; sizing ignores the flows closing it", ", ".join(cycle_nodes))
+        return stages
+
+
+def _components(successors: list[list[int]]) -> list[int]:
+    """
+    Strongly connected component of every node (Tarjan's algorithm, iterative).
+
+    Components are numbered in reverse topological order: no flow leads from
+    a component to one with a higher number.
+    """
+    count = len(successors)
+    index = [-1] * count
+    low = [0] * count
+    on_stack = [False] * count
+    component = [-1] * count
+    stack: list[int] = []
+    counter = components = 0
+    for root in range(count):
+        if index[root] != -1:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, 0)]
+        while work:
+            node, position = work[-1]
+            if position < len(successors[node]):
+                work[-1] = (node, position + 1)
+                target = successors[node][position]
+                if index[target] == -1:
+                    index[target] = low[target] = counter
+                    counter += 1
+                    stack.append(target)
+                    on_stack[target] = True
+                    work.append((target, 0))
+                elif on_stack[target]:
+                    low[node] = min(low[node], index[target])
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+            if low[node] == index[node]:
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component[member] = components
+                    if member == node:
+                        break
+                components += 1
+    return component
@@ -2076,6 +2076,8 @@ Requires:,
   }
 
   const urlInputsParam = "i",
+    urlDiagramIdParam = "d",
+    urlLiveParam = "live",
     linkTargetDiv = "generatedLink",
     copiedMsgId = "copiedMsg";
 
@@ -2152,17 +2154,63 @@ Requires:,
     }
   };
 
+  /**
+   * Fetch a diagram stored on the local server (see serve_frontend.py) by its
+   * ID, then render it.
+   * @param {string} diagramId - the ID the server returned when it was posted
+   */
+  async function loadFromServer(diagramId) {
+    try {
+      const response = await fetch(`/d/${encodeURIComponent(diagramId)}`);
+      if (!response.ok) {
+        throw new Error(`${response.status} ${response.statusText}`);
+      }
+      setUpNewInputs(await response.text(), "the server");
+    } catch (err) {
+      msg.addToQueue(
+        `The diagram ${highlightSafeValue(diagramId)} could not be loaded ` +
+          `from the server (${highlightSafeValue(err.message)}).`,
+        "issue",
+      );
+    }
+    glob.process_sankey();
+  }
+
+  /**
+   * Follow the diagrams published to the local server's event stream (see
+   * serve_frontend.py), loading each new one. The stream repeats the latest
+   * diagram on every (re)connection, so the one already shown is skipped.
+   */
+  function followLiveDiagrams() {
+    if (!glob.EventSource) {
+      return;
+    }
+    let shownId = null;
+    const source = new glob.EventSource("/events");
+    source.addEventListener("diagram", (event) => {
+      if (event.data !== shownId) {
+        shownId = event.data;
+        loadFromServer(event.data);
+      }
+    });
+  }
+
   /**
    * If we are running in the browser context, check for a serialized diagram
-   * in the URL parameters. If found, load it.
+   * (or the ID of one stored on the server) in the URL parameters. If found,
+   * load it. With the live parameter, follow the diagrams the server publishes.
    */
   function loadFromQueryString() {
     const searchString = glob.location?.search;
     if (searchString) {
-      const compressedInputs = new URLSearchParams(searchString)?.get(
-        urlInputsParam,
-      );
-      if (compressedInputs) {
+      const params = new URLSearchParams(searchString),
+        diagramId = params.get(urlDiagramIdParam),
+        compressedInputs = params.get(urlInputsParam);
+      if (params.has(urlLiveParam)) {
+        followLiveDiagrams();
+      } else if (diagramId) {
+        loadFromServer(diagramId);
+      } else if (compressedInputs) {
         const expandedInputs =
           LZString.decompressFromEncodedURIComponent(compressedInputs);
         // Make sure the input was successfully read.
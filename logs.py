@@ -0,0 +1,54 @@
+"""
+Logging setup and a rate limit for warnings repeated once per row.
+
+Modules log through ``logging.getLogger(__name__)`` with %-style arguments,
+so a message below the configured level is never formatted. Levels can be set
+for the whole run and overridden per module (``utils=DEBUG``).
+"""
+
+import logging
+import threading
+
+# Occurrences of a repeated warning logged in full before the rest are only counted
+REPEATED_WARNING_LIMIT = 5
+
+
+def configure_logging(level: str = "INFO", module_levels: list[str] | None = None) -> None:
+    """
+    Send log records to stderr at ``level``; ``module_levels`` holds
+    ``"<module>=<LEVEL>"`` overrides such as ``"utils=DEBUG"``.
+    """
+    logging.basicConfig(level=level.upper(), format="%(levelname)s %(name)s: %(message)s")
+    for override in module_levels or []:
+        module, separator, module_level = override.partition("=")
+        if not separator or not module or not module_level:
+            raise ValueError(f"Invalid module log level: {override!r}. Use <module>=<LEVEL>, e.g. utils=DEBUG.")
+        logging.getLogger(module).setLevel(module_level.upper())
+
+
+class RepeatedWarning:
+    """
+    A warning that can fire once per row: the first ``limit`` occurrences are
+    logged, the rest only counted until ``flush`` logs how many were left out.
+    """
+
+    def __init__(self, logger: logging.Logger, description: str, limit: int = REPEATED_WARNING_LIMIT):
+        self.logger = logger
+        self.description = description
+        self.limit = limit
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, msg: str, *args) -> None:
+        with self._lock:
+            self.count += 1
+            count = self.count
+        if count <= self.limit:
+            self.logger.warning(msg, *args)
+
+    def flush(self) -> None:
+        with self._lock:
+            suppressed = self.count - self.limit
+            self.count = 0
+        if suppressed > 0:
+            self.logger.warning("%d more %s not shown", suppressed, self.description)
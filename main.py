@@ -1,10 +1,17 @@
 import argparse
-import http.server
-import socketserver
+import cProfile
+import functools
+import http.client
 import threading
 import webbrowser
 from analyze_pdf import main
-from serve_frontend import diagram_to_url, Handler, PORT
+from categorize import DEFAULT_SIMILARITY_THRESHOLD
+from flowgraph import FlowGraph
+from logs import configure_logging
+from models import DEFAULT_MODEL, MODEL_FACTORIES
+from pipeline import DEFAULT_QUEUE_SIZE
+import timing
+from serve_frontend import diagram_to_url, live_url, make_server, post_diagram, publish_diagram, stop_server, HOST, PORT
 
 MONTH_NAMES = {
     "jan": "01", "feb": "02", "mar": "03", "apr": "04",
@@ -17,39 +24,94 @@ def is_port_in_use(port: int) -> bool:
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
         return s.connect_ex(("localhost", port)) == 0
 
-def open_in_browser(diagram: str):
-    url = diagram_to_url(diagram)
-    if is_port_in_use(PORT):
-        print(f"Server already running — opening {url}")
-        webbrowser.open(url)
-        return
+def publish_to_running_server(diagram: str | FlowGraph) -> bool:
     try:
-        httpd = socketserver.TCPServer(("", PORT), Handler)
-    except OSError:
+        post_diagram(diagram, publish=True)
+        return True
+    except (OSError, http.client.HTTPException) as error:
+        print(f"Could not publish the diagram to the running server: {error}")
+        return False
+
+def start_live_view(host: str = HOST):
+    """
+    Open the live page, which shows every diagram the run publishes, served
+    from a background thread here (listening on ``host``) or by a server that
+    is already running. Returns the server started here (None if one was
+    running) and the function that publishes a diagram to it.
+    """
+    httpd = None
+    if not is_port_in_use(PORT):
+        try:
+            httpd = make_server(PORT, host=host)
+        except OSError:
+            pass
+    url = live_url()
+    if httpd is None:
         print(f"Server already running — opening {url}")
-        webbrowser.open(url)
-        return
-    with httpd:
+        publish = publish_to_running_server
+    else:
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
         print(f"Serving frontend at {url}")
-        threading.Timer(0.5, webbrowser.open, args=[url]).start()
-        try:
-            httpd.serve_forever()
-        except KeyboardInterrupt:
-            print("\nStopped.")
+        publish = publish_diagram
+    webbrowser.open(url)
+    return httpd, publish
+
+def show_final_diagram(httpd, diagram: str):
+    if httpd is None:
+        if not publish_to_running_server(diagram):
+            # A server without the diagram API: send the whole diagram in the URL
+            webbrowser.open(diagram_to_url(diagram))
+        return
+    publish_diagram(diagram)
+    print("Serving the diagram until Ctrl-C")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        print("\nStopped.")
 
 def handle():
     parser = argparse.ArgumentParser()
     parser.add_argument("--month", type=str, default=None, help="Filter by month abbreviation (e.g. jan, feb, mar)", choices=MONTH_NAMES.keys())
-    parser.add_argument("--open", action="store_true", help="Open the Sankeymatic diagram in a browser after analysis")
+    parser.add_argument("--model", type=str, default=DEFAULT_MODEL, choices=MODEL_FACTORIES.keys(), help="LLM used to categorize transactions; 'stub' is a fast local fake for benchmarking")
+    parser.add_argument("--concurrency", type=int, default=1, help="Number of concurrent LLM calls used to categorize uncached transactions")
+    parser.add_argument("--batch-size", type=int, default=1, help="Number of uncached descriptions sent to the LLM per request")
+    parser.add_argument("--workers", type=int, default=1, help="Number of processes used to extract transactions from PDFs")
+    parser.add_argument("--pipeline", action="store_true", help="Overlap PDF extraction, categorization and CSV writing across statements")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE, help="With --pipeline, statements allowed to wait between stages before extraction pauses")
+    parser.add_argument("--similarity", type=float, default=DEFAULT_SIMILARITY_THRESHOLD, help="Reuse the category of an already-categorized description at least this similar (0-1); 0 disables the lookup")
+    parser.add_argument("--force", action="store_true", help="Re-extract and re-categorize every PDF, even if its CSV is up to date")
+    parser.add_argument("--profile", action="store_true", help="Print the count, total, p50 and p95 time of each stage after the run")
+    parser.add_argument("--profile-output", type=str, default=None, help="Also write cProfile stats of the whole run to this file (read with pstats or snakeviz)")
+    parser.add_argument("--log-level", type=str, default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"], help="Level of the progress and warning messages")
+    parser.add_argument("--log", action="append", default=[], metavar="MODULE=LEVEL", help="Per-module log level, e.g. utils=DEBUG; repeatable")
+    parser.add_argument("--open", action="store_true", help="Open the Sankeymatic diagram in a browser, updated as each statement folder finishes")
+    parser.add_argument("--host", type=str, default=HOST, help="With --open, interface the server listens on; 0.0.0.0 exposes it, and its diagram API, to the network")
     args = parser.parse_args()
+    configure_logging(args.log_level, args.log)
     month = args.month
     if month is not None:
         key = month.lower()[:3]
         if key not in MONTH_NAMES:
             raise ValueError(f"Unknown month: {month!r}. Use a 3-letter abbreviation like 'jan', 'feb', etc.")
-    diagram = main(month)
-    if args.open and diagram:
-        open_in_browser(diagram)
+    similarity_threshold = args.similarity if args.similarity > 0 else None
+    httpd, publish = start_live_view(args.host) if args.open else (None, None)
+    run = functools.partial(main, month, concurrency=args.concurrency, workers=args.workers, force=args.force, similarity_threshold=similarity_threshold, pipeline=args.pipeline, queue_size=args.queue_size, batch_size=args.batch_size, model_name=args.model, on_diagram=publish)
+    timing.enable(args.profile or args.profile_output is not None)
+    try:
+        if args.profile_output is not None:
+            profiler = cProfile.Profile()
+            diagram = profiler.runcall(run)
+            profiler.dump_stats(args.profile_output)
+            print(f"Wrote cProfile stats to {args.profile_output}")
+        else:
+            diagram = run()
+        if timing.is_enabled():
+            print(timing.summary())
+        if args.open and diagram:
+            show_final_diagram(httpd, diagram)
+    finally:
+        if httpd is not None:
+            stop_server(httpd)
 
 if __name__ == "__main__":
     print('Starting analysis')
@@ -0,0 +1,51 @@
+"""Manifest of categorized statements, used to skip PDFs whose CSV is up to date."""
+
+import json
+import os
+from pathlib import Path
+
+# File recording, for each source PDF, what its _categorized.csv was built from
+MANIFEST_FILE = Path("categorized_manifest.json")
+
+
+class RunManifest:
+    """
+    Records each PDF's content hash, the prompt/model fingerprint and output CSV.
+
+    A statement is up to date when its contents and the fingerprint both match
+    what was recorded and the CSV written for it still exists; anything else
+    (a new or edited statement, a prompt or model change, a deleted CSV) makes
+    it stale.
+    """
+
+    def __init__(self, path: Path = MANIFEST_FILE):
+        self.path = Path(path)
+        if self.path.exists():
+            with open(self.path, "r") as file:
+                self.entries: dict[str, dict] = json.load(file)
+        else:
+            self.entries = {}
+
+    def is_up_to_date(self, pdf_path: str, pdf_sha256: str, fingerprint: str) -> bool:
+        entry = self.entries.get(pdf_path)
+        return (
+            entry is not None
+            and entry["pdf_sha256"] == pdf_sha256
+            and entry["fingerprint"] == fingerprint
+            and os.path.exists(entry["output_csv"])
+        )
+
+    def record(self, pdf_path: str, pdf_sha256: str, fingerprint: str, output_csv: str) -> None:
+        """Record a freshly written CSV and save the manifest."""
+        self.entries[pdf_path] = {
+            "pdf_sha256": pdf_sha256,
+            "fingerprint": fingerprint,
+            "output_csv": output_csv,
+        }
+        self.save()
+
+    def save(self) -> None:
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w") as file:
+            json.dump(self.entries, file, indent=4)
+        os.replace(tmp_path, self.path)
@@ -1,101 +1,353 @@
+import argparse
+import functools
 import json
+import logging
 import hashlib
+import os
+import re
+import sqlite3
+import threading
 from pathlib import Path
 
 import pandas as pd
 
-# File to store memoized results for descriptions
+from rules import distinctive_description
+from timing import timed
+
+logger = logging.getLogger(__name__)
+
+# File to store memoized results for descriptions (legacy JSON format, still
+# used by the "json" backend and imported automatically by the sqlite backend)
 MEMO_DESCRIPTIONS_FILE = Path("memoized_descriptions_to_categories.json")
-# File to store memoized results for dataframes
+# SQLite database used by the default "sqlite" description cache backend
+MEMO_DESCRIPTIONS_DB = Path("memoized_descriptions_to_categories.sqlite3")
+# Folder of pickled dataframe lists, one per PDF, named by the PDF's content hash
+MEMO_DATAFRAME_DIR = Path("memoized_dataframes")
+# Legacy path-keyed dataframe cache, imported into MEMO_DATAFRAME_DIR on demand
 MEMO_DATAFRAME_FILE = Path("memoized_files_to_dataframes.json")
+# Description cache backend, "sqlite" (default) or "json"
+MEMO_BACKEND = os.environ.get("MEMO_BACKEND", "sqlite")
+
+# A description key: the prompt/model fingerprint, "|", the description
+_FINGERPRINTED_KEY_RE = re.compile(r"[0-9a-f]{64}\|")
+
+
+class JsonFileCache:
+    """
+    String cache kept in memory and saved as one JSON document.
+
+    The file is read on first access rather than on construction, so opening a
+    cache that is never used costs nothing. Every write rewrites the whole file,
+    so prefer the sqlite backend for large caches. Writes go to a temporary file
+    that is then renamed over the cache, so an interrupted write never leaves a
+    truncated file behind.
+    """
+
+    def __init__(self, path: Path = MEMO_DESCRIPTIONS_FILE):
+        self.path = Path(path)
+        self._data = None
+
+    def _loaded(self) -> dict[str, str]:
+        if self._data is None:
+            if self.path.exists():
+                with open(self.path, "r") as file:
+                    self._data = json.load(file)
+            else:
+                self._data = {}
+        return self._data
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._loaded()
+
+    def __getitem__(self, key: str) -> str:
+        return self._loaded()[key]
+
+    def __len__(self) -> int:
+        return len(self._loaded())
+
+    def get(self, key: str, default: str | None = None) -> str | None:
+        return self._loaded().get(key, default)
+
+    def items(self):
+        return self._loaded().items()
+
+    def update(self, entries: dict[str, str]) -> None:
+        self._loaded().update(entries)
+        self._write()
+
+    def compact(self) -> None:
+        self._write()
+
+    def _write(self) -> None:
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w") as file:
+            json.dump(self._loaded(), file, indent=4)
+        os.replace(tmp_path, self.path)
+
+
+class SqliteDescriptionCache:
+    """
+    Description cache stored in a SQLite database in WAL mode.
+
+    Each ``update`` is a single transaction of ``INSERT OR REPLACE`` statements,
+    so a cache miss costs one small write instead of rewriting the whole cache,
+    and a killed process can never leave a half-written cache. The connection
+    is opened on first access; if the database is new, an existing JSON cache
+    at ``json_path`` is imported into it.
+    """
+
+    def __init__(self, path: Path = MEMO_DESCRIPTIONS_DB, json_path: Path | None = MEMO_DESCRIPTIONS_FILE):
+        self.path = Path(path)
+        self.json_path = json_path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS descriptions (key TEXT PRIMARY KEY, category TEXT NOT NULL)")
+            self._conn = conn
+            self._import_json()
+        return self._conn
+
+    def _import_json(self) -> None:
+        if self.json_path is None or not Path(self.json_path).exists():
+            return
+        if self._conn.execute("SELECT 1 FROM descriptions LIMIT 1").fetchone() is not None:
+            return
+        with open(self.json_path, "r") as file:
+            legacy = json.load(file)
+        with self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO descriptions VALUES (?, ?)", legacy.items())
+        logger.info("Imported %d cached descriptions from %s into %s", len(legacy), self.json_path, self.path)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __getitem__(self, key: str) -> str:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM descriptions").fetchone()[0]
+
+    def get(self, key: str, default: str | None = None) -> str | None:
+        with self._lock:
+            row = self._connection().execute("SELECT category FROM descriptions WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else default
+
+    def items(self):
+        with self._lock:
+            return self._connection().execute("SELECT key, category FROM descriptions").fetchall()
+
+    def update(self, entries: dict[str, str]) -> None:
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO descriptions VALUES (?, ?)", entries.items())
+
+    def compact(self) -> None:
+        """Fold the write-ahead log back into the database and reclaim free pages."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("VACUUM")
+
+
+class DataframeBlobCache:
+    """
+    Content-addressed cache of the tables extracted from each PDF.
+
+    Every entry is the list of DataFrames for one file, pickled to
+    ``<folder>/<sha256 of the PDF>.pkl``, so a renamed or moved statement still
+    hits and a hit is a single binary read. Blobs are written to a temporary
+    file and renamed into place, so concurrent writers never see partial files.
+    """
+
+    def __init__(self, folder: Path = MEMO_DATAFRAME_DIR):
+        self.folder = Path(folder)
 
-# Load existing memoized results or initialize an empty dictionary
-if MEMO_DESCRIPTIONS_FILE.exists():
-    with open(MEMO_DESCRIPTIONS_FILE, "r") as file:
-        memoized_description_data = json.load(file)
-else:
-    memoized_description_data = {}
+    def _blob_path(self, digest: str) -> Path:
+        return self.folder / f"{digest}.pkl"
 
-# Load existing memoized results or initialize an empty dictionary
-if MEMO_DATAFRAME_FILE.exists():
-    with open(MEMO_DATAFRAME_FILE, "r") as file:
-        memoized_df_data = json.load(file)
-else:
-    memoized_df_data = {}
+    def get(self, digest: str) -> list[pd.DataFrame] | None:
+        try:
+            return pd.read_pickle(self._blob_path(digest))
+        except FileNotFoundError:
+            return None
+
+    def put(self, digest: str, dataframes: list[pd.DataFrame]) -> None:
+        self.folder.mkdir(parents=True, exist_ok=True)
+        path = self._blob_path(digest)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        pd.to_pickle(dataframes, tmp_path)
+        os.replace(tmp_path, path)
+
+
+def file_sha256(path: str | Path) -> str:
+    """Return the hex SHA-256 of a file's contents."""
+    with open(path, "rb") as file:
+        return hashlib.file_digest(file, "sha256").hexdigest()
+
+
+DESCRIPTION_CACHE_BACKENDS = {
+    "sqlite": SqliteDescriptionCache,
+    "json": JsonFileCache,
+}
+
+
+def open_description_cache(backend: str = MEMO_BACKEND):
+    """Return the description cache for the named backend."""
+    if backend not in DESCRIPTION_CACHE_BACKENDS:
+        raise ValueError(f"Unknown memo backend: {backend!r}. Use one of {', '.join(DESCRIPTION_CACHE_BACKENDS)}.")
+    return DESCRIPTION_CACHE_BACKENDS[backend]()
+
+
+# Neither cache touches the disk until it is first used: importing this module
+# is free, and a run that never needs a cache never pays for loading it.
+memoized_description_data = open_description_cache()
+memoized_df_blobs = DataframeBlobCache(MEMO_DATAFRAME_DIR)
+memoized_df_data = JsonFileCache(MEMO_DATAFRAME_FILE)
+
+def description_cache_keys(fingerprint: str, description) -> tuple[str | None, str]:
+    """
+    Return the (canonical, description) keys a description is cached under.
+
+    The canonical key hashes the normalized description together with the
+    prompt/model fingerprint, so descriptions differing only in store numbers,
+    dates or reference codes share one entry, and the key does not depend on
+    how LangChain happens to print a chain. The description key is the
+    fingerprint and the description verbatim, which the merchant rules and the
+    neighbour index are built from.
+
+    A description with nothing distinctive left after normalization, such as
+    ``01/03 12345678`` or ``CHECK 1234``, has no canonical key (None): it would
+    be shared by every such description.
+    """
+    normalized = distinctive_description(description)
+    canonical_key = hashlib.sha256(f"{fingerprint}|{normalized}".encode()).hexdigest() if normalized else None
+    description_key = f"{fingerprint}|{description}"
+    return canonical_key, description_key
+
+
+def cached_description_category(fingerprint: str, description) -> str | None:
+    """
+    Return the memoized category for a description, or None on a cache miss.
+
+    Caches written by older versions keyed descriptions verbatim, without a
+    fingerprint; those entries are still read, but never written.
+    """
+    for key in description_cache_keys(fingerprint, description):
+        if key is not None:
+            category = memoized_description_data.get(key)
+            if category is not None:
+                return category
+    return memoized_description_data.get(f"{description}")
+
+
+def cached_description_items(fingerprint: str):
+    """
+    Yield the (key, category) pairs cached for a fingerprint, with the
+    fingerprint stripped from description keys.
+
+    Entries of other fingerprints are skipped; canonical hashes and the
+    verbatim descriptions of older caches are passed through as they are.
+    """
+    prefix = f"{fingerprint}|"
+    for key, category in memoized_description_data.items():
+        if key.startswith(prefix):
+            yield key[len(prefix):], category
+        elif not _FINGERPRINTED_KEY_RE.match(key):
+            yield key, category
+
+
+@timed("memo_store_descriptions")
+def store_description_categories(fingerprint: str, categories: dict[str, str]) -> None:
+    """Memoize several description -> category results in a single atomic write."""
+    if not categories:
+        return
+    entries = {}
+    for description, category in categories.items():
+        for key in description_cache_keys(fingerprint, description):
+            if key is not None:
+                entries[key] = category
+    memoized_description_data.update(entries)
 
 
 def memoize_description_to_file(func):
     """Decorator to memoize chain function results to a file."""
-    def wrapper(chain, description):
-        # Create a unique key based on the description and chain
-        description_key = f"{description}"
-        chain_specific_key = hashlib.sha256(f"{chain}|{description}".encode()).hexdigest()
-
-        # Pure cache hit: both keys are already populated. They are always
-        # written together with the same value, so there is nothing new to
-        # store -- return the cached result without rewriting the file.
-        if description_key in memoized_description_data and chain_specific_key in memoized_description_data:
-            # print(f"memoized result for '{description_key}'")
-            return memoized_description_data[chain_specific_key]
-
-        result = None
-        if description_key in memoized_description_data:
-            # print(f"memoized result for '{description_key}'")
-            result = memoized_description_data[description_key]
-        # Check if the result is already memoized
-        if chain_specific_key in memoized_description_data:
-            # print(f"memoized result for '{description_key}'")
-            # print("Cached result: " + memoized_description_data[key])
-            result = memoized_description_data[chain_specific_key]
+    @timed("memo_description")
+    @functools.wraps(func)
+    def wrapper(chain, description, fingerprint):
+        keys = [key for key in description_cache_keys(fingerprint, description) if key is not None]
+
+        # Pure cache hit: every key is already populated, so there is nothing
+        # new to store -- return the cached result without writing.
+        if all(key in memoized_description_data for key in keys):
+            # print(f"memoized result for '{description}'")
+            return memoized_description_data[keys[0]]
+
+        # Partial hit (only one of the keys is populated) or a miss; either
+        # way every key is (re)written below.
+        result = cached_description_category(fingerprint, description)
         # Invoke the function and store the result
         if result is None:
             # print(f"cache miss for '{description}'")
             result = func(chain, description)
-        # Add the result to the memoized dictionary
-        memoized_description_data[chain_specific_key] = result
-        memoized_description_data[description_key] = result
-        # Save updated memoized data to file (only reached when the cache
-        # actually gained/changed a key, i.e. not on a pure hit)
-        with open(MEMO_DESCRIPTIONS_FILE, "w") as file:
-            json.dump(memoized_description_data, file, indent=4)
+        # Save updated memoized data (only reached when the cache actually
+        # gained/changed a key, i.e. not on a pure hit)
+        store_description_categories(fingerprint, {description: result})
 
         return result
     return wrapper
 
 
+def cached_dataframes(pdf_path) -> list[pd.DataFrame] | None:
+    """Return the memoized tables for a PDF, or None on a cache miss."""
+    digest = file_sha256(pdf_path)
+    result = memoized_df_blobs.get(digest)
+    if result is not None:
+        return result
+    # Statements cached by an older version are keyed by path in the legacy
+    # JSON file; convert them instead of re-running extraction.
+    legacy = memoized_df_data.get(f"{pdf_path}")
+    if legacy is not None:
+        result = [pd.DataFrame(data) for data in json.loads(legacy)]
+        memoized_df_blobs.put(digest, result)
+    return result
+
+
+def store_dataframes(pdf_path, dataframes: list[pd.DataFrame]) -> None:
+    """Memoize the tables extracted from a PDF under its content hash."""
+    memoized_df_blobs.put(file_sha256(pdf_path), dataframes)
+
+
 def memoize_dataframe_to_file(func):
-    """Decorator to memoize dataframe results to a file."""
+    """Decorator to memoize dataframe results to a file, keyed by the PDF's contents."""
+    @timed("memo_dataframe")
+    @functools.wraps(func)
     def wrapper(pdf_path):
-        # Create a unique key based on the description and chain
-        key = f"{pdf_path}"
-        if key in memoized_df_data:
+        result = cached_dataframes(pdf_path)
+        if result is not None:
             # print(f"memoized result for '{pdf_path}'")
-            # Parse the JSON string
-            parsed = json.loads(memoized_df_data[key])
-            # Convert each JSON object (list of dicts) to a DataFrame
-            result = [pd.DataFrame(data) for data in parsed]
-            # Cache hit: nothing changed, so skip re-serializing and
-            # rewriting the whole file.
             return result
-        # Invoke the function and store the result
         # print(f"cache miss for '{pdf_path}'")
         result: list[pd.DataFrame] = func(pdf_path)
-        # Add the result to the memoized dictionary
-        # Convert each DataFrame to a JSON dict
-        json_list = [df.to_dict(orient='records') for df in result]
-        # convert json_list to a JSON string
-        memoized_df_data[key] = json.dumps(json_list)
-        # Save updated memoized data to file (only reached on a miss)
-        with open(MEMO_DATAFRAME_FILE, "w") as file:
-            json.dump(memoized_df_data, file, indent=4)
+        store_dataframes(pdf_path, result)
         return result
     return wrapper
 
 
-@memoize_description_to_file
-def memoized_invoke_chain_transaction(chain, transaction):
+@timed("llm_call")
+def invoke_chain_transaction(chain, transaction):
     """
-    Memoize the result of invoking a chain with a given transaction.
+    Invoke a chain with a given transaction, bypassing the memo cache.
 
     Parameters
     ----------
@@ -112,3 +364,17 @@ def memoized_invoke_chain_transaction(chain, transaction):
     return chain.invoke({
         "transaction": transaction,
     }).strip() # sometimes strings come in with random spaces or newlines
+
+
+# Memoized variant used by the sequential categorization path.
+memoized_invoke_chain_transaction = memoize_description_to_file(invoke_chain_transaction)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the memoized description cache.")
+    parser.add_argument("command", choices=["compact"], help="compact: fold pending writes into the cache file and reclaim space")
+    parser.add_argument("--backend", default=MEMO_BACKEND, choices=DESCRIPTION_CACHE_BACKENDS.keys())
+    args = parser.parse_args()
+    cache = open_description_cache(args.backend)
+    cache.compact()
+    print(f"Compacted {len(cache)} cached descriptions")
@@ -0,0 +1,114 @@
+"""
+LLM clients selectable by name, built only when a run asks for one.
+
+Each factory imports its client library on call, so choosing Ollama never
+imports the OpenAI client and vice versa. ``stub`` is a deterministic local
+model for benchmarking the pipeline without Ollama or the network: it maps
+descriptions to categories with regexes and sleeps to imitate model latency.
+"""
+
+import json
+import os
+import re
+import time
+
+DEFAULT_MODEL = "gemma2:27b"
+# Seconds a client waits for one LLM response before giving up on it
+REQUEST_TIMEOUT_SECONDS = 120
+
+# Stub model latency in seconds: a fixed cost per request plus a cost per
+# description answered, so batching and concurrency changes show up in timings
+STUB_LLM_LATENCY = float(os.environ.get("STUB_LLM_LATENCY", "0.2"))
+STUB_LLM_ITEM_LATENCY = float(os.environ.get("STUB_LLM_ITEM_LATENCY", "0.02"))
+# Optional JSON file of {"<regex>": "<CATEGORY>"} replacing DEFAULT_STUB_RULES
+STUB_LLM_RULES = os.environ.get("STUB_LLM_RULES")
+
+DEFAULT_STUB_RULES = {
+    r"SHELL|EXXON|MOBIL|CHEVRON|SUNOCO": "GAS",
+    r"STOP & SHOP|WHOLE FOODS|TRADER JOE|GROCER|MARKET": "GROCERIES",
+    r"STARBUCKS|DUNKIN|CAFE|COFFEE": "COFFEE",
+    r"RESTAURANT|PIZZA|GRILL|DOORDASH|GRUBHUB|UBER EATS": "RESTAURANTS",
+    r"UBER|LYFT|MBTA|AIRLINE|DELTA|JETBLUE": "TRAVEL",
+    r"AMAZON|AMZN|TARGET|WALMART": "SHOPPING",
+    r"NETFLIX|SPOTIFY|1PASSWORD|APPLE\.COM": "SUBSCRIPTION",
+    r"ATT|VERIZON|COMCAST|XFINITY": "BILLS",
+    r"PAYMENT|AUTOPAY": "CREDIT_CARD_PAYMENT",
+    r"INTEREST": "INTEREST",
+    r"PAYROLL|DIRECT DEP": "WAGES",
+}
+
+_NUMBERED_LINE_RE = re.compile(r"^\s*(\d+)\.\s+(.*)$")
+
+
+class StubLLM:
+    """
+    Deterministic stand-in for an LLM client.
+
+    Called with the rendered prompt (a LangChain prompt value or a string), it
+    answers the transaction on the prompt's last line, or every line of a
+    trailing numbered list ``1. ...``, ``2. ...`` with one numbered category per
+    line, as the batch prompt asks. Being a plain callable, it slots into
+    ``prompt | model | parser`` like a real client.
+    """
+
+    def __init__(self, rules: dict[str, str] | None = None, latency: float = STUB_LLM_LATENCY, item_latency: float = STUB_LLM_ITEM_LATENCY, default_category: str = "OTHER"):
+        self.model = "stub"
+        self.rules = [(re.compile(pattern, re.IGNORECASE), category) for pattern, category in (rules or DEFAULT_STUB_RULES).items()]
+        self.latency = latency
+        self.item_latency = item_latency
+        self.default_category = default_category
+
+    def category(self, description: str) -> str:
+        for pattern, category in self.rules:
+            if pattern.search(description):
+                return category
+        return self.default_category
+
+    def __call__(self, prompt) -> str:
+        text = prompt.to_string() if hasattr(prompt, "to_string") else str(prompt)
+        lines = text.rstrip().splitlines()
+        numbered = []
+        for line in reversed(lines):
+            match = _NUMBERED_LINE_RE.match(line)
+            if match is None:
+                break
+            numbered.append(match.group(2))
+        numbered.reverse()
+        time.sleep(self.latency + self.item_latency * max(1, len(numbered)))
+        if len(numbered) > 1:
+            return "\n".join(f"{number}. {self.category(description)}" for number, description in enumerate(numbered, start=1))
+        return self.category(lines[-1] if lines else "")
+
+
+def _ollama(model: str, request_timeout: float):
+    from langchain_ollama import OllamaLLM
+    return OllamaLLM(model=model, temperature=0.0, request_timeout=request_timeout)
+
+
+def _openai(model: str, request_timeout: float):
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model=model, temperature=0.0, request_timeout=request_timeout)
+
+
+def _stub(request_timeout: float):
+    # Answers locally in STUB_LLM_LATENCY seconds; there is no request to time out
+    rules = None
+    if STUB_LLM_RULES:
+        with open(STUB_LLM_RULES, "r") as file:
+            rules = json.load(file)
+    return StubLLM(rules)
+
+
+MODEL_FACTORIES = {
+    "gemma2:27b": lambda request_timeout: _ollama("gemma2:27b", request_timeout), # Most accurate free model. Not very fast.
+    "gpt-4": lambda request_timeout: _openai("gpt-4", request_timeout), # Works best, but slow & most expensive.
+    "gpt-4o-mini": lambda request_timeout: _openai("gpt-4o-mini", request_timeout), # Works slightly faster than gpt-4, less accurate, still costs money
+    "stub": _stub, # Local and deterministic, for benchmarks; see StubLLM
+}
+
+
+def create_model(name: str = DEFAULT_MODEL, request_timeout: float = REQUEST_TIMEOUT_SECONDS):
+    """Build the client for a model name listed in MODEL_FACTORIES, giving up on a response after ``request_timeout`` seconds."""
+    if name not in MODEL_FACTORIES:
+        raise ValueError(f"Unknown model: {name!r}. Use one of {', '.join(MODEL_FACTORIES)}.")
+    return MODEL_FACTORIES[name](request_timeout)
@@ -0,0 +1,145 @@
+"""Nearest-neighbour category lookup for near-duplicate merchant descriptions.
+
+Descriptions that survive normalization differently ("STARBUCKS STORE" and
+"STARBUCKS STORES BOSTON") are neither exact cache hits nor merchant-rule
+prefixes, yet are obviously the same merchant. Each categorized description is
+indexed by a MinHash signature of its character trigrams, bucketed with
+locality-sensitive hashing, and stored in SQLite so the index persists between
+runs, grows one row at a time, and answers a lookup with a single indexed query.
+"""
+
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from rules import UNRESOLVED_CATEGORIES, distinctive_description, normalize_description
+
+# Folder of persisted indexes, one SQLite database per prompt/model fingerprint
+NEIGHBOURS_DIR = Path("memoized_neighbours")
+# Estimated Jaccard similarity above which a neighbour's category is reused
+DEFAULT_SIMILARITY_THRESHOLD = 0.8
+
+SHINGLE_SIZE = 3
+NUM_PERMUTATIONS = 128
+# 16 bands of 8 rows: a pair at 0.8 similarity shares a bucket 95% of the time,
+# a pair at 0.5 only 6%, so common suffixes ("STORE", "INC") don't flood buckets.
+BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+
+# Fixed seed: signatures stored in the database must stay comparable across runs.
+_rng = np.random.default_rng(20240101)
+_A = _rng.integers(1, 2**32, size=NUM_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 2**32, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_MASK = np.uint64(0xFFFFFFFF)
+
+
+def shingles(text: str) -> set[str]:
+    """Character trigrams of the normalized description, padded so short names still have some."""
+    padded = f" {normalize_description(text)} "
+    if len(padded.strip()) == 0:
+        return set()
+    return {padded[i:i + SHINGLE_SIZE] for i in range(max(1, len(padded) - SHINGLE_SIZE + 1))}
+
+
+def minhash(text: str) -> np.ndarray | None:
+    """MinHash signature (NUM_PERMUTATIONS uint32 values) of a description, None if it has no shingles."""
+    grams = shingles(text)
+    if not grams:
+        return None
+    hashes = np.fromiter((zlib.crc32(g.encode()) for g in grams), dtype=np.uint64, count=len(grams))
+    # multiply-shift hashing mod 2**32, one row per permutation
+    permuted = (np.outer(_A, hashes) + _B[:, None]) & _MASK
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def neighbour_index_path(fingerprint: str) -> Path:
+    """Database of the index for one prompt/model fingerprint, so models never share answers."""
+    return NEIGHBOURS_DIR / f"{fingerprint[:16]}.sqlite3"
+
+
+def _bands(signature: np.ndarray) -> list[tuple[int, bytes]]:
+    return [(band, signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes()) for band in range(BANDS)]
+
+
+class NeighbourIndex:
+    """
+    Persistent MinHash LSH index from normalized descriptions to categories.
+
+    ``lookup`` returns the category of the most similar indexed description if
+    its estimated Jaccard similarity reaches the threshold. The database is
+    opened on first access.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS entries (id INTEGER PRIMARY KEY, description TEXT UNIQUE NOT NULL, category TEXT NOT NULL, signature BLOB NOT NULL)")
+                conn.execute("CREATE TABLE IF NOT EXISTS buckets (band INTEGER NOT NULL, bucket BLOB NOT NULL, entry_id INTEGER NOT NULL)")
+                conn.execute("CREATE INDEX IF NOT EXISTS buckets_by_band ON buckets (band, bucket)")
+            self._conn = conn
+        return self._conn
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def add_many(self, items) -> int:
+        """
+        Index (description, category) pairs in one transaction; returns how many were new.
+
+        Descriptions with nothing distinctive left after normalization (see
+        ``distinctive_description``) are neither indexed nor looked up.
+        """
+        added = 0
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                for description, category in items:
+                    normalized = distinctive_description(description)
+                    signature = minhash(normalized)
+                    if signature is None or category in UNRESOLVED_CATEGORIES:
+                        continue
+                    cursor = conn.execute(
+                        "INSERT OR IGNORE INTO entries (description, category, signature) VALUES (?, ?, ?)",
+                        (normalized, category, signature.tobytes()),
+                    )
+                    if cursor.rowcount == 0:
+                        continue
+                    conn.executemany(
+                        "INSERT INTO buckets (band, bucket, entry_id) VALUES (?, ?, ?)",
+                        [(band, bucket, cursor.lastrowid) for band, bucket in _bands(signature)],
+                    )
+                    added += 1
+        return added
+
+    def add(self, description: str, category: str) -> None:
+        self.add_many([(description, category)])
+
+    def lookup(self, description: str, threshold: float = DEFAULT_SIMILARITY_THRESHOLD) -> str | None:
+        # "CHECK 1234" and "CHECK 5678" would have the same signature
+        signature = minhash(distinctive_description(description))
+        if signature is None:
+            return None
+        bands = _bands(signature)
+        query = ("SELECT DISTINCT e.category, e.signature FROM buckets b JOIN entries e ON e.id = b.entry_id WHERE "
+                 + " OR ".join(["(b.band = ? AND b.bucket = ?)"] * len(bands)))
+        with self._lock:
+            candidates = self._connection().execute(query, [value for pair in bands for value in pair]).fetchall()
+        if not candidates:
+            return None
+        signatures = np.frombuffer(b"".join(blob for _, blob in candidates), dtype=np.uint32).reshape(len(candidates), -1)
+        similarities = (signatures == signature).mean(axis=1)
+        best = int(similarities.argmax())
+        return candidates[best][0] if similarities[best] >= threshold else None
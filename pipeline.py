@@ -0,0 +1,148 @@
+"""
+Overlapped extract -> categorize -> write pipeline for statements.
+
+Extraction (Docling, CPU-bound) runs in an executor, categorization (mostly
+waiting on the LLM) runs on one dedicated thread, and CSVs are written on
+another, all driven by one asyncio loop. Bounded queues between the stages
+provide backpressure: extraction pauses once ``queue_size`` statements are
+waiting to be categorized, so a slow model never piles every extracted
+statement up in memory. Statements pass through every stage in input order,
+and categorization stays on a single thread, so the description cache still
+has one writer and the results match the sequential run.
+"""
+
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+# Statements allowed to wait between two stages before the upstream stage pauses
+DEFAULT_QUEUE_SIZE = 4
+
+# Queue sentinel marking the end of the statements
+_DONE = object()
+
+
+@dataclass
+class StageCounters:
+    """Throughput of one pipeline stage."""
+    name: str
+    statements: int = 0
+    transactions: int = 0
+    # time spent doing the stage's own work
+    busy_seconds: float = 0.0
+    # time spent waiting for the previous stage
+    starved_seconds: float = 0.0
+    # time spent waiting for room in the next stage's queue (backpressure)
+    blocked_seconds: float = 0.0
+
+    def record(self, seconds: float, transactions: int) -> None:
+        self.statements += 1
+        self.transactions += transactions
+        self.busy_seconds += seconds
+
+    def summary(self) -> str:
+        rate = self.transactions / self.busy_seconds if self.busy_seconds else 0.0
+        return (f"{self.name:<10} {self.statements} statements, {self.transactions} transactions, "
+                f"busy {self.busy_seconds:.1f}s ({rate:.1f} transactions/s), "
+                f"starved {self.starved_seconds:.1f}s, blocked {self.blocked_seconds:.1f}s")
+
+
+@dataclass
+class PipelineStats:
+    extract: StageCounters = field(default_factory=lambda: StageCounters("extract"))
+    categorize: StageCounters = field(default_factory=lambda: StageCounters("categorize"))
+    write: StageCounters = field(default_factory=lambda: StageCounters("write"))
+    wall_seconds: float = 0.0
+
+    def summary(self) -> str:
+        stages = "\n".join(stage.summary() for stage in (self.extract, self.categorize, self.write))
+        return f"Pipeline finished in {self.wall_seconds:.1f}s\n{stages}"
+
+
+def _timed(func, *args):
+    """Call ``func`` and return (seconds, result). Top-level so process pools can pickle it."""
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+async def _put(queue: asyncio.Queue, item, counters: StageCounters) -> None:
+    start = time.perf_counter()
+    await queue.put(item)
+    counters.blocked_seconds += time.perf_counter() - start
+
+
+async def _get(queue: asyncio.Queue, counters: StageCounters):
+    start = time.perf_counter()
+    item = await queue.get()
+    counters.starved_seconds += time.perf_counter() - start
+    return item
+
+
+async def run_pipeline(pdf_paths: list[str], extract: callable, categorize: callable, write: callable, extract_executor: Executor, queue_size: int = DEFAULT_QUEUE_SIZE) -> PipelineStats:
+    """
+    Push every statement through ``extract(pdf_path)``, ``categorize(transactions)``
+    and ``write(pdf_path, categorized_data)``, overlapping the stages.
+
+    ``extract`` runs on ``extract_executor`` and must be picklable if that is a
+    process pool. At most ``queue_size`` statements wait between two stages; the
+    first failure in any stage cancels the others and is re-raised.
+    """
+    loop = asyncio.get_running_loop()
+    stats = PipelineStats()
+    extracted = asyncio.Queue(maxsize=queue_size)
+    categorized = asyncio.Queue(maxsize=queue_size)
+    categorize_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="categorize")
+    write_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="write")
+
+    async def extract_stage():
+        # Queue the extraction futures themselves, in input order, so several
+        # statements extract in parallel while the order downstream is kept.
+        for pdf_path in pdf_paths:
+            future = loop.run_in_executor(extract_executor, _timed, extract, pdf_path)
+            await _put(extracted, (pdf_path, future), stats.extract)
+        await extracted.put(_DONE)
+
+    async def categorize_stage():
+        while (item := await _get(extracted, stats.categorize)) is not _DONE:
+            pdf_path, future = item
+            start = time.perf_counter()
+            extract_seconds, transactions = await future
+            stats.categorize.starved_seconds += time.perf_counter() - start
+            stats.extract.record(extract_seconds, len(transactions))
+            seconds, categorized_data = await loop.run_in_executor(categorize_thread, _timed, categorize, transactions)
+            stats.categorize.record(seconds, len(categorized_data))
+            await _put(categorized, (pdf_path, categorized_data), stats.categorize)
+        await categorized.put(_DONE)
+
+    async def write_stage():
+        while (item := await _get(categorized, stats.write)) is not _DONE:
+            pdf_path, categorized_data = item
+            seconds, _ = await loop.run_in_executor(write_thread, _timed, write, pdf_path, categorized_data)
+            stats.write.record(seconds, len(categorized_data))
+
+    start = time.perf_counter()
+    tasks = [asyncio.create_task(stage()) for stage in (extract_stage, categorize_stage, write_stage)]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    finally:
+        categorize_thread.shutdown(wait=False, cancel_futures=True)
+        write_thread.shutdown(wait=False, cancel_futures=True)
+    stats.wall_seconds = time.perf_counter() - start
+    return stats
+
+
+def run_statement_pipeline(pdf_paths: list[str], extract: callable, categorize: callable, write: callable, workers: int = 1, queue_size: int = DEFAULT_QUEUE_SIZE, extract_executor: Executor | None = None) -> PipelineStats:
+    """
+    Run the pipeline to completion. Extraction uses a pool of ``workers``
+    processes unless ``extract_executor`` is given.
+    """
+    if extract_executor is not None:
+        return asyncio.run(run_pipeline(pdf_paths, extract, categorize, write, extract_executor, queue_size))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return asyncio.run(run_pipeline(pdf_paths, extract, categorize, write, pool, queue_size))
@@ -0,0 +1,163 @@
+"""Deterministic merchant rules, consulted before a description is sent to the LLM.
+
+Recurring merchants show up with a different store number, date or reference
+code on every statement ("SHELL OIL 57442 BOSTON MA", "AMZN MKTP US*2K4AB1").
+Descriptions are normalized to their merchant words and looked up in a token
+trie built from already-categorized descriptions and the local category hints,
+so only genuinely new merchants need an LLM call.
+"""
+
+import re
+
+# Categories that must never be reused by a rule
+UNRESOLVED_CATEGORIES = {"INPUT NEEDED"}
+
+_DATE_RE = re.compile(r"\b\d{1,2}/\d{1,2}(?:/\d{2,4})?\b")
+_SEPARATOR_RE = re.compile(r"[^A-Z0-9&.]+")
+_SHA256_RE = re.compile(r"[0-9a-f]{64}")
+# "<NAMES> is/are (each) a/an <CATEGORY> (category)." as written in category_hints.local.txt
+_HINT_RE = re.compile(
+    r"^(?P<names>.+?)\s+(?:is|are)(?:\s+each)?\s+(?:an?\s+)?(?P<category>[A-Z][A-Z_ ]*?)(?:\s+category)?\s*\.?$"
+)
+_HINT_NAME_SEPARATOR_RE = re.compile(r"\s*,\s*|\s+and\s+")
+
+
+def _is_noise(token: str) -> bool:
+    """Store numbers, reference codes and amounts: tokens that are at least a third digits."""
+    digits = sum(c.isdigit() for c in token)
+    return digits * 3 >= len(token)
+
+
+def normalize_description(description: str) -> str:
+    """
+    Reduce a transaction description to its merchant words.
+
+    Uppercases, removes dates, splits on punctuation other than ``&`` and
+    ``.``, and drops digit-heavy tokens (store numbers, reference codes).
+    """
+    text = _DATE_RE.sub(" ", str(description).upper())
+    tokens = (token.strip(".") for token in _SEPARATOR_RE.split(text))
+    return " ".join(token for token in tokens if token and not _is_noise(token))
+
+
+def distinctive_description(description: str) -> str:
+    """
+    The normalized description, or "" when it no longer tells payments apart.
+
+    A longer description reduced to a single token, such as ``CHECK 1234`` or
+    ``SQ 5531``, was told apart by the number that normalization dropped, so
+    the token left over names no merchant.
+    """
+    normalized = normalize_description(description)
+    if " " not in normalized and len(str(description).split()) > 1:
+        return ""
+    return normalized
+
+
+def parse_category_hints(lines: list[str]) -> list[tuple[str, str]]:
+    """
+    Return (merchant, category) pairs from hint lines like ``ACME MARKET is a FOOD category.``
+
+    ``A and B are WAGES category.`` yields one pair per merchant. Multi-word
+    categories are joined with underscores (``PHONE BILL`` -> ``PHONE_BILL``),
+    since spaces separate levels of a category path. Lines in any other form
+    are ignored; they still reach the LLM as part of the prompt.
+    """
+    pairs = []
+    for line in lines:
+        match = _HINT_RE.match(line.strip())
+        if match is None:
+            continue
+        category = "_".join(match.group("category").split())
+        for name in _HINT_NAME_SEPARATOR_RE.split(match.group("names")):
+            if name:
+                pairs.append((name, category))
+    return pairs
+
+
+def description_items(cached_items):
+    """Yield the (description, category) pairs of the cache, skipping its hashed canonical keys."""
+    for key, category in cached_items:
+        if not _SHA256_RE.fullmatch(key):
+            yield key, category
+
+
+class _Node:
+    __slots__ = ("children", "category", "ambiguous")
+
+    def __init__(self):
+        self.children: dict[str, "_Node"] = {}
+        self.category: str | None = None
+        self.ambiguous = False
+
+
+class MerchantIndex:
+    """
+    Token trie from normalized merchant names to categories.
+
+    ``lookup`` returns the category of the longest known merchant that prefixes
+    the normalized description, so "SHELL OIL" also matches "SHELL OIL 57442
+    BOSTON MA". Names that were seen with conflicting categories are ambiguous
+    and never match, even when a shorter merchant prefix would.
+    """
+
+    def __init__(self):
+        self._root = _Node()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, name: str, category: str, if_absent: bool = False) -> None:
+        """
+        Index a merchant name.
+
+        A name seen again with a different category becomes ambiguous, unless
+        ``if_absent`` is set, in which case an existing category is kept.
+        """
+        tokens = distinctive_description(name).split()
+        if not tokens or category in UNRESOLVED_CATEGORIES:
+            return
+        node = self._root
+        for token in tokens:
+            node = node.children.setdefault(token, _Node())
+        if node.category is None:
+            node.category = category
+            self._size += 1
+        elif node.category != category and not if_absent:
+            node.ambiguous = True
+
+    def lookup(self, description: str) -> str | None:
+        """
+        Category of the longest indexed merchant prefixing the description; None if unknown or ambiguous.
+
+        A one-token merchant such as ``AMAZON`` only matches a description that
+        normalizes to exactly that token, since a single token like ``SQ`` or
+        ``CHECK`` often names a payment type rather than a merchant; longer
+        merchant names match as a prefix.
+        """
+        category = None
+        node = self._root
+        tokens = normalize_description(description).split()
+        for depth, token in enumerate(tokens, 1):
+            node = node.children.get(token)
+            if node is None:
+                break
+            if node.category is not None and (depth > 1 or len(tokens) == 1):
+                category = None if node.ambiguous else node.category
+        return category
+
+    @classmethod
+    def build(cls, cached_items, hint_lines: list[str]) -> "MerchantIndex":
+        """
+        Build the index from (key, category) cache items and hint lines.
+
+        Categories the LLM actually produced take precedence over hints for the
+        same merchant. Hash keys in the cache are skipped.
+        """
+        index = cls()
+        for key, category in description_items(cached_items):
+            index.add(key, category)
+        for name, category in parse_category_hints(hint_lines):
+            index.add(name, category, if_absent=True)
+        return index
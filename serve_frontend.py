@@ -1,15 +1,36 @@
 #!/usr/bin/env python3
 """Serve the frontend/build directory on localhost."""
 
+import argparse
+import gzip
+import hashlib
+import http.client
 import http.server
+import json
+import logging
+import mimetypes
 import os
 import re
-import socketserver
-from collections import defaultdict
+import threading
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import parse_qs, unquote, urlsplit
 
 import lzstring
 
+from flowgraph import FlowGraph
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip variants are served without it
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
 PORT = 8080
+# Interface the server listens on: this machine only, unless asked otherwise
+HOST = "127.0.0.1"
 DIRECTORY = os.path.join(os.path.dirname(__file__), "frontend", "build")
 
 EXAMPLE_DIAGRAM = """\
@@ -40,58 +61,50 @@ _EXTRA = 50  # breathing room added to both dimensions
 
 
 
-def compute_diagram_size(diagram: str) -> tuple[int, int]:
+# Diagram sizes remembered, by a digest of the diagram text
+DIAGRAM_SIZE_CACHE_SIZE = 256
+_size_cache: OrderedDict[bytes, tuple[int, int]] = OrderedDict()
+_size_cache_lock = threading.Lock()
+
+
+def compute_diagram_size(diagram: str | FlowGraph) -> tuple[int, int]:
     """
     Compute (width, height) to naturally fit the diagram:
       height = sum of all values in the tallest column
                + (n_nodes - 1) * gap + margins + extra
       width  = (num_columns - 1) * col_spacing + node_w + margins + extra
-    """
-    flow_re = re.compile(
-        r"^([^/'\[\n][^\[\n]*?)\s+\[(\d+(?:\.\d+)?)\]\s+([^\n#]+)",
-        re.MULTILINE,
-    )
 
-    incoming: dict[str, float] = {}
-    outgoing: dict[str, float] = {}
-    adj: dict[str, list[str]] = defaultdict(list)
+    A FlowGraph is sized directly. Text is parsed first, and its size kept in
+    an LRU keyed on a digest of the text, so sizing the same diagram again (a
+    re-published or re-linked diagram) is one hash.
+    """
+    if isinstance(diagram, FlowGraph):
+        return diagram_size(diagram)
+    key = hashlib.blake2b(diagram.encode("utf-8"), digest_size=16).digest()
+    with _size_cache_lock:
+        size = _size_cache.get(key)
+        if size is not None:
+            _size_cache.move_to_end(key)
+            return size
+    size = diagram_size(FlowGraph.parse(diagram))
+    with _size_cache_lock:
+        _size_cache[key] = size
+        while len(_size_cache) > DIAGRAM_SIZE_CACHE_SIZE:
+            _size_cache.popitem(last=False)
+    return size
 
-    for m in flow_re.finditer(diagram):
-        src = m.group(1).strip()
-        amt = float(m.group(2))
-        tgt = m.group(3).strip()
-        outgoing[src] = outgoing.get(src, 0) + amt
-        incoming[tgt] = incoming.get(tgt, 0) + amt
-        adj[src].append(tgt)
 
-    all_nodes = set(incoming) | set(outgoing)
-    if not all_nodes:
+def diagram_size(graph: FlowGraph) -> tuple[int, int]:
+    """(width, height) fitting the graph; see compute_diagram_size."""
+    if not len(graph):
         return 1200, 800
 
-    # BFS to assign each node its deepest column (longest-path depth).
-    origins = [n for n in all_nodes if n not in incoming]
-    stages: dict[str, int] = {n: 0 for n in origins}
-    queue = list(origins)
-    head = 0
-    while head < len(queue):
-        node = queue[head]
-        head += 1
-        for neighbor in adj.get(node, []):
-            new_stage = stages[node] + 1
-            if stages.get(neighbor, -1) < new_stage:
-                stages[neighbor] = new_stage
-                queue.append(neighbor)
-    for n in all_nodes:
-        if n not in stages:
-            stages[n] = 0
-
-    num_columns = max(stages.values()) + 1
+    stages = graph.stages()
+    num_columns = max(stages) + 1
 
     # Group nodes by column; each node's "value" is its max flow.
     by_column: dict[int, list[float]] = defaultdict(list)
-    for node in all_nodes:
-        col = stages[node]
-        value = max(incoming.get(node, 0.0), outgoing.get(node, 0.0))
+    for col, value in zip(stages, graph.node_values()):
         by_column[col].append(value)
 
     # Height: proportional scaling so the smallest node is at least _MIN_NODE_PX px.
@@ -111,25 +124,515 @@ def compute_diagram_size(diagram: str) -> tuple[int, int]:
     return max(400, width), max(300, height)
 
 
+def _sized(diagram: str | FlowGraph, width: int | None, height: int | None) -> tuple[str, int, int]:
+    """The diagram's text and its size, fitted to the diagram where not given."""
+    if width is None or height is None:
+        auto_w, auto_h = compute_diagram_size(diagram)
+        width = width if width is not None else auto_w
+        height = height if height is not None else auto_h
+    text = diagram.to_text() if isinstance(diagram, FlowGraph) else diagram
+    return text, width, height
+
+
+def diagram_input(diagram: str | FlowGraph, width: int | None = None, height: int | None = None) -> str:
+    """The diagram text plus the size settings Sankeymatic reads, fitted to the diagram unless given."""
+    text, width, height = _sized(diagram, width, height)
+    return f"{text}\nsize w {width}\nsize h {height}\n"
+
+
 def diagram_to_url(
-    diagram: str,
+    diagram: str | FlowGraph,
     port: int = PORT,
     width: int | None = None,
     height: int | None = None,
 ) -> str:
     """Return a deep-link URL for the given Sankeymatic diagram text."""
-    if width is None or height is None:
-        auto_w, auto_h = compute_diagram_size(diagram)
-        width = width if width is not None else auto_w
-        height = height if height is not None else auto_h
-    full_input = f"{diagram}\nsize w {width}\nsize h {height}\n"
-    compressed = lzstring.LZString().compressToEncodedURIComponent(full_input)
+    compressed = lzstring.LZString().compressToEncodedURIComponent(diagram_input(diagram, width, height))
     return f"http://localhost:{port}/?i={compressed}"
 
 
-class Handler(http.server.SimpleHTTPRequestHandler):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, directory=DIRECTORY, **kwargs)
+# Diagrams are POSTed here and read back from /d/<id>
+DIAGRAM_API_PATH = "/api/diagrams"
+# Largest diagram accepted; real budgets are a few kilobytes
+MAX_DIAGRAM_BYTES = 4 * 1024 * 1024
+# Diagrams held in memory; older ones are spilled to DIAGRAM_DIR
+DIAGRAM_CACHE_SIZE = 64
+DIAGRAM_DIR = "memoized_diagrams"
+# Spilled diagrams kept on disk; the least recently used are deleted beyond this
+DIAGRAM_SPILL_LIMIT = 1024
+_DIAGRAM_ID_RE = re.compile(r"[0-9a-f]{16}")
+
+
+def diagram_id(text: str) -> str:
+    """Short content hash naming a stored diagram: the same text always gets the same ID."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+class DiagramStore:
+    """
+    Posted diagrams by ID, in a bounded LRU.
+
+    The least recently used diagrams beyond ``capacity`` are written to
+    ``spill_dir`` rather than dropped, and read back (and moved to the front)
+    when requested again. Only the ``spill_limit`` most recently used spilled
+    files are kept; spilled diagrams also survive a server restart.
+    """
+
+    def __init__(self, capacity: int = DIAGRAM_CACHE_SIZE, spill_dir: str = DIAGRAM_DIR, spill_limit: int = DIAGRAM_SPILL_LIMIT):
+        self.capacity = capacity
+        self.spill_dir = spill_dir
+        self.spill_limit = spill_limit
+        self._diagrams: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._diagrams)
+
+    def put(self, text: str) -> str:
+        """Store the diagram text and return its ID."""
+        key = diagram_id(text)
+        with self._lock:
+            self._remember(key, text)
+        return key
+
+    def get(self, key: str) -> str | None:
+        if not _DIAGRAM_ID_RE.fullmatch(key):
+            return None
+        with self._lock:
+            text = self._diagrams.get(key)
+            if text is not None:
+                self._diagrams.move_to_end(key)
+                return text
+            text = self._read_spilled(key)
+            if text is not None:
+                self._remember(key, text)
+            return text
+
+    def _remember(self, key: str, text: str) -> None:
+        self._diagrams[key] = text
+        self._diagrams.move_to_end(key)
+        while len(self._diagrams) > self.capacity:
+            self._spill(*self._diagrams.popitem(last=False))
+
+    def _spill_path(self, key: str) -> str:
+        return os.path.join(self.spill_dir, f"{key}.txt")
+
+    def _read_spilled(self, key: str) -> str | None:
+        path = self._spill_path(key)
+        try:
+            with open(path, encoding="utf-8") as file:
+                text = file.read()
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        return text
+
+    def _spill(self, key: str, text: str) -> None:
+        os.makedirs(self.spill_dir, exist_ok=True)
+        path = self._spill_path(key)
+        if os.path.exists(path):
+            os.utime(path)
+            return
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(text)
+        os.replace(tmp_path, path)
+        spilled = [entry for entry in os.scandir(self.spill_dir) if entry.name.endswith(".txt")]
+        if len(spilled) > self.spill_limit:
+            spilled.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in spilled[:len(spilled) - self.spill_limit]:
+                os.remove(entry.path)
+
+
+diagram_store = DiagramStore()
+
+# Server-Sent Events stream of the diagrams a run publishes
+LIVE_EVENTS_PATH = "/events"
+# A comment is sent on an idle stream this often, so dead connections are noticed
+LIVE_KEEPALIVE_SECONDS = 15.0
+
+
+class DiagramFeed:
+    """
+    The ID of the latest published diagram, for the live page's event stream.
+
+    Subscribers wait for a version newer than the one they last sent, so a
+    slow page skips straight to the latest diagram, and publishing the diagram
+    already shown is a no-op.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.key: str | None = None
+        self.closed = False
+        self._condition = threading.Condition()
+
+    def publish(self, key: str) -> bool:
+        """Make ``key`` the live diagram; False if it already is."""
+        with self._condition:
+            if key == self.key:
+                return False
+            self.key = key
+            self.version += 1
+            self._condition.notify_all()
+            return True
+
+    def wait(self, after: int, timeout: float | None = None) -> tuple[int, str | None]:
+        """
+        Wait for a diagram newer than version ``after``. Returns its (version,
+        ID), or (``after``, None) on timeout or once the feed is closed.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self.version > after or self.closed, timeout)
+            if self.closed or self.version <= after:
+                return after, None
+            return self.version, self.key
+
+    def close(self) -> None:
+        """End every open event stream."""
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+
+diagram_feed = DiagramFeed()
+
+
+def publish_diagram(diagram: str | FlowGraph, width: int | None = None, height: int | None = None) -> bool:
+    """Store the diagram and show it on every open live page; False if it is already shown."""
+    return diagram_feed.publish(diagram_store.put(diagram_input(diagram, width, height)))
+
+
+def diagram_url(key: str, port: int = PORT) -> str:
+    """URL of the frontend showing the stored diagram ``key``."""
+    return f"http://localhost:{port}/?d={key}"
+
+
+def live_url(port: int = PORT) -> str:
+    """URL of the frontend page that follows the published diagrams."""
+    return f"http://localhost:{port}/?live=1"
+
+
+def post_diagram(
+    diagram: str | FlowGraph,
+    port: int = PORT,
+    width: int | None = None,
+    height: int | None = None,
+    timeout: float = 5.0,
+    publish: bool = False,
+) -> str:
+    """
+    Store the diagram on the server running on ``port`` and return the short
+    URL that opens it; with ``publish``, also show it on the server's live
+    pages. Raises OSError or http.client.HTTPException if the server cannot be
+    reached or does not offer the diagram API.
+    """
+    if isinstance(diagram, FlowGraph):
+        # size it here rather than have the server parse the text again
+        diagram, width, height = _sized(diagram, width, height)
+    payload = json.dumps({"diagram": diagram, "width": width, "height": height, "publish": publish}).encode("utf-8")
+    connection = http.client.HTTPConnection("localhost", port, timeout=timeout)
+    try:
+        connection.request("POST", DIAGRAM_API_PATH, body=payload, headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        body = response.read()
+    finally:
+        connection.close()
+    if response.status != 201:
+        raise http.client.HTTPException(f"POST {DIAGRAM_API_PATH} returned {response.status} {response.reason}")
+    return diagram_url(json.loads(body)["id"], port)
+
+
+# Assets smaller than this are not worth compressing
+_MIN_COMPRESS_BYTES = 512
+_COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+# Local script and stylesheet references in HTML, versioned so they can be cached for good
+_ASSET_REF_RE = re.compile(r'((?:src|href)=")([^":?#]+\.(?:js|css))(")')
+# index.html must be revalidated (it names the current asset versions); versioned
+# assets never change under the same URL
+CACHE_REVALIDATE = "no-cache"
+CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+@dataclass
+class Asset:
+    """One build file held in memory, with its precompressed variants."""
+    body: bytes
+    content_type: str
+    etag: str
+    # Only build files have a modification time; stored diagrams are named by their content
+    last_modified: str | None = None
+    mtime: int | None = None
+    # The ``?v=`` value HTML pages reference a build file with
+    version: str | None = None
+    # Content-Encoding -> compressed body, only when smaller than the original
+    encodings: dict[str, bytes] = field(default_factory=dict)
+
+    def variant(self, accept_encoding: str | None) -> tuple[str | None, bytes]:
+        """Best (encoding, body) the client accepts; brotli before gzip before identity."""
+        accepted = _accepted_encodings(accept_encoding)
+        for encoding in ("br", "gzip"):
+            if encoding in self.encodings and encoding in accepted:
+                return encoding, self.encodings[encoding]
+        return None, self.body
+
+
+def _accepted_encodings(header: str | None) -> set[str]:
+    accepted = set()
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if name:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def _compress(body: bytes, content_type: str) -> dict[str, bytes]:
+    if len(body) < _MIN_COMPRESS_BYTES or not content_type.startswith(_COMPRESSIBLE_TYPES):
+        return {}
+    variants = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(body)
+    return {encoding: data for encoding, data in variants.items() if len(data) < len(body)}
+
+
+class StaticAssets:
+    """
+    Every file of the build directory, read and compressed once.
+
+    Files are loaded on first request, so restart the server after rebuilding
+    the frontend. Local ``.js``/``.css`` references in HTML files get a
+    ``?v=<hash>`` suffix, which lets browsers cache those assets indefinitely
+    while a rebuilt asset still gets a new URL.
+    """
+
+    def __init__(self, directory: str = DIRECTORY):
+        self.directory = directory
+        self._assets: dict[str, Asset] | None = None
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> Asset | None:
+        if self._assets is None:
+            with self._lock:
+                if self._assets is None:
+                    self._assets = self._load()
+        return self._assets.get(path)
+
+    def _load(self) -> dict[str, Asset]:
+        files = {}
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                full_path = os.path.join(root, name)
+                url_path = "/" + os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+                with open(full_path, "rb") as file:
+                    files[url_path] = (file.read(), int(os.path.getmtime(full_path)))
+        digests = {path: hashlib.sha256(body).hexdigest()[:16] for path, (body, _) in files.items()}
+        assets = {}
+        for path, (body, mtime) in files.items():
+            content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            if content_type == "text/html":
+                body = self._version_references(body, path, digests)
+            if content_type.startswith("text/") or content_type == "application/javascript":
+                content_type += "; charset=utf-8"
+            assets[path] = Asset(
+                body=body,
+                content_type=content_type,
+                etag=f'"{hashlib.sha256(body).hexdigest()[:16]}"',
+                last_modified=formatdate(mtime, usegmt=True),
+                mtime=mtime,
+                version=digests[path],
+                encodings=_compress(body, content_type),
+            )
+        logger.info("Loaded %d frontend assets from %s", len(assets), self.directory)
+        return assets
+
+    @staticmethod
+    def _version_references(html: bytes, path: str, digests: dict[str, str]) -> bytes:
+        base = path.rsplit("/", 1)[0]
+
+        def versioned(match: re.Match) -> str:
+            reference = match.group(2)
+            target = reference if reference.startswith("/") else f"{base}/{reference}"
+            digest = digests.get(os.path.normpath(target).replace(os.sep, "/"))
+            if digest is None:
+                return match.group(0)
+            return f"{match.group(1)}{reference}?v={digest}{match.group(3)}"
+
+        return _ASSET_REF_RE.sub(versioned, html.decode("utf-8")).encode("utf-8")
+
+
+build_assets = StaticAssets(DIRECTORY)
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    """
+    Serves ``build_assets`` from memory, and the diagram API: POST
+    ``{"diagram": text, "width": w, "height": h}`` (sizes optional) to
+    ``/api/diagrams`` to get back ``{"id": ..., "url": ...}``, and GET
+    ``/d/<id>`` for the stored text, which the frontend loads from ``/?d=<id>``.
+    With ``"publish": true`` the diagram is also sent to ``/events``, the
+    event stream the ``/?live=1`` page follows.
+
+    Responses carry ETag and Last-Modified, so a browser revalidating a file it
+    already has gets a bodiless 304, and are gzip/brotli encoded when the
+    client accepts it.
+    """
+    protocol_version = "HTTP/1.1"
+    assets = build_assets
+    diagrams = diagram_store
+    feed = diagram_feed
+
+    def do_GET(self):
+        if urlsplit(self.path).path == LIVE_EVENTS_PATH:
+            self._stream_events()
+            return
+        self._serve(send_body=True)
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_POST(self):
+        if urlsplit(self.path).path != DIAGRAM_API_PATH:
+            self.send_error(404, "File not found")
+            return
+        if self.headers.get_content_type() != "application/json":
+            self.close_connection = True
+            self.send_error(415, "Diagrams are posted as application/json")
+            return
+        length = self.headers.get("Content-Length")
+        if length is None or not length.isdigit():
+            self.close_connection = True
+            self.send_error(411, "Content-Length required")
+            return
+        if int(length) > MAX_DIAGRAM_BYTES:
+            self.close_connection = True
+            self.send_error(413, f"Diagrams are limited to {MAX_DIAGRAM_BYTES} bytes")
+            return
+        try:
+            request = json.loads(self.rfile.read(int(length)))
+            diagram, width, height = request["diagram"], request.get("width"), request.get("height")
+            publish = request.get("publish", False)
+            if not isinstance(diagram, str) or not isinstance(publish, bool) or not all(size is None or isinstance(size, int) for size in (width, height)):
+                raise TypeError
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self.send_error(400, 'Expected JSON {"diagram": text, "width": int, "height": int, "publish": bool}')
+            return
+        key = self.diagrams.put(diagram_input(diagram, width, height))
+        if publish:
+            self.feed.publish(key)
+        body = json.dumps({"id": key, "url": f"/?d={key}"}).encode("utf-8")
+        self.send_response(201)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Location", f"/d/{key}")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream_events(self) -> None:
+        """Send a ``diagram`` event with the ID of each published diagram until the client leaves."""
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        version = 0
+        try:
+            while True:
+                version, key = self.feed.wait(version, LIVE_KEEPALIVE_SECONDS)
+                if key is not None:
+                    self.wfile.write(f"event: diagram\nid: {version}\ndata: {key}\n\n".encode("utf-8"))
+                elif self.feed.closed:
+                    return
+                else:
+                    self.wfile.write(b": keepalive\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _serve(self, send_body: bool) -> None:
+        url = urlsplit(self.path)
+        path = unquote(url.path)
+        if path.startswith("/d/"):
+            asset = self._diagram(path.removeprefix("/d/"))
+            cache_control = CACHE_IMMUTABLE
+        else:
+            if path.endswith("/"):
+                path += "index.html"
+            asset = self.assets.get(path)
+            # Only the current version's URL may be cached for good; a stale or
+            # made-up ?v= would pin today's bytes under another version's name
+            versioned = asset is not None and parse_qs(url.query).get("v") == [asset.version]
+            cache_control = CACHE_IMMUTABLE if versioned else CACHE_REVALIDATE
+        if asset is None:
+            self.send_error(404, "File not found")
+            return
+        if self._not_modified(asset):
+            self.send_response(304)
+            self.send_header("ETag", asset.etag)
+            self.send_header("Cache-Control", cache_control)
+            self.end_headers()
+            return
+        encoding, body = asset.variant(self.headers.get("Accept-Encoding"))
+        self.send_response(200)
+        self.send_header("Content-Type", asset.content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if encoding is not None:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("ETag", asset.etag)
+        if asset.last_modified is not None:
+            self.send_header("Last-Modified", asset.last_modified)
+        self.send_header("Cache-Control", cache_control)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def _diagram(self, key: str) -> Asset | None:
+        text = self.diagrams.get(key)
+        if text is None:
+            return None
+        body = text.encode("utf-8")
+        content_type = "text/plain; charset=utf-8"
+        return Asset(body=body, content_type=content_type, etag=f'"{key}"', encodings=_compress(body, content_type))
+
+    def _not_modified(self, asset: Asset) -> bool:
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            return "*" in tags or asset.etag in tags
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is not None and asset.mtime is not None:
+            try:
+                return parsedate_to_datetime(if_modified_since).timestamp() >= asset.mtime
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+def make_server(port: int = PORT, handler: type[Handler] = Handler, host: str = HOST) -> http.server.ThreadingHTTPServer:
+    """
+    Threaded server for the frontend: each connection gets its own thread.
+
+    It listens on ``host``, only this machine by default: anyone who can reach
+    the server can store diagrams on it and read them back.
+    """
+    server = http.server.ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def stop_server(server: http.server.ThreadingHTTPServer) -> None:
+    """
+    Stop a server running ``serve_forever`` in another thread and release its
+    port. Its feed is closed first, so open /events streams end instead of
+    holding their connections until the process exits.
+    """
+    server.RequestHandlerClass.feed.close()
+    server.shutdown()
+    server.server_close()
 
 
 def check_frontend_built() -> None:
@@ -146,12 +649,17 @@ def check_frontend_built() -> None:
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default=HOST, help="Interface to listen on; 0.0.0.0 exposes the server, and its diagram API, to the network")
+    args = parser.parse_args()
     check_frontend_built()
     example_url = diagram_to_url(EXAMPLE_DIAGRAM)
-    with socketserver.TCPServer(("", PORT), Handler) as httpd:
+    with make_server(PORT, host=args.host) as httpd:
         print(f"Serving frontend at http://localhost:{PORT}")
         print(f"Example diagram:   {example_url}")
         try:
             httpd.serve_forever()
         except KeyboardInterrupt:
             print("\nStopped.")
+        finally:
+            httpd.RequestHandlerClass.feed.close()
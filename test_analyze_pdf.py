@@ -4,15 +4,28 @@ Heavy imports (LangChain, Docling, the per-bank extractors, dotenv) are mocked i
 conftest.py, so importing analyze_pdf here only exercises pandas + the standard
 library.
 """
+import hashlib
 import math
+import random
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
 import pytest
 
+import analyze_pdf
+import timing
 from analyze_pdf import (
+    AMOUNT_COLUMN_CANDIDATES,
+    DATE_COLUMN_CANDIDATES,
+    DESCRIPTION_COLUMN_CANDIDATES,
+    ColumnResolver,
+    ColumnRoles,
     date_column_index,
     description_column_index,
     amount_column_index,
+    columns_for_df,
+    convert_dfs,
+    first_matching_column_index,
     get_possible_column,
     invalid_float,
     is_valid_df,
@@ -85,3 +98,174 @@ class TestColumnDetection:
     def test_get_possible_column_exact_match(self):
         df = pd.DataFrame(columns=["foo", "Description", "bar"])
         assert get_possible_column(df.columns, "Description") == 1
+
+
+class TestColumnResolver:
+    LABELS = [
+        "Date Posted", "Transaction Date", "Posting Date", "Activity Posted", "Description", "Amount",
+        "Debits", "Credits", "Balance", "Reference Number", "Fees",
+        "Schwab Bank Investor Checking TM (continued).Activity (continued).Description",
+        "Schwab Bank Investor Checking TM (continued).Activity (continued).Credits",
+        "Total Debits", "Credits (USD)", "Notes",
+    ]
+
+    def _expected(self, cols):
+        return ColumnRoles(
+            date=first_matching_column_index(cols, DATE_COLUMN_CANDIDATES),
+            description=first_matching_column_index(cols, DESCRIPTION_COLUMN_CANDIDATES),
+            amount=first_matching_column_index(cols, AMOUNT_COLUMN_CANDIDATES),
+            credits=get_possible_column(cols, "Credits"),
+        )
+
+    def test_matches_get_possible_column_on_random_headers(self):
+        rng = random.Random(0)
+        for _ in range(500):
+            # sampling with replacement also produces duplicated labels
+            header = pd.Index(rng.choices(self.LABELS, k=rng.randint(1, 7)))
+            assert analyze_pdf.column_resolver.resolve(header) == self._expected(header), list(header)
+
+    def test_memoizes_by_header(self):
+        resolver = ColumnResolver({"description": ["Description"]})
+        header = pd.Index(["Date", "Description"])
+        assert resolver.resolve(header) is resolver.resolve(pd.Index(["Date", "Description"]))
+
+    def test_non_string_labels_never_match(self):
+        resolver = ColumnResolver({"description": ["Description"]})
+        assert resolver.resolve(pd.Index([0, 1, "Description"])).description == 2
+
+
+class TestConvertDfs:
+    def _convert(self, df):
+        return convert_dfs(df, columns_for_df(df))
+
+    def test_parses_amounts_and_keeps_row_order(self):
+        df = pd.DataFrame({
+            "Date Posted": ["01/02", "01/03"],
+            "Description": ["SHELL OIL", "ATT"],
+            "Amount": ["$1,234.56", "-45.00"],
+        })
+        assert self._convert(df) == [["01/02", "SHELL OIL", 1234.56], ["01/03", "ATT", -45.0]]
+
+    def test_non_empty_credits_take_precedence(self):
+        df = pd.DataFrame({
+            "Date Posted": ["01/02", "01/03"],
+            "Description": ["PAYROLL", "SHELL OIL"],
+            "Debits": ["", "40.00"],
+            "Credits": ["2,000.00", ""],
+        })
+        assert self._convert(df) == [["01/02", "PAYROLL", 2000.0], ["01/03", "SHELL OIL", 40.0]]
+
+    def test_drops_unparseable_amounts_and_empty_fields(self):
+        df = pd.DataFrame({
+            "Date Posted": ["01/02", "", "01/04", "01/05"],
+            "Description": ["BAD AMOUNT", "NO DATE", "", "KEPT"],
+            "Amount": ["N/A", "1.00", "2.00", "3.00"],
+        })
+        assert self._convert(df) == [["01/05", "KEPT", 3.0]]
+
+    def test_non_string_amount_columns_are_skipped(self):
+        df = pd.DataFrame({"Date Posted": ["01/02"], "Description": ["ATT"], "Amount": [45.0]})
+        assert self._convert(df) == []
+
+
+class TestExtractAllPdfs:
+    """Extraction fan-out; Docling is replaced by a fake that tags tables with their path."""
+
+    @staticmethod
+    def _tables(pdf_path):
+        return [pd.DataFrame({"Date Posted": ["01/02"], "Description": [pdf_path], "Amount": ["-1.00"]})]
+
+    def test_single_worker_batches_and_keeps_order(self, monkeypatch):
+        monkeypatch.setattr(analyze_pdf, "load_pdfs_as_dataframes", lambda paths: [self._tables(p) for p in paths])
+        result = analyze_pdf.extract_all_pdfs(["b.pdf", "a.pdf"])
+        assert result == [[["01/02", "b.pdf", -1.0]], [["01/02", "a.pdf", -1.0]]]
+
+    def test_pool_results_keep_input_order(self, monkeypatch):
+        # A thread pool stands in for the process pool so the fakes stay in scope.
+        monkeypatch.setattr(analyze_pdf, "ProcessPoolExecutor", ThreadPoolExecutor)
+        monkeypatch.setattr(analyze_pdf, "load_pdf_as_dataframes", self._tables)
+        pdfs = [f"{i}.pdf" for i in range(8)]
+        result = analyze_pdf.extract_all_pdfs(pdfs, workers=4)
+        assert [rows[0][1] for rows in result] == pdfs
+
+
+class TestLoadRollup:
+    def _write(self, path, rows):
+        pd.DataFrame(rows).to_csv(path, index=False)
+        return str(path)
+
+    def test_concatenates_in_order_with_categorical_source(self, tmp_path):
+        jan = self._write(tmp_path / "a.csv", [{"date": "01/02", "amount": -5.0, "category": "FOOD"}])
+        feb = self._write(tmp_path / "b.csv", [
+            {"date": "02/03", "amount": -7.0, "category": "GAS"},
+            {"date": "02/04", "amount": 1.5, "category": "FOOD"},
+        ])
+        rollup = analyze_pdf.load_rollup([jan, feb])
+        assert rollup["category"].tolist() == ["FOOD", "GAS", "FOOD"]
+        assert rollup["source"].tolist() == [jan, feb, feb]
+        assert isinstance(rollup["source"].dtype, pd.CategoricalDtype)
+        assert list(rollup.columns) == ["date", "amount", "category", "source"]
+
+    def test_month_filter_and_empty_files_are_skipped(self, tmp_path):
+        jan = self._write(tmp_path / "a.csv", [{"date": "01/02", "amount": -5.0, "category": "FOOD"}])
+        empty = tmp_path / "empty.csv"
+        empty.write_text("")
+        feb = self._write(tmp_path / "b.csv", [{"date": "02/03", "amount": -7.0, "category": "GAS"}])
+        rollup = analyze_pdf.load_rollup([jan, str(empty), feb], month="feb")
+        assert rollup["source"].tolist() == [feb]
+        assert list(rollup["source"].cat.categories) == [feb]
+
+    def test_no_rows_gives_empty_frame(self, tmp_path):
+        jan = self._write(tmp_path / "a.csv", [{"date": "01/02", "amount": -5.0, "category": "FOOD"}])
+        assert analyze_pdf.load_rollup([jan], month="mar").empty
+
+
+class TestMainPublishesDiagrams:
+    """main(on_diagram=...) reports the diagram of the finished folders as the run goes."""
+
+    @staticmethod
+    def _fake_categorize_to_csv(pdf_path, transactions, categorize, model):
+        category = "FOOD" if "food" in pdf_path else "GAS"
+        rows = [{"raw_transaction": "", "description": "X", "date": "01/02", "amount": 10.0, "category": category}]
+        output_csv = pdf_path.replace(".pdf", "_categorized.csv")
+        pd.DataFrame(rows).to_csv(output_csv, index=False)
+        return output_csv
+
+    def test_publishes_once_per_finished_folder(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        for folder, names in {"first": ["food.pdf", "gas.pdf"], "second": ["food.pdf"]}.items():
+            (tmp_path / folder).mkdir()
+            for name in names:
+                (tmp_path / folder / name).write_bytes(f"{folder}/{name}".encode())
+        monkeypatch.setattr(analyze_pdf, "STATEMENT_FOLDERS", ["first", "second"])
+        # memo is mocked in conftest.py
+        monkeypatch.setattr(analyze_pdf, "file_sha256", lambda path: hashlib.sha256(open(path, "rb").read()).hexdigest())
+        monkeypatch.setattr(analyze_pdf, "extract_all_pdfs", lambda pdfs, workers: [[] for _ in pdfs])
+        monkeypatch.setattr(analyze_pdf, "categorize_transactions_to_csv", self._fake_categorize_to_csv)
+        published = []
+        final = analyze_pdf.main(model_name="stub", on_diagram=lambda graph: published.append(graph.to_text()))
+        assert published == [analyze_pdf.rollup_diagram(["first"])[1].to_text(), final]
+        assert "Food" in published[0] and "Gas" in published[0]
+        assert published[0] != final
+
+        # On a re-run every folder is up to date, so the full diagram comes first
+        published.clear()
+        analyze_pdf.main(model_name="stub", on_diagram=lambda graph: published.append(graph.to_text()))
+        assert published == [final]
+
+    def test_records_the_stages_the_readme_lists(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "first").mkdir()
+        (tmp_path / "first" / "food.pdf").write_bytes(b"food")
+        monkeypatch.setattr(analyze_pdf, "STATEMENT_FOLDERS", ["first"])
+        monkeypatch.setattr(analyze_pdf, "file_sha256", lambda path: hashlib.sha256(open(path, "rb").read()).hexdigest())
+        monkeypatch.setattr(analyze_pdf, "extract_all_pdfs", lambda pdfs, workers: [[] for _ in pdfs])
+        monkeypatch.setattr(analyze_pdf, "categorize_transactions_to_csv", self._fake_categorize_to_csv)
+        timing.reset()
+        timing.enable()
+        try:
+            analyze_pdf.main(model_name="stub")
+            assert {"count_categories", "sankey_graph"} <= set(timing.stage_stats())
+        finally:
+            timing.enable(False)
+            timing.reset()
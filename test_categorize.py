@@ -0,0 +1,344 @@
+"""Unit tests for categorize.py.
+
+LangChain and memo are mocked in conftest.py; these tests swap in a fake chain
+and a dict-backed description cache so no model is ever called.
+"""
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import categorize
+from neighbours import NeighbourIndex
+from rules import MerchantIndex, distinctive_description
+
+
+class FakeChain:
+    """Stands in for ``prompt | model | parser``: the category is the description uppercased."""
+
+    def __init__(self, fail_times: int = 0):
+        self.calls = []
+        self.fail_times = fail_times
+        self._lock = threading.Lock()
+
+    def invoke(self, inputs):
+        with self._lock:
+            self.calls.append(inputs["transaction"])
+            if self.fail_times > 0:
+                self.fail_times -= 1
+                raise ConnectionError("model unavailable")
+        return f" {inputs['transaction'].upper()}\n"
+
+
+class SlowChain(FakeChain):
+    """A FakeChain whose first ``slow_times`` calls take ``delay`` seconds."""
+
+    def __init__(self, delay: float, slow_times: int = 0):
+        super().__init__()
+        self.delay = delay
+        self.slow_times = slow_times
+
+    def invoke(self, inputs):
+        with self._lock:
+            slow = self.slow_times > 0
+            self.slow_times -= 1
+        time.sleep(self.delay if slow else 0)
+        return super().invoke(inputs)
+
+
+class CountingChain(SlowChain):
+    """A SlowChain that records the most calls it ever had in flight at once."""
+
+    def __init__(self, delay: float, slow_times: int = 0):
+        super().__init__(delay, slow_times)
+        self.in_flight = self.most_in_flight = 0
+
+    def invoke(self, inputs):
+        with self._lock:
+            self.in_flight += 1
+            self.most_in_flight = max(self.most_in_flight, self.in_flight)
+        try:
+            return super().invoke(inputs)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+class FakeBatchChain(FakeChain):
+    """Answers a numbered list with one numbered, uppercased line per item, minus ``skip`` positions."""
+
+    def __init__(self, skip=(), garbled: bool = False):
+        super().__init__()
+        self.skip = set(skip)
+        self.garbled = garbled
+
+    def invoke(self, inputs):
+        with self._lock:
+            self.calls.append(inputs["transaction"])
+        if self.garbled:
+            return "Here are your categories!"
+        lines = inputs["transaction"].splitlines()
+        return "\n".join(line.upper() for position, line in enumerate(lines) if position not in self.skip)
+
+
+# What categorize fingerprints the model None used throughout these tests as
+FINGERPRINT = categorize.prompt_fingerprint(categorize.model_name(None))
+
+
+@pytest.fixture
+def fake_cache(monkeypatch, tmp_path):
+    cache = {}
+
+    def cached(fingerprint, description):
+        return cache.get(description)
+
+    def store(fingerprint, categories):
+        cache.update(categories)
+
+    def invoke(chain, description):
+        return chain.invoke({"transaction": description}).strip()
+
+    def keys(fingerprint, description):
+        # canonical key: the normalized description, as memo hashes it
+        return distinctive_description(description) or None, description
+
+    def memoized(chain, description, fingerprint):
+        if description not in cache:
+            cache[description] = invoke(chain, description)
+        return cache[description]
+
+    monkeypatch.setattr(categorize, "cached_description_category", cached)
+    monkeypatch.setattr(categorize, "store_description_categories", store)
+    monkeypatch.setattr(categorize, "invoke_chain_transaction", invoke)
+    monkeypatch.setattr(categorize, "memoized_invoke_chain_transaction", memoized)
+    monkeypatch.setattr(categorize, "description_cache_keys", keys)
+    monkeypatch.setattr(categorize, "RETRY_BACKOFF_SECONDS", 0)
+    monkeypatch.setattr(categorize, "_merchant_indexes", {FINGERPRINT: MerchantIndex()})
+    monkeypatch.setattr(categorize, "_neighbour_indexes", {FINGERPRINT: NeighbourIndex(tmp_path / "neighbours.sqlite3")})
+    categorize.reset_stats()
+    return cache
+
+
+@pytest.fixture
+def chain(monkeypatch):
+    fake = FakeChain()
+    monkeypatch.setattr(categorize, "build_chain", lambda model: fake)
+    return fake
+
+
+TRANSACTIONS = [
+    ["01/02", "shell oil", -40.0],
+    ["01/03", "stop & shop", -80.0],
+    ["01/04", "shell oil", -35.0],
+    ["01/05", "att", -60.0],
+]
+
+
+class TestCategorize:
+    def test_concurrent_matches_sequential(self, fake_cache, chain):
+        sequential = categorize.categorize(None, TRANSACTIONS)
+        fake_cache.clear()
+        concurrent = categorize.categorize(None, TRANSACTIONS, max_concurrency=4)
+        assert concurrent == sequential
+        assert [row["category"] for row in concurrent] == ["SHELL OIL", "STOP & SHOP", "SHELL OIL", "ATT"]
+
+    @pytest.mark.parametrize("mode", [{"max_concurrency": 4}, {"batch_size": 3}])
+    def test_prefetch_matches_sequential_with_rules_and_neighbours(self, fake_cache, chain, monkeypatch, tmp_path, mode):
+        monkeypatch.setattr(categorize, "build_batch_chain", lambda model: FakeBatchChain())
+        transactions = [
+            ["01/02", "STARBUCKS STORE", -5.0],
+            ["01/03", "STARBUCKS STORES", -6.0],
+            ["01/04", "SHELL OIL 1111", -40.0],
+            ["01/05", "SHELL OIL 2222", -35.0],
+            ["01/06", "CHECK 1234", -900.0],
+            ["01/07", "CHECK 5678", -50.0],
+        ]
+
+        def run(**kwargs):
+            fake_cache.clear()
+            monkeypatch.setattr(categorize, "_merchant_indexes", {FINGERPRINT: MerchantIndex()})
+            monkeypatch.setattr(categorize, "_neighbour_indexes", {FINGERPRINT: NeighbourIndex(tmp_path / f"{len(kwargs)}.sqlite3")})
+            return categorize.categorize(None, transactions, **kwargs)
+
+        sequential = run()
+        assert [row["category"] for row in sequential] == ["STARBUCKS STORE", "STARBUCKS STORE", "SHELL OIL 1111", "SHELL OIL 1111", "CHECK 1234", "CHECK 5678"]
+        chain.calls.clear()
+        assert run(**mode) == sequential
+        if "max_concurrency" in mode:
+            # near duplicates and same-key descriptions are left to the in-order pass
+            assert sorted(chain.calls) == ["CHECK 1234", "CHECK 5678", "SHELL OIL 1111", "STARBUCKS STORE"]
+
+    def test_answers_the_plan_did_not_foresee_are_asked_in_order(self, fake_cache, chain, monkeypatch):
+        # An unresolved answer is never indexed, so the near duplicate needs its own call
+        monkeypatch.setattr(chain, "invoke", lambda inputs: "INPUT NEEDED" if inputs["transaction"] == "STARBUCKS STORE" else inputs["transaction"])
+        rows = categorize.categorize(None, [["01/02", "STARBUCKS STORE", -5.0], ["01/03", "STARBUCKS STORES", -6.0]], max_concurrency=4)
+        assert [row["category"] for row in rows] == ["INPUT NEEDED", "STARBUCKS STORES"]
+
+    def test_concurrent_calls_each_uncached_description_once(self, fake_cache, chain):
+        fake_cache["att"] = "PHONE"
+        categorize.categorize(None, TRANSACTIONS, max_concurrency=4)
+        assert sorted(chain.calls) == ["shell oil", "stop & shop"]
+
+    def test_invalid_transaction_raises_before_any_call(self, fake_cache, chain):
+        with pytest.raises(Exception, match="Invalid transaction"):
+            categorize.categorize(None, TRANSACTIONS + [["01/06", "bad"]], max_concurrency=4)
+        assert chain.calls == []
+
+
+    @pytest.mark.parametrize("max_concurrency", [1, 4])
+    def test_merchant_rules_skip_the_llm(self, fake_cache, chain, max_concurrency):
+        categorize.merchant_index(FINGERPRINT).add("SHELL OIL", "GAS")
+        rows = categorize.categorize(None, [["01/02", "SHELL OIL 57442 BOSTON MA", -40.0]], max_concurrency=max_concurrency)
+        assert rows[0]["category"] == "GAS"
+        assert chain.calls == []
+
+    def test_llm_results_feed_the_merchant_rules(self, fake_cache, chain):
+        categorize.categorize(None, [["01/02", "spotify usa 8443", -15.0]])
+        rows = categorize.categorize(None, [["02/02", "SPOTIFY USA 1212", -15.0]])
+        assert rows[0]["category"] == "SPOTIFY USA 8443"
+        assert chain.calls == ["spotify usa 8443"]
+
+    @pytest.mark.parametrize("max_concurrency", [1, 4])
+    def test_near_duplicates_skip_the_llm(self, fake_cache, chain, max_concurrency):
+        categorize.neighbour_index(FINGERPRINT).add("STARBUCKS STORE", "COFFEE")
+        rows = categorize.categorize(None, [["01/02", "STARBUCKS STORES", -5.0]], max_concurrency=max_concurrency)
+        assert rows[0]["category"] == "COFFEE"
+        assert chain.calls == []
+        assert categorize.stats.neighbour_hits == 1
+
+    def test_other_models_answers_are_not_reused(self, fake_cache, chain, monkeypatch):
+        stub = categorize.prompt_fingerprint("stub")
+        monkeypatch.setitem(categorize._merchant_indexes, stub, MerchantIndex())
+        categorize.merchant_index(stub).add("STARBUCKS STORE", "COFFEE_FROM_STUB")
+        rows = categorize.categorize(None, [["01/02", "STARBUCKS STORE", -5.0]])
+        assert rows[0]["category"] == "STARBUCKS STORE"
+
+    def test_neighbour_lookup_can_be_disabled(self, fake_cache, chain):
+        categorize.neighbour_index(FINGERPRINT).add("STARBUCKS STORE", "COFFEE")
+        rows = categorize.categorize(None, [["01/02", "STARBUCKS STORES", -5.0]], similarity_threshold=None)
+        assert rows[0]["category"] == "STARBUCKS STORES"
+        assert categorize.neighbour_index(FINGERPRINT).lookup("STARBUCKS STORES") == "STARBUCKS STORES"
+
+
+    @pytest.mark.parametrize("max_concurrency", [1, 4])
+    def test_stats_count_how_each_transaction_was_resolved(self, fake_cache, chain, max_concurrency):
+        fake_cache["att"] = "PHONE"
+        categorize.merchant_index(FINGERPRINT).add("STOP & SHOP", "GROCERIES")
+        categorize.categorize(None, TRANSACTIONS, max_concurrency=max_concurrency)
+        # shell oil: one LLM call, then a cache hit; stop & shop: rule; att: cache
+        assert (categorize.stats.transactions, categorize.stats.llm_calls) == (4, 1)
+        assert (categorize.stats.rule_hits, categorize.stats.cache_hits) == (1, 2)
+        assert "75.0% served without the LLM" in categorize.stats.summary()
+
+
+class TestPrefetchCategories:
+    def test_retries_failed_calls(self, fake_cache):
+        flaky = FakeChain(fail_times=2)
+        sent = categorize.prefetch_categories(flaky, "fp", ["att"], max_concurrency=2, max_retries=2)
+        assert sent == {"att": "ATT"}
+        assert fake_cache == {"att": "ATT"}
+
+    def test_gives_up_after_max_retries(self, fake_cache):
+        flaky = FakeChain(fail_times=5)
+        with pytest.raises(ConnectionError):
+            categorize.prefetch_categories(flaky, "fp", ["att"], max_concurrency=2, max_retries=1)
+        assert fake_cache == {}
+
+    def test_timed_out_calls_are_retried(self, fake_cache):
+        slow = SlowChain(delay=1.0, slow_times=1)
+        sent = categorize.prefetch_categories(slow, "fp", ["att"], max_concurrency=2, request_timeout=0.05, max_retries=1)
+        assert sent == {"att": "ATT"}
+
+    def test_timeout_applies_to_each_call_not_the_whole_batch(self, fake_cache):
+        # every call fits in the timeout, though the batch of calls does not
+        slow = SlowChain(delay=0.03, slow_times=10)
+        sent = categorize.prefetch_categories(slow, "fp", ["a", "b", "c", "d"], max_concurrency=1, request_timeout=0.08)
+        assert sent == {"a": "A", "b": "B", "c": "C", "d": "D"}
+
+    def test_calls_given_up_on_still_count_against_max_concurrency(self, fake_cache):
+        counting = CountingChain(delay=0.2, slow_times=2)
+        sent = categorize.prefetch_categories(counting, "fp", ["a", "b"], max_concurrency=2, request_timeout=0.05, max_retries=2)
+        assert sent == {"a": "A", "b": "B"}
+        assert counting.most_in_flight == 2
+
+    def test_gives_up_when_every_attempt_times_out(self, fake_cache):
+        slow = SlowChain(delay=1.0, slow_times=2)
+        with pytest.raises(TimeoutError):
+            categorize.prefetch_categories(slow, "fp", ["att"], max_concurrency=2, request_timeout=0.05, max_retries=1)
+        assert fake_cache == {}
+
+    def test_nothing_to_do_when_all_cached(self, fake_cache):
+        fake_cache["att"] = "PHONE"
+        assert categorize.prefetch_categories(FakeChain(), "fp", ["att", "att"], max_concurrency=2) == {}
+
+
+class TestBatchMode:
+    @pytest.fixture
+    def batch_chain(self, monkeypatch):
+        fake = FakeBatchChain()
+        monkeypatch.setattr(categorize, "build_batch_chain", lambda model: fake)
+        return fake
+
+    @pytest.mark.parametrize("max_concurrency", [1, 4])
+    def test_matches_single_call_results(self, fake_cache, chain, batch_chain, max_concurrency):
+        rows = categorize.categorize(None, TRANSACTIONS, max_concurrency=max_concurrency, batch_size=10)
+        assert [row["category"] for row in rows] == ["SHELL OIL", "STOP & SHOP", "SHELL OIL", "ATT"]
+        assert batch_chain.calls == ["1. shell oil\n2. stop & shop\n3. att"]
+        assert chain.calls == []
+        assert (categorize.stats.llm_calls, categorize.stats.llm_requests) == (3, 1)
+
+    def test_splits_into_batches_of_batch_size(self, fake_cache, chain, batch_chain):
+        categorize.categorize(None, TRANSACTIONS, batch_size=2)
+        # the last batch holds a single description and goes through the single-call chain
+        assert batch_chain.calls == ["1. shell oil\n2. stop & shop"]
+        assert chain.calls == ["att"]
+
+    def test_results_are_shared_with_single_call_mode(self, fake_cache, chain, batch_chain):
+        categorize.categorize(None, TRANSACTIONS, batch_size=10)
+        categorize.reset_stats()
+        categorize.categorize(None, TRANSACTIONS, similarity_threshold=None)
+        assert chain.calls == []
+        assert categorize.stats.llm_calls == 0
+
+    def test_missing_lines_fall_back_to_single_calls(self, fake_cache, chain, monkeypatch):
+        monkeypatch.setattr(categorize, "build_batch_chain", lambda model: FakeBatchChain(skip={1}))
+        rows = categorize.categorize(None, TRANSACTIONS, batch_size=10)
+        assert [row["category"] for row in rows] == ["SHELL OIL", "STOP & SHOP", "SHELL OIL", "ATT"]
+        assert chain.calls == ["stop & shop"]
+        assert categorize.stats.llm_requests == 2
+
+    def test_malformed_response_falls_back_to_single_calls(self, fake_cache, chain, monkeypatch):
+        monkeypatch.setattr(categorize, "build_batch_chain", lambda model: FakeBatchChain(garbled=True))
+        rows = categorize.categorize(None, TRANSACTIONS, batch_size=10)
+        assert [row["category"] for row in rows] == ["SHELL OIL", "STOP & SHOP", "SHELL OIL", "ATT"]
+        assert chain.calls == ["shell oil", "stop & shop", "att"]
+
+
+class TestParseBatchCategories:
+    def test_numbered_lines(self):
+        assert categorize.parse_batch_categories("1. GAS\n2) FOOD\n\n3: 'SUBSCRIPTION'", 3) == {0: "GAS", 1: "FOOD", 2: "SUBSCRIPTION"}
+
+    def test_missing_numbers_are_left_out(self):
+        assert categorize.parse_batch_categories("1. GAS\n3. FOOD", 3) == {0: "GAS", 2: "FOOD"}
+
+    @pytest.mark.parametrize("response", ["GAS\nFOOD", "1. GAS\n1. FOOD", "1. GAS\n4. FOOD"])
+    def test_untrustworthy_responses(self, response):
+        assert categorize.parse_batch_categories(response, 3) is None
+
+
+class TestModelName:
+    def test_ollama_and_openai_attributes(self):
+        assert categorize.model_name(SimpleNamespace(model="gemma2:27b")) == "gemma2:27b"
+        assert categorize.model_name(SimpleNamespace(model_name="gpt-4")) == "gpt-4"
+
+
+class TestPromptFingerprint:
+    def test_stable_for_same_model(self):
+        assert categorize.prompt_fingerprint("gemma2:27b") == categorize.prompt_fingerprint("gemma2:27b")
+
+    def test_changes_with_model_and_template(self, monkeypatch):
+        before = categorize.prompt_fingerprint("gemma2:27b")
+        assert categorize.prompt_fingerprint("gpt-4") != before
+        monkeypatch.setattr(categorize, "CATEGORIZE_TEMPLATE", categorize.CATEGORIZE_TEMPLATE + "New hint. ")
+        assert categorize.prompt_fingerprint("gemma2:27b") != before
@@ -0,0 +1,124 @@
+"""Unit tests for the FlowGraph diagram model in flowgraph.py (standard library only)."""
+import functools
+import random
+
+from flowgraph import FlowGraph, format_amount
+
+
+def graph_of(adj: dict[str, list[str]]) -> FlowGraph:
+    graph = FlowGraph()
+    for source, targets in adj.items():
+        graph.node_id(source)
+        for target in targets:
+            graph.add(source, 1, target)
+    return graph
+
+
+def named_stages(graph: FlowGraph) -> dict[str, int]:
+    return dict(zip(graph.names, graph.stages()))
+
+
+class TestFlowGraph:
+    def test_names_are_interned_in_order(self):
+        graph = FlowGraph()
+        graph.add("Wages", 3000, "Budget")
+        graph.add("Budget", 1200, "Housing")
+        assert graph.names == ["Wages", "Budget", "Housing"]
+        assert list(graph.sources) == [0, 1]
+        assert list(graph.targets) == [1, 2]
+        assert graph.node_id("Budget") == 1
+        assert len(graph) == 2
+
+    def test_flows_and_text(self):
+        graph = FlowGraph()
+        graph.add("Wages", 3000, "Budget")
+        graph.add("Budget", 12.5, "Food")
+        assert list(graph.flows()) == [("Wages", 3000, "Budget"), ("Budget", 12.5, "Food")]
+        assert graph.to_text() == "Wages [3000] Budget\nBudget [12.5] Food\n"
+
+    def test_node_values_are_the_larger_of_in_and_out(self):
+        graph = FlowGraph.parse("Wages [3000] Budget\nOther [500] Budget\nBudget [1200] Housing")
+        assert dict(zip(graph.names, graph.node_values())) == {"Wages": 3000, "Budget": 3500, "Other": 500, "Housing": 1200}
+
+
+class TestParse:
+    def test_round_trips_its_own_text(self):
+        graph = FlowGraph()
+        for source, amount, target in [("Wages", 3000, "Budget"), ("Budget", 1200.25, "Rent & Utilities"), ("Rent & Utilities", 0.5, "Co-op Fee")]:
+            graph.add(source, amount, target)
+        text = graph.to_text()
+        assert FlowGraph.parse(text).to_text() == text
+        assert list(FlowGraph.parse(text).flows()) == list(graph.flows())
+
+    def test_skips_comments_settings_and_blank_lines(self):
+        text = "' a comment\n// also a comment\n\nWages [10] Budget # trailing note\nsize w 800\n:Budget #ff0000\n"
+        assert list(FlowGraph.parse(text).flows()) == [("Wages", 10, "Budget")]
+
+    def test_keeps_names_a_word_regex_would_cut(self):
+        graph = FlowGraph.parse("Budget [45.99] AT&T Wireless\nBudget [5] Trader Joe's")
+        assert graph.names == ["Budget", "AT&T Wireless", "Trader Joe's"]
+        assert list(graph.amounts) == [45.99, 5]
+
+
+class TestFormatAmount:
+    def test_whole_numbers_have_no_decimal_point(self):
+        assert format_amount(3000.0) == "3000"
+        assert format_amount(3000) == "3000"
+
+    def test_fractions_are_kept(self):
+        assert format_amount(12.5) == "12.5"
+
+
+class TestStages:
+    @staticmethod
+    def _brute_force(adj):
+        preds = {}
+        for src, targets in adj.items():
+            preds.setdefault(src, [])
+            for tgt in targets:
+                preds.setdefault(tgt, []).append(src)
+
+        @functools.cache
+        def depth(node):
+            return max((depth(p) + 1 for p in preds[node]), default=0)
+
+        return {node: depth(node) for node in preds}
+
+    def test_matches_brute_force_on_random_dags(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            n = rng.randint(1, 30)
+            adj = {}
+            for i in range(n):
+                targets = [f"n{j}" for j in range(i + 1, n) if rng.random() < 0.2]
+                if targets or rng.random() < 0.5:
+                    adj[f"n{i}"] = targets
+            if adj:
+                assert named_stages(graph_of(adj)) == self._brute_force(adj)
+
+    def test_wide_dag_with_many_parallel_paths(self):
+        # Every node links to the next three: the old BFS re-queued nodes once
+        # per longer path found, which blows up on graphs like this.
+        adj = {f"n{i}": [f"n{j}" for j in range(i + 1, min(i + 4, 3000))] for i in range(3000)}
+        assert named_stages(graph_of(adj))["n2999"] == 2999
+
+    def test_cycles_terminate(self, caplog):
+        stages = named_stages(graph_of({"Wages": ["A"], "A": ["B"], "B": ["A", "C"]}))
+        assert stages["Wages"] == 0 and stages["A"] == 1
+        assert stages["C"] == stages["B"] + 1
+        assert "cycle" in caplog.text
+
+    def test_cycle_is_broken_on_the_cycle_not_downstream_of_it(self, caplog):
+        graph = FlowGraph.parse("C [5] D\nWages [10] A\nA [10] B\nB [10] A\nB [5] C")
+        assert named_stages(graph) == {"C": 3, "D": 4, "Wages": 0, "A": 1, "B": 2}
+        assert "cycle through A;" in caplog.text
+
+    def test_cycle_feeding_another_cycle(self):
+        stages = named_stages(graph_of({"X": ["Y"], "Y": ["X"], "Wages": ["P", "X"], "P": ["Q"], "Q": ["P", "X"]}))
+        assert stages["Wages"] == 0 and (stages["P"], stages["Q"]) == (1, 2)
+        assert stages["X"] == 3 and stages["Y"] == 4
+
+    def test_self_loop_and_isolated_cycle(self):
+        assert named_stages(graph_of({"A": ["A"]})) == {"A": 0}
+        stages = named_stages(graph_of({"A": ["B"], "B": ["A"]}))
+        assert sorted(stages.values()) == [0, 1]
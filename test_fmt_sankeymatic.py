@@ -276,3 +276,28 @@ def test_needs_wants_savings_structure():
     assert "Needs [800] Food" in lines
     assert "Wants [600] Entertainment" in lines
     assert "Budget [1400] Savings" in lines
+
+
+# ---------------------------------------------------------------------------
+# Node names and amounts the old text re-parse dropped
+# ---------------------------------------------------------------------------
+
+def test_decimal_amounts_are_kept():
+    """A fractional amount used to fail sort_budget's integer regex and vanish."""
+    data = {"WAGES": 1000, "FOOD": 250.5}
+    lines = _lines(fmt_sankeymatic(data))
+    assert "Budget [250.5] Food" in lines
+    assert "Budget [749.5] Savings" in lines
+
+
+def test_non_word_category_names_are_kept_whole():
+    """A category with punctuation used to be cut at the first non-word character."""
+    data = {"_map": {"AT&T": "PHONE"}, "WAGES": 1000, "PHONE": 100, "AT&T": 100}
+    lines = _lines(fmt_sankeymatic(data))
+    assert "Budget [100] Phone" in lines
+    assert "Phone [100] At&t" in lines
+
+
+def test_savings_flow_comes_last():
+    data = {"WAGES": 1000, "ZOO": 100, "FOOD": 200}
+    assert fmt_sankeymatic(data).splitlines()[-1] == "Budget [700] Savings"
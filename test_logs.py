@@ -0,0 +1,55 @@
+"""Unit tests for the logging helpers in logs.py."""
+import logging
+
+import pytest
+
+from logs import RepeatedWarning, configure_logging
+
+
+class CountingArg:
+    """Counts how often a log argument is formatted."""
+
+    def __init__(self):
+        self.formatted = 0
+
+    def __str__(self):
+        self.formatted += 1
+        return "value"
+
+
+class TestRepeatedWarning:
+    def test_logs_the_first_few_then_a_summary(self, caplog):
+        warning = RepeatedWarning(logging.getLogger("test_logs"), "bad rows", limit=2)
+        with caplog.at_level("WARNING", logger="test_logs"):
+            for row in range(5):
+                warning("row %d is bad", row)
+            warning.flush()
+        assert [r.getMessage() for r in caplog.records] == ["row 0 is bad", "row 1 is bad", "3 more bad rows not shown"]
+
+    def test_flush_without_suppressed_warnings_is_silent(self, caplog):
+        warning = RepeatedWarning(logging.getLogger("test_logs"), "bad rows", limit=2)
+        with caplog.at_level("WARNING", logger="test_logs"):
+            warning("row %d is bad", 0)
+            warning.flush()
+            warning.flush()
+        assert len(caplog.records) == 1
+
+    def test_suppressed_messages_are_never_formatted(self):
+        logger = logging.getLogger("test_logs.quiet")
+        logger.setLevel(logging.ERROR)
+        arg = CountingArg()
+        warning = RepeatedWarning(logger, "bad rows", limit=2)
+        for _ in range(3):
+            warning("bad %s", arg)
+        warning.flush()
+        assert arg.formatted == 0
+
+
+class TestConfigureLogging:
+    def test_module_overrides(self):
+        configure_logging("WARNING", ["test_logs.module=debug"])
+        assert logging.getLogger("test_logs.module").level == logging.DEBUG
+
+    def test_invalid_override(self):
+        with pytest.raises(ValueError, match="Invalid module log level"):
+            configure_logging("INFO", ["utils"])
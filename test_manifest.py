@@ -0,0 +1,32 @@
+"""Unit tests for the incremental-run manifest in manifest.py."""
+from manifest import RunManifest
+
+
+class TestRunManifest:
+    def _recorded(self, tmp_path):
+        csv = tmp_path / "statement_categorized.csv"
+        csv.write_text("date,description,amount,category\n")
+        manifest = RunManifest(tmp_path / "manifest.json")
+        manifest.record("statement.pdf", "abc", "prompt-v1", str(csv))
+        return manifest, csv
+
+    def test_unknown_pdf_is_stale(self, tmp_path):
+        assert not RunManifest(tmp_path / "manifest.json").is_up_to_date("statement.pdf", "abc", "prompt-v1")
+
+    def test_recorded_pdf_is_up_to_date_after_reload(self, tmp_path):
+        self._recorded(tmp_path)
+        reloaded = RunManifest(tmp_path / "manifest.json")
+        assert reloaded.is_up_to_date("statement.pdf", "abc", "prompt-v1")
+
+    def test_changed_contents_are_stale(self, tmp_path):
+        manifest, _ = self._recorded(tmp_path)
+        assert not manifest.is_up_to_date("statement.pdf", "def", "prompt-v1")
+
+    def test_changed_fingerprint_is_stale(self, tmp_path):
+        manifest, _ = self._recorded(tmp_path)
+        assert not manifest.is_up_to_date("statement.pdf", "abc", "prompt-v2")
+
+    def test_missing_csv_is_stale(self, tmp_path):
+        manifest, csv = self._recorded(tmp_path)
+        csv.unlink()
+        assert not manifest.is_up_to_date("statement.pdf", "abc", "prompt-v1")
@@ -0,0 +1,201 @@
+"""Unit tests for the description cache backends in memo.py.
+
+conftest.py replaces ``memo`` with a mock for the other test modules, so the
+real module is loaded here from its file under a private name.
+"""
+import importlib.util
+import json
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+_spec = importlib.util.spec_from_file_location("memo_under_test", Path(__file__).parent / "memo.py")
+memo = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(memo)
+
+
+@pytest.fixture(params=["sqlite", "json"])
+def open_cache(request, tmp_path):
+    if request.param == "sqlite":
+        return lambda: memo.SqliteDescriptionCache(tmp_path / "cache.sqlite3", json_path=None)
+    return lambda: memo.JsonFileCache(tmp_path / "cache.json")
+
+
+@pytest.fixture
+def cache(open_cache):
+    return open_cache()
+
+
+class TestDescriptionCacheBackends:
+    def test_get_and_update(self, cache):
+        assert cache.get("SHELL OIL") is None
+        cache.update({"SHELL OIL": "GAS", "ATT": "PHONE"})
+        assert cache.get("SHELL OIL") == "GAS"
+        assert cache["ATT"] == "PHONE"
+        assert "ATT" in cache
+        assert len(cache) == 2
+
+    def test_missing_key_raises_key_error(self, cache):
+        with pytest.raises(KeyError):
+            cache["absent"]
+
+    def test_entries_persist_across_instances(self, open_cache):
+        open_cache().update({"SHELL OIL": "GAS"})
+        reopened = open_cache()
+        reopened.compact()
+        assert reopened.get("SHELL OIL") == "GAS"
+
+
+class TestJsonFileCache:
+    def test_file_is_not_read_until_first_access(self, tmp_path):
+        path = tmp_path / "cache.json"
+        path.write_text("not json")
+        cache = memo.JsonFileCache(path)
+        with pytest.raises(json.JSONDecodeError):
+            cache.get("anything")
+
+
+class TestSqliteDescriptionCache:
+    def test_imports_legacy_json_once(self, tmp_path):
+        legacy = tmp_path / "legacy.json"
+        legacy.write_text(json.dumps({"SHELL OIL": "GAS"}))
+        cache = memo.SqliteDescriptionCache(tmp_path / "cache.sqlite3", json_path=legacy)
+        assert cache.get("SHELL OIL") == "GAS"
+        # Later edits to the JSON file are not re-imported into a populated database.
+        legacy.write_text(json.dumps({"SHELL OIL": "FUEL", "ATT": "PHONE"}))
+        reopened = memo.SqliteDescriptionCache(tmp_path / "cache.sqlite3", json_path=legacy)
+        assert reopened.get("SHELL OIL") == "GAS"
+        assert reopened.get("ATT") is None
+
+    def test_uses_wal_journal(self, tmp_path):
+        cache = memo.SqliteDescriptionCache(tmp_path / "cache.sqlite3", json_path=None)
+        cache.update({"ATT": "PHONE"})
+        mode = sqlite3.connect(tmp_path / "cache.sqlite3").execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode == "wal"
+
+    def test_database_is_not_created_until_first_access(self, tmp_path):
+        cache = memo.SqliteDescriptionCache(tmp_path / "cache.sqlite3", json_path=None)
+        assert not (tmp_path / "cache.sqlite3").exists()
+        cache.get("ATT")
+        assert (tmp_path / "cache.sqlite3").exists()
+
+
+class TestOpenDescriptionCache:
+    def test_unknown_backend_raises(self):
+        with pytest.raises(ValueError):
+            memo.open_description_cache("redis")
+
+
+class TestMemoizeDataframeToFile:
+    @pytest.fixture
+    def extract(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(memo, "memoized_df_blobs", memo.DataframeBlobCache(tmp_path / "blobs"))
+        monkeypatch.setattr(memo, "memoized_df_data", memo.JsonFileCache(tmp_path / "legacy.json"))
+        calls = []
+
+        @memo.memoize_dataframe_to_file
+        def extract(pdf_path):
+            calls.append(pdf_path)
+            return [pd.DataFrame({"Description": ["ATT"], "Amount": ["-60.00"]})]
+
+        extract.calls = calls
+        return extract
+
+    def test_hit_survives_rename(self, extract, tmp_path):
+        pdf = tmp_path / "statement.pdf"
+        pdf.write_bytes(b"%PDF-1.4 statement")
+        first = extract(str(pdf))
+        renamed = pdf.rename(tmp_path / "renamed.pdf")
+        second = extract(str(renamed))
+        assert extract.calls == [str(pdf)]
+        pd.testing.assert_frame_equal(first[0], second[0])
+
+    def test_changed_contents_miss(self, extract, tmp_path):
+        pdf = tmp_path / "statement.pdf"
+        pdf.write_bytes(b"%PDF-1.4 january")
+        extract(str(pdf))
+        pdf.write_bytes(b"%PDF-1.4 february")
+        extract(str(pdf))
+        assert len(extract.calls) == 2
+
+    def test_legacy_json_entry_is_converted(self, extract, tmp_path):
+        pdf = tmp_path / "statement.pdf"
+        pdf.write_bytes(b"%PDF-1.4 statement")
+        legacy = [[{"Description": "SHELL OIL", "Amount": "-40.00"}]]
+        memo.memoized_df_data.update({str(pdf): json.dumps(legacy)})
+        result = extract(str(pdf))
+        assert extract.calls == []
+        assert result[0].to_dict(orient="records") == legacy[0]
+        assert memo.memoized_df_blobs.get(memo.file_sha256(pdf)) is not None
+
+
+class TestDescriptionCacheKeys:
+    @pytest.fixture(autouse=True)
+    def cache(self, monkeypatch, tmp_path):
+        cache = memo.SqliteDescriptionCache(tmp_path / "cache.sqlite3", json_path=None)
+        monkeypatch.setattr(memo, "memoized_description_data", cache)
+        return cache
+
+    def test_reference_code_variants_share_an_entry(self):
+        memo.store_description_categories("fp", {"AMZN MKTP US*2K4AB1": "SHOPPING"})
+        assert memo.cached_description_category("fp", "AMZN Mktp US*9Q1XY7") == "SHOPPING"
+
+    def test_canonical_key_depends_on_fingerprint(self):
+        assert memo.description_cache_keys("fp1", "ATT")[0] != memo.description_cache_keys("fp2", "ATT")[0]
+
+    def test_descriptions_normalizing_to_nothing_are_kept_apart(self):
+        assert memo.description_cache_keys("fp", "01/03 12345678") == (None, "fp|01/03 12345678")
+        memo.store_description_categories("fp", {"01/03 12345678": "RENT"})
+        assert memo.cached_description_category("fp", "01/03 12345678") == "RENT"
+        assert memo.cached_description_category("fp", "12/30 000991") is None
+
+    def test_distinct_checks_are_kept_apart(self):
+        assert memo.description_cache_keys("fp", "CHECK 1234")[0] is None
+        memo.store_description_categories("fp", {"CHECK 1234": "RENT", "SQ 5531": "PARKING"})
+        assert memo.cached_description_category("fp", "CHECK 1234") == "RENT"
+        assert memo.cached_description_category("fp", "CHECK 5678") is None
+        assert memo.cached_description_category("fp", "SQ 9912") is None
+
+    def test_models_do_not_share_entries(self):
+        memo.store_description_categories("stubfp", {"SHELL OIL 57442": "GAS_FROM_STUB"})
+        assert memo.cached_description_category("gemmafp", "SHELL OIL 57442") is None
+        assert memo.cached_description_category("gemmafp", "SHELL OIL 11873") is None
+
+    def test_items_are_those_of_the_fingerprint_and_legacy_ones(self, cache):
+        stub, gemma = "a" * 64, "b" * 64
+        memo.store_description_categories(stub, {"SHELL OIL": "GAS_FROM_STUB"})
+        memo.store_description_categories(gemma, {"ATT": "PHONE"})
+        cache.update({"AMAZON": "SHOPPING"})
+        descriptions = {key: category for key, category in memo.cached_description_items(gemma) if len(key) != 64}
+        assert descriptions == {"ATT": "PHONE", "AMAZON": "SHOPPING"}
+
+    def test_raw_description_key_still_hits(self, cache):
+        cache.update({"SHELL OIL 57442": "GAS"})
+        assert memo.cached_description_category("fp", "SHELL OIL 57442") == "GAS"
+
+    def test_memoized_call_invokes_once_then_hits(self):
+        calls = []
+
+        @memo.memoize_description_to_file
+        def invoke(chain, description):
+            calls.append(description)
+            return "GAS"
+
+        assert invoke(None, "SHELL OIL 57442", "fp") == "GAS"
+        assert invoke(None, "SHELL OIL 11873", "fp") == "GAS"
+        assert calls == ["SHELL OIL 57442"]
+
+    def test_memoized_call_asks_for_each_description_normalizing_to_nothing(self):
+        calls = []
+
+        @memo.memoize_description_to_file
+        def invoke(chain, description):
+            calls.append(description)
+            return "RENT"
+
+        invoke(None, "01/03 12345678", "fp")
+        invoke(None, "12/30 000991", "fp")
+        invoke(None, "12/30 000991", "fp")
+        assert calls == ["01/03 12345678", "12/30 000991"]
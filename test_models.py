@@ -0,0 +1,48 @@
+"""Unit tests for model selection and the stub backend in models.py."""
+import pytest
+
+import categorize
+import models
+from models import StubLLM, create_model
+
+
+@pytest.fixture
+def stub():
+    return StubLLM(latency=0, item_latency=0)
+
+
+class TestStubLLM:
+    def test_answers_the_last_line_of_a_single_prompt(self, stub):
+        assert stub("Categorize the following transaction. Print no other text.\n SHELL OIL 57442") == "GAS"
+
+    def test_unknown_descriptions_get_the_default_category(self, stub):
+        assert stub("Categorize this.\n ZZZ HOLDINGS") == "OTHER"
+
+    def test_answers_a_numbered_batch_in_the_format_categorize_parses(self, stub):
+        prompt = "Categorize each of the following numbered transactions.\n " + categorize.format_batch(["shell oil", "netflix.com", "zzz"])
+        assert categorize.parse_batch_categories(stub(prompt), 3) == {0: "GAS", 1: "SUBSCRIPTION", 2: "OTHER"}
+
+    def test_accepts_prompt_values(self, stub):
+        class PromptValue:
+            def to_string(self):
+                return "Categorize.\n STARBUCKS"
+
+        assert stub(PromptValue()) == "COFFEE"
+
+    def test_custom_rules(self):
+        assert StubLLM({"ACME": "TOOLS"}, latency=0, item_latency=0)("x\n ACME CO") == "TOOLS"
+
+    def test_reports_its_model_name(self, stub):
+        assert categorize.model_name(stub) == "stub"
+
+
+class TestCreateModel:
+    def test_unknown_model_raises(self):
+        with pytest.raises(ValueError, match="Unknown model"):
+            create_model("gpt-0")
+
+    def test_builds_only_the_requested_client(self, monkeypatch):
+        built = []
+        monkeypatch.setitem(models.MODEL_FACTORIES, "gpt-4", lambda request_timeout: built.append("gpt-4"))
+        create_model("stub")
+        assert built == []
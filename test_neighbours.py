@@ -0,0 +1,56 @@
+"""Unit tests for the MinHash nearest-neighbour index in neighbours.py."""
+import pytest
+
+from neighbours import NeighbourIndex, minhash, neighbour_index_path
+
+
+@pytest.fixture
+def index(tmp_path):
+    return NeighbourIndex(tmp_path / "neighbours.sqlite3")
+
+
+class TestMinhash:
+    def test_same_normalized_text_same_signature(self):
+        assert (minhash("Shell Oil 57442") == minhash("SHELL OIL 99120")).all()
+
+    def test_empty_description_has_no_signature(self):
+        assert minhash("0421 1234") is None
+
+
+class TestNeighbourIndex:
+    def test_near_duplicate_reuses_category(self, index):
+        index.add("STARBUCKS STORE", "COFFEE")
+        assert index.lookup("STARBUCKS STORES") == "COFFEE"
+
+    def test_unrelated_description_misses(self, index):
+        index.add("STARBUCKS STORE", "COFFEE")
+        assert index.lookup("EXXONMOBIL") is None
+
+    def test_threshold_is_configurable(self, index):
+        index.add("SHELL OIL", "GAS")
+        assert index.lookup("SHELL OIL BOSTON") is None
+        assert index.lookup("SHELL OIL BOSTON", threshold=0.4) == "GAS"
+
+    def test_most_similar_neighbour_wins(self, index):
+        index.add_many([("STARBUCKS STORE", "COFFEE"), ("STARBUCKS STORES BOSTON", "TRAVEL")])
+        assert index.lookup("STARBUCKS STORES", threshold=0.5) == "COFFEE"
+
+    def test_unresolved_categories_are_not_indexed(self, index):
+        assert index.add_many([("MYSTERY MERCHANT", "INPUT NEEDED")]) == 0
+        assert index.lookup("MYSTERY MERCHANTS") is None
+
+    def test_duplicates_are_indexed_once(self, index):
+        assert index.add_many([("SHELL OIL 1234", "GAS"), ("SHELL OIL 9876", "GAS")]) == 1
+        assert len(index) == 1
+
+    def test_distinct_checks_are_not_neighbours(self, index):
+        assert index.add_many([("CHECK 1234", "RENT"), ("SQ 5531", "PARKING")]) == 0
+        index.add("CHECK DEPOSIT", "INCOME")
+        assert index.lookup("CHECK 5678", threshold=0.0) is None
+
+    def test_persists_between_instances(self, tmp_path):
+        NeighbourIndex(tmp_path / "n.sqlite3").add("STARBUCKS STORE", "COFFEE")
+        assert NeighbourIndex(tmp_path / "n.sqlite3").lookup("STARBUCKS STORES") == "COFFEE"
+
+    def test_each_fingerprint_has_its_own_database(self):
+        assert neighbour_index_path("a" * 64) != neighbour_index_path("b" * 64)
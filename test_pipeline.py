@@ -0,0 +1,67 @@
+"""Unit tests for the overlapped statement pipeline in pipeline.py.
+
+Extraction runs on a thread pool here; the real run uses a process pool.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from pipeline import run_statement_pipeline
+
+PDFS = [f"statement_{i}.pdf" for i in range(6)]
+
+
+def extract(pdf_path):
+    return [["01/02", f"{pdf_path} purchase", -1.0], ["01/03", f"{pdf_path} refund", 1.0]]
+
+
+def categorize(transactions):
+    return [{"description": t[1], "category": "SHOPPING"} for t in transactions]
+
+
+def run(extract=extract, categorize=categorize, write=None, queue_size=2):
+    written = []
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        stats = run_statement_pipeline(PDFS, extract, categorize, write or (lambda pdf, rows: written.append((pdf, rows))),
+                                       queue_size=queue_size, extract_executor=pool)
+    return stats, written
+
+
+class TestRunStatementPipeline:
+    def test_writes_every_statement_in_order(self):
+        _, written = run()
+        assert [pdf for pdf, _ in written] == PDFS
+        assert written[0][1] == categorize(extract(PDFS[0]))
+
+    def test_counts_each_stage(self):
+        stats, _ = run()
+        for stage in (stats.extract, stats.categorize, stats.write):
+            assert (stage.statements, stage.transactions) == (6, 12)
+        assert "categorize 6 statements, 12 transactions" in stats.summary()
+
+    def test_backpressure_bounds_extraction_ahead_of_categorization(self):
+        started = []
+        seen_while_blocked = []
+
+        def tracked_extract(pdf_path):
+            started.append(pdf_path)
+            return extract(pdf_path)
+
+        def slow_categorize(transactions):
+            if not seen_while_blocked:
+                time.sleep(0.2)
+                seen_while_blocked.append(len(started))
+            return categorize(transactions)
+
+        _, written = run(extract=tracked_extract, categorize=slow_categorize, queue_size=1)
+        # the statement being categorized, one queued, one waiting for room
+        assert seen_while_blocked == [3]
+        assert len(written) == len(PDFS)
+
+    def test_stage_failure_is_raised(self):
+        def failing_categorize(transactions):
+            raise ConnectionError("model unavailable")
+
+        with pytest.raises(ConnectionError):
+            run(categorize=failing_categorize)
@@ -0,0 +1,103 @@
+"""Unit tests for the deterministic merchant rules in rules.py."""
+from rules import MerchantIndex, description_items, distinctive_description, normalize_description, parse_category_hints
+
+
+class TestNormalizeDescription:
+    def test_strips_store_numbers_and_location_codes(self):
+        assert normalize_description("Shell Oil 57442 Boston MA") == "SHELL OIL BOSTON MA"
+
+    def test_strips_reference_codes(self):
+        assert normalize_description("AMZN MKTP US*2K4AB1") == normalize_description("AMZN Mktp US*9Q1XY7")
+        assert normalize_description("AMZN MKTP US*2K4AB1") == "AMZN MKTP US"
+
+    def test_strips_dates(self):
+        assert normalize_description("ZELLE TO JOHN 01/15/24 CONF#8812") == "ZELLE TO JOHN CONF"
+
+    def test_keeps_names_with_a_single_digit(self):
+        assert normalize_description("1PASSWORD*SUBSCRIPTION") == "1PASSWORD SUBSCRIPTION"
+        assert normalize_description("STOP & SHOP 0421") == "STOP & SHOP"
+
+
+class TestDistinctiveDescription:
+    def test_keeps_merchant_words(self):
+        assert distinctive_description("Shell Oil 57442 Boston MA") == "SHELL OIL BOSTON MA"
+        assert distinctive_description("AMAZON") == "AMAZON"
+
+    def test_one_token_left_of_a_longer_description_is_dropped(self):
+        assert distinctive_description("CHECK 1234") == ""
+        assert distinctive_description("SQ 5531") == ""
+
+
+class TestParseCategoryHints:
+    def test_single_and_multiple_merchants(self):
+        lines = [
+            "ACME MARKET is a FOOD category.",
+            "GLOBEX PAYROLL and INITECH DIRECT DEP are WAGES category.",
+            "1PASSWORD and APPLE.COM are each a SUBSCRIPTION category.",
+        ]
+        assert parse_category_hints(lines) == [
+            ("ACME MARKET", "FOOD"),
+            ("GLOBEX PAYROLL", "WAGES"),
+            ("INITECH DIRECT DEP", "WAGES"),
+            ("1PASSWORD", "SUBSCRIPTION"),
+            ("APPLE.COM", "SUBSCRIPTION"),
+        ]
+
+    def test_multi_word_categories_use_underscores(self):
+        assert parse_category_hints(["UMBRELLA INSURANCE is an INSURANCE BILL category."]) == [
+            ("UMBRELLA INSURANCE", "INSURANCE_BILL")
+        ]
+
+    def test_free_form_lines_are_ignored(self):
+        assert parse_category_hints(["Treat anything from my landlord as rent"]) == []
+
+
+class TestDescriptionItems:
+    def test_skips_hashed_keys(self):
+        items = [("a" * 64, "GAS"), ("SHELL OIL", "GAS")]
+        assert list(description_items(items)) == [("SHELL OIL", "GAS")]
+
+
+class TestMerchantIndex:
+    def test_longest_prefix_wins(self):
+        index = MerchantIndex()
+        index.add("WHOLE FOODS", "GROCERIES")
+        index.add("WHOLE FOODS CAFE", "FOOD")
+        assert index.lookup("WHOLE FOODS MKT 10250") == "GROCERIES"
+        assert index.lookup("WHOLE FOODS CAFE 8812 PENDING") == "FOOD"
+
+    def test_one_token_merchant_matches_only_exactly(self):
+        index = MerchantIndex()
+        index.add("UBER", "TRANSPORT")
+        index.add("UBER EATS", "FOOD")
+        assert index.lookup("UBER 8812") == "TRANSPORT"
+        assert index.lookup("UBER *TRIP 8812") is None
+        assert index.lookup("UBER EATS 8812 PENDING") == "FOOD"
+
+    def test_generic_first_token_does_not_swallow_other_payments(self):
+        index = MerchantIndex.build([("CHECK 1234", "RENT"), ("SQ 5531", "PARKING")], [])
+        assert index.lookup("CHECK 1042") is None
+        assert index.lookup("SQ *JOES GARAGE 99") is None
+
+    def test_unknown_merchant(self):
+        index = MerchantIndex()
+        index.add("SHELL OIL", "GAS")
+        assert index.lookup("EXXON MOBIL 4411") is None
+
+    def test_conflicting_categories_are_ambiguous(self):
+        index = MerchantIndex()
+        index.add("AMAZON", "SHOPPING")
+        index.add("AMAZON", "GROCERIES")
+        assert index.lookup("AMAZON 1234") is None
+
+    def test_input_needed_is_never_indexed(self):
+        index = MerchantIndex()
+        index.add("MYSTERY SHOP", "INPUT NEEDED")
+        assert len(index) == 0
+
+    def test_build_prefers_cache_over_hints_and_skips_hash_keys(self):
+        cached = [("ACME MARKET 0012", "GROCERIES"), ("a" * 64, "FOOD")]
+        index = MerchantIndex.build(cached, ["ACME MARKET is a FOOD category.", "ATT is a PHONE BILL category."])
+        assert index.lookup("ACME MARKET 7781") == "GROCERIES"
+        assert index.lookup("ATT 0412") == "PHONE_BILL"
+        assert len(index) == 2
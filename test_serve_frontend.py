@@ -1,11 +1,40 @@
-"""Unit tests for the pure diagram-sizing / deep-link helpers in serve_frontend.py.
+"""Unit tests for serve_frontend.py: diagram sizing, deep links and the static server.
 
-These functions only depend on the standard library plus ``lzstring`` — no heavy
-ML dependencies — so they make a good, fast baseline.
+These only depend on the standard library plus ``lzstring`` — no heavy ML
+dependencies — so they make a good, fast baseline.
 """
+import gzip
+import http.client
+import re
+import threading
+
 import lzstring
+import pytest
+
+import serve_frontend
+from flowgraph import FlowGraph
+from serve_frontend import (
+    DiagramFeed,
+    DiagramStore,
+    Handler,
+    StaticAssets,
+    compute_diagram_size,
+    diagram_input,
+    diagram_to_url,
+    make_server,
+    post_diagram,
+    stop_server,
+)
 
-from serve_frontend import compute_diagram_size, diagram_to_url
+
+def serve(handler):
+    """Run ``handler`` on an ephemeral port for the duration of a fixture; yields the port."""
+    httpd = make_server(0, handler)
+    thread = threading.Thread(target=httpd.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True)
+    thread.start()
+    yield httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
 
 
 class TestComputeDiagramSize:
@@ -30,6 +59,14 @@ class TestComputeDiagramSize:
         _, height = compute_diagram_size(diagram)
         assert height <= 2000
 
+    def test_cyclic_diagram_still_gets_a_size(self):
+        # A, B and C land in three columns
+        assert compute_diagram_size("A [10] B\nB [10] A\nB [5] C") == (483, 600)
+
+    def test_graph_is_sized_like_its_text(self):
+        text = "Wages [3000] Budget\nBudget [1200.5] Rent & Utilities\nBudget [600] Food\nFood [200] Take-out"
+        assert compute_diagram_size(FlowGraph.parse(text)) == compute_diagram_size(text)
+
     def test_dimensions_are_ints(self):
         w, h = compute_diagram_size("Wages [3000] Budget\nBudget [1000] Food")
         assert isinstance(w, int) and isinstance(h, int)
@@ -52,3 +89,267 @@ class TestDiagramToUrl:
         assert diagram in decoded
         assert "size w 800" in decoded
         assert "size h 600" in decoded
+
+
+class TestStaticServer:
+    """The in-memory asset server, run on an ephemeral port over a scratch build directory."""
+
+    @pytest.fixture
+    def server(self, tmp_path):
+        (tmp_path / "index.html").write_text('<link href="app.css"><script src="app.js"></script><script src="https://cdn.example/x.js"></script>')
+        (tmp_path / "app.js").write_text("console.log('sankey');\n" * 200)
+        (tmp_path / "app.css").write_text("body {}")
+
+        class ScratchHandler(Handler):
+            assets = StaticAssets(str(tmp_path))
+
+        yield from serve(ScratchHandler)
+
+    def _get(self, port, path, headers=None, method="GET"):
+        connection = http.client.HTTPConnection("localhost", port, timeout=5)
+        connection.request(method, path, headers=headers or {})
+        response = connection.getresponse()
+        body = response.read()
+        connection.close()
+        return response, body
+
+    def test_index_references_versioned_assets(self, server):
+        response, body = self._get(server, "/")
+        assert response.status == 200
+        assert response.getheader("Cache-Control") == "no-cache"
+        assert re.search(rb'src="app\.js\?v=[0-9a-f]{16}"', body)
+        assert re.search(rb'href="app\.css\?v=[0-9a-f]{16}"', body)
+        assert b'src="https://cdn.example/x.js"' in body
+
+    def test_serves_gzip_when_accepted(self, server):
+        response, body = self._get(server, "/app.js", {"Accept-Encoding": "gzip"})
+        assert response.getheader("Content-Encoding") == "gzip"
+        assert gzip.decompress(body) == ("console.log('sankey');\n" * 200).encode()
+        plain, plain_body = self._get(server, "/app.js", {"Accept-Encoding": "gzip;q=0"})
+        assert plain.getheader("Content-Encoding") is None
+        assert len(plain_body) > len(body)
+
+    def test_versioned_assets_are_cached_for_good(self, server):
+        _, index = self._get(server, "/")
+        versioned = re.search(rb'src="(app\.js\?v=[0-9a-f]{16})"', index).group(1).decode()
+        response, _ = self._get(server, "/" + versioned)
+        assert response.getheader("Cache-Control") == "public, max-age=31536000, immutable"
+
+    def test_unknown_versions_are_revalidated(self, server):
+        response, _ = self._get(server, "/app.js?v=abc")
+        assert response.status == 200
+        assert response.getheader("Cache-Control") == "no-cache"
+
+    def test_revalidation_returns_304(self, server):
+        response, _ = self._get(server, "/app.css")
+        etag, last_modified = response.getheader("ETag"), response.getheader("Last-Modified")
+        by_etag, body = self._get(server, "/app.css", {"If-None-Match": etag})
+        assert (by_etag.status, body) == (304, b"")
+        by_date, _ = self._get(server, "/app.css", {"If-Modified-Since": last_modified})
+        assert by_date.status == 304
+        changed, _ = self._get(server, "/app.css", {"If-None-Match": '"stale"'})
+        assert changed.status == 200
+
+    def test_head_and_missing_files(self, server):
+        head, body = self._get(server, "/app.css", method="HEAD")
+        assert (head.status, head.getheader("Content-Length"), body) == (200, "7", b"")
+        missing, _ = self._get(server, "/../../etc/passwd")
+        assert missing.status == 404
+
+
+class TestDiagramStore:
+    def test_ids_are_short_content_hashes(self, tmp_path):
+        store = DiagramStore(spill_dir=str(tmp_path))
+        key = store.put("A [10] B\n")
+        assert re.fullmatch(r"[0-9a-f]{16}", key)
+        assert store.put("A [10] B\n") == key
+        assert store.put("A [11] B\n") != key
+        assert store.get(key) == "A [10] B\n"
+
+    def test_unknown_and_malformed_ids_are_missing(self, tmp_path):
+        store = DiagramStore(spill_dir=str(tmp_path))
+        assert store.get("0123456789abcdef") is None
+        assert store.get("../../etc/passwd") is None
+
+    def test_evicted_diagrams_spill_to_disk_and_come_back(self, tmp_path):
+        store = DiagramStore(capacity=2, spill_dir=str(tmp_path))
+        keys = [store.put(f"A [{i}] B\n") for i in range(4)]
+        assert len(store) == 2
+        assert sorted(path.stem for path in tmp_path.iterdir()) == sorted(keys[:2])
+        assert store.get(keys[0]) == "A [0] B\n"
+        assert len(store) == 2
+        # A fresh store (a restarted server) still finds spilled diagrams
+        assert DiagramStore(spill_dir=str(tmp_path)).get(keys[1]) == "A [1] B\n"
+
+    def test_spill_keeps_only_the_most_recent_files(self, tmp_path):
+        store = DiagramStore(capacity=1, spill_dir=str(tmp_path), spill_limit=3)
+        for i in range(10):
+            store.put(f"A [{i}] B\n")
+        assert len(list(tmp_path.iterdir())) == 3
+
+
+class TestDiagramApi:
+    @pytest.fixture
+    def server(self, tmp_path):
+        class ScratchHandler(Handler):
+            diagrams = DiagramStore(spill_dir=str(tmp_path))
+
+        yield from serve(ScratchHandler)
+
+    def _request(self, port, method, path, body=None, headers=None):
+        connection = http.client.HTTPConnection("localhost", port, timeout=5)
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        data = response.read()
+        connection.close()
+        return response, data
+
+    def test_post_then_fetch_by_id(self, server):
+        diagram = "Wages [3000] Budget\nBudget [1000] Food"
+        url = post_diagram(diagram, port=server, width=800, height=600)
+        key = url.split("?d=", 1)[1]
+        assert url == f"http://localhost:{server}/?d={key}"
+        response, body = self._request(server, "GET", f"/d/{key}")
+        assert response.status == 200
+        assert response.getheader("Content-Type") == "text/plain; charset=utf-8"
+        assert body.decode() == diagram_input(diagram, 800, 600)
+        revalidated, _ = self._request(server, "GET", f"/d/{key}", headers={"If-None-Match": response.getheader("ETag")})
+        assert revalidated.status == 304
+
+    def test_posted_diagram_is_sized_to_fit_by_default(self, server):
+        key = post_diagram("A [10] B", port=server).split("?d=", 1)[1]
+        _, body = self._request(server, "GET", f"/d/{key}")
+        assert body.decode() == "A [10] B\nsize w 400\nsize h 600\n"
+
+    def test_unknown_diagram_is_404(self, server):
+        response, _ = self._request(server, "GET", "/d/0123456789abcdef")
+        assert response.status == 404
+
+    @pytest.mark.parametrize("payload", [b"not json", b'{"width": 10}', b'{"diagram": 5}', b'{"diagram": "A [1] B", "width": "wide"}', b"[1]"])
+    def test_malformed_posts_are_rejected(self, server, payload):
+        response, _ = self._request(server, "POST", "/api/diagrams", body=payload, headers={"Content-Type": "application/json"})
+        assert response.status == 400
+
+    @pytest.mark.parametrize("headers", [{}, {"Content-Type": "text/plain"}, {"Content-Type": "application/x-www-form-urlencoded"}])
+    def test_posts_that_are_not_json_are_415(self, server, headers):
+        response, _ = self._request(server, "POST", "/api/diagrams", body=b'{"diagram": "A [1] B"}', headers=headers)
+        assert response.status == 415
+
+    def test_json_with_charset_is_accepted(self, server):
+        response, _ = self._request(server, "POST", "/api/diagrams", body=b'{"diagram": "A [1] B"}', headers={"Content-Type": "application/json; charset=utf-8"})
+        assert response.status == 201
+
+    def test_oversized_posts_are_rejected(self, server, monkeypatch):
+        monkeypatch.setattr(serve_frontend, "MAX_DIAGRAM_BYTES", 10)
+        with pytest.raises(http.client.HTTPException, match="413"):
+            post_diagram("A [10] B", port=server)
+
+    def test_post_elsewhere_is_404(self, server):
+        response, _ = self._request(server, "POST", "/index.html", body=b"{}")
+        assert response.status == 404
+
+
+def test_server_listens_on_this_machine_only_by_default():
+    with make_server(0) as httpd:
+        assert httpd.server_address[0] == "127.0.0.1"
+
+
+class TestDiagramFeed:
+    def test_publishing_the_shown_diagram_is_a_no_op(self):
+        feed = DiagramFeed()
+        assert feed.publish("a")
+        assert not feed.publish("a")
+        assert feed.publish("b")
+        assert feed.version == 2
+
+    def test_waiters_skip_to_the_latest_diagram(self):
+        feed = DiagramFeed()
+        feed.publish("a")
+        feed.publish("b")
+        assert feed.wait(0, timeout=0) == (2, "b")
+        assert feed.wait(2, timeout=0) == (2, None)
+
+    def test_publish_wakes_a_waiter(self):
+        feed = DiagramFeed()
+        threading.Timer(0.05, feed.publish, args=["a"]).start()
+        assert feed.wait(0, timeout=5) == (1, "a")
+
+    def test_close_ends_waits(self):
+        feed = DiagramFeed()
+        threading.Timer(0.05, feed.close).start()
+        assert feed.wait(0, timeout=5) == (0, None)
+        assert feed.closed
+
+
+class TestLiveEvents:
+    @pytest.fixture
+    def feed(self):
+        feed = DiagramFeed()
+        yield feed
+        feed.close()
+
+    @pytest.fixture
+    def server(self, tmp_path, feed):
+        class ScratchHandler(Handler):
+            diagrams = DiagramStore(spill_dir=str(tmp_path))
+
+        ScratchHandler.feed = feed
+        yield from serve(ScratchHandler)
+
+    @staticmethod
+    def _next_event(response) -> dict:
+        fields = {}
+        while (line := response.fp.readline().decode().rstrip("\n")) or not fields:
+            if line and not line.startswith(":"):
+                name, _, value = line.partition(": ")
+                fields[name] = value
+        return fields
+
+    def test_stream_sends_the_latest_then_each_new_diagram(self, server, feed):
+        first = post_diagram("A [1] B", port=server, publish=True).split("?d=", 1)[1]
+        connection = http.client.HTTPConnection("localhost", server, timeout=5)
+        connection.request("GET", "/events")
+        response = connection.getresponse()
+        assert response.getheader("Content-Type") == "text/event-stream"
+        assert self._next_event(response) == {"event": "diagram", "id": "1", "data": first}
+
+        post_diagram("A [1] B", port=server, publish=True)  # unchanged: not sent again
+        second = post_diagram("A [2] B", port=server, publish=True).split("?d=", 1)[1]
+        assert self._next_event(response) == {"event": "diagram", "id": "2", "data": second}
+        connection.close()
+
+    def test_stopping_the_server_ends_open_streams(self, tmp_path, feed):
+        class ScratchHandler(Handler):
+            diagrams = DiagramStore(spill_dir=str(tmp_path))
+
+        ScratchHandler.feed = feed
+        httpd = make_server(0, ScratchHandler)
+        threading.Thread(target=httpd.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True).start()
+        connection = http.client.HTTPConnection("localhost", httpd.server_address[1], timeout=5)
+        connection.request("GET", "/events")
+        response = connection.getresponse()
+        stop_server(httpd)
+        assert feed.closed
+        assert response.read() == b""  # stream ended rather than timing out
+        connection.close()
+
+    def test_posting_without_publish_leaves_the_feed_alone(self, server, feed):
+        post_diagram("A [1] B", port=server)
+        assert feed.key is None
+
+
+class TestDiagramSizeCache:
+    def test_repeated_diagrams_are_served_from_the_cache(self, monkeypatch):
+        calls = []
+        real = serve_frontend.diagram_size
+        monkeypatch.setattr(serve_frontend, "diagram_size", lambda graph: calls.append(graph) or real(graph))
+        diagram = "Cache [10] Test\nTest [4] Hit"
+        first = compute_diagram_size(diagram)
+        assert compute_diagram_size(diagram) == first
+        assert len(calls) == 1
+
+    def test_cache_is_bounded(self, monkeypatch):
+        monkeypatch.setattr(serve_frontend, "DIAGRAM_SIZE_CACHE_SIZE", 4)
+        for i in range(20):
+            compute_diagram_size(f"Bounded [{i}] Cache")
+        assert len(serve_frontend._size_cache) <= 4
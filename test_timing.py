@@ -0,0 +1,59 @@
+"""Unit tests for the stage timers in timing.py."""
+import pytest
+
+import timing
+
+
+@pytest.fixture(autouse=True)
+def clean_timings():
+    timing.reset()
+    yield
+    timing.enable(False)
+    timing.reset()
+
+
+class TestTimers:
+    def test_disabled_timers_record_nothing(self):
+        @timing.timed()
+        def work():
+            return 42
+
+        assert work() == 42
+        with timing.timer("block"):
+            pass
+        assert timing.stage_stats() == {}
+
+    def test_decorator_counts_calls_under_the_function_name(self):
+        timing.enable()
+
+        @timing.timed()
+        def work(x):
+            return x * 2
+
+        assert [work(i) for i in range(3)] == [0, 2, 4]
+        assert timing.stage_stats()["work"]["count"] == 3
+
+    def test_failed_calls_are_timed_and_reraised(self):
+        timing.enable()
+
+        @timing.timed("flaky")
+        def flaky():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            flaky()
+        assert timing.stage_stats()["flaky"]["count"] == 1
+
+    def test_summary_percentiles(self):
+        for seconds in [0.001 * i for i in range(1, 101)]:
+            timing.record("stage", seconds)
+        stats = timing.stage_stats()["stage"]
+        assert stats["p50"] == pytest.approx(0.050)
+        assert stats["p95"] == pytest.approx(0.095)
+        assert stats["total"] == pytest.approx(5.05)
+        assert "stage" in timing.summary().splitlines()[1]
+
+    def test_stages_sorted_by_total(self):
+        timing.record("fast", 0.1)
+        timing.record("slow", 1.0)
+        assert list(timing.stage_stats()) == ["slow", "fast"]
@@ -49,6 +49,18 @@ class TestCleanNumericAmount:
         assert clean_numeric_amount(float("nan"), self._row()) == 0
 
 
+class TestCleanNumericAmounts:
+    def test_repeated_warnings_are_summarized(self, caplog):
+        df = pd.DataFrame({"raw_transaction": [f"t{i}" for i in range(20)], "amount": [float("nan")] * 20})
+        utils.unconverted_amount_warning.flush()  # drop counts left by clean_numeric_amount tests
+        with caplog.at_level("WARNING", logger="utils"):
+            assert utils.clean_numeric_amounts(df) == [0] * 20
+        messages = [record.getMessage() for record in caplog.records]
+        assert messages[0] == "t0: Float value nan could not be converted"
+        assert len(messages) == utils.unconverted_amount_warning.limit + 1
+        assert messages[-1] == "15 more amounts that could not be converted not shown"
+
+
 class TestExtractDateAndAmount:
     def test_positive_amount(self):
         assert extract_date_and_amount_from_transaction("01/15 STORE 1,234.56") == (
@@ -91,6 +103,43 @@ class TestCountCategories:
         assert data["FOOD"] == 10
         assert "IGNORE" not in data
 
+    def test_totals_are_rounded_after_every_row(self):
+        # A running total rounded per row (half to even): 0 -> round(0.5)=0 -> round(0.5)=0 -> round(1.5)=2
+        df = pd.DataFrame(
+            [
+                {"raw_transaction": "a", "amount": 0.5, "category": "GUM"},
+                {"raw_transaction": "b", "amount": 0.5, "category": "GUM"},
+                {"raw_transaction": "c", "amount": 1.5, "category": "GUM"},
+            ]
+        )
+        assert count_categories(df, {})["GUM"] == 2
+
+    def test_accumulates_into_existing_totals(self):
+        df = pd.DataFrame([{"raw_transaction": "a", "amount": 5.0, "category": "FOOD"}])
+        data = count_categories(df, {"_map": {}, "FOOD": 10})
+        assert data["FOOD"] == 15
+
+    def test_missing_amount_counts_as_zero(self):
+        df = pd.DataFrame(
+            [
+                {"raw_transaction": "a", "amount": float("nan"), "category": "FOOD"},
+                {"raw_transaction": "b", "amount": 3.0, "category": "FOOD"},
+            ]
+        )
+        assert count_categories(df, {})["FOOD"] == 3
+
+    def test_last_parent_wins_and_first_seen_order_is_kept(self):
+        df = pd.DataFrame(
+            [
+                {"raw_transaction": "a", "amount": "1", "category": "NEEDS FOOD"},
+                {"raw_transaction": "b", "amount": "1", "category": "NEEDS RENT"},
+                {"raw_transaction": "c", "amount": "1", "category": "WANTS FOOD"},
+            ]
+        )
+        data = count_categories(df, {})
+        assert list(data["_map"].items()) == [("FOOD", "WANTS"), ("RENT", "NEEDS")]
+        assert list(data) == ["_map", "NEEDS", "FOOD", "RENT", "WANTS"]
+
 
 class TestLoadLocalCategoryHints:
     def test_missing_file_returns_empty(self, monkeypatch, tmp_path):
@@ -106,3 +155,37 @@ class TestLoadLocalCategoryHints:
         assert "GLOBEX is a WAGES category." in result
         assert "#" not in result
         assert result.endswith(" ")
+
+
+class TestDocumentConverter:
+    def test_converter_is_created_once_and_reused(self, monkeypatch):
+        created = []
+        monkeypatch.setattr(utils, "_document_converter", None)
+        monkeypatch.setattr(utils, "DocumentConverter", lambda: created.append(object()) or created[-1])
+        first = utils.get_document_converter()
+        assert utils.get_document_converter() is first
+        assert len(created) == 1
+
+
+class TestLoadPdfsAsDataframes:
+    def test_only_uncached_pdfs_are_converted_in_one_batch(self, monkeypatch):
+        cached = {"a.pdf": [pd.DataFrame({"x": [1]})]}
+        stored = {}
+        batches = []
+
+        class FakeConverter:
+            def convert_all(self, paths):
+                batches.append(list(paths))
+                return [SimpleNamespace(path=p) for p in paths]
+
+        monkeypatch.setattr(utils, "cached_dataframes", cached.get)
+        monkeypatch.setattr(utils, "store_dataframes", stored.__setitem__)
+        monkeypatch.setattr(utils, "get_document_converter", FakeConverter)
+        monkeypatch.setattr(utils, "statement_tables", lambda conv_res: [pd.DataFrame({"path": [conv_res.path]})])
+
+        results = utils.load_pdfs_as_dataframes(["b.pdf", "a.pdf", "c.pdf"])
+
+        assert batches == [["b.pdf", "c.pdf"]]
+        assert [r[0].columns[0] for r in results] == ["path", "x", "path"]
+        assert results[2][0]["path"][0] == "c.pdf"
+        assert set(stored) == {"b.pdf", "c.pdf"}
@@ -0,0 +1,95 @@
+"""
+Per-stage wall-clock timers for profiling a run.
+
+Stages are timed with the ``timed`` decorator or the ``timer`` context
+manager. Both do nothing until ``enable()`` is called, so instrumented code
+costs one flag check in a normal run. ``summary()`` reports the count, total,
+p50 and p95 of every stage. Timings are kept per process: work done in a
+process pool is not included.
+"""
+
+import functools
+import math
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+_enabled = False
+_lock = threading.Lock()
+_timings: dict[str, list[float]] = defaultdict(list)
+
+
+def enable(enabled: bool = True) -> None:
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset() -> None:
+    with _lock:
+        _timings.clear()
+
+
+def record(stage: str, seconds: float) -> None:
+    with _lock:
+        _timings[stage].append(seconds)
+
+
+@contextmanager
+def timer(stage: str):
+    """Time the enclosed block as one call of ``stage``."""
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def timed(stage: str | None = None):
+    """Decorator timing every call of the function as ``stage`` (default: the function's name)."""
+    def decorator(func):
+        name = stage or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of ``values``."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def stage_stats() -> dict[str, dict[str, float]]:
+    """Return {stage: {count, total, p50, p95}} in seconds, slowest total first."""
+    with _lock:
+        snapshot = {stage: list(values) for stage, values in _timings.items()}
+    stats = {
+        stage: {"count": len(values), "total": sum(values), "p50": percentile(values, 0.5), "p95": percentile(values, 0.95)}
+        for stage, values in snapshot.items() if values
+    }
+    return dict(sorted(stats.items(), key=lambda item: item[1]["total"], reverse=True))
+
+
+def summary() -> str:
+    """Per-stage table of count, total, p50 and p95. Nested stages are included in their callers' totals."""
+    lines = [f"{'stage':<32} {'count':>7} {'total s':>10} {'p50 ms':>10} {'p95 ms':>10}"]
+    for stage, stats in stage_stats().items():
+        lines.append(f"{stage:<32} {stats['count']:>7} {stats['total']:>10.3f} {stats['p50'] * 1000:>10.2f} {stats['p95'] * 1000:>10.2f}")
+    return "\n".join(lines)
@@ -7,16 +7,32 @@ import re
 import os
 import glob
 import math
+import logging
 from pprint import pprint
 
-from memo import memoize_dataframe_to_file 
+from memo import memoize_dataframe_to_file, cached_dataframes, store_dataframes
+from flowgraph import FlowGraph, format_amount
+from logs import RepeatedWarning
+from timing import timed
 
-@memoize_dataframe_to_file
-def load_pdf_as_dataframes(pdf_path: str) -> list[pd.DataFrame]: 
-    print(f"Reading file '{pdf_path}'")    
+logger = logging.getLogger(__name__)
+
+# Docling loads its layout and table-structure models when a converter is
+# built, so one converter is shared by every PDF in the process.
+_document_converter: DocumentConverter | None = None
+
+
+def get_document_converter() -> DocumentConverter:
+    """Return the process-wide Docling converter, creating it on first use."""
+    global _document_converter
+    if _document_converter is None:
+        _document_converter = DocumentConverter()
+    return _document_converter
+
+
+def statement_tables(conv_res) -> list[pd.DataFrame]:
+    """Return the tables of a Docling conversion result that look like transaction listings."""
     dataframes: list[pd.DataFrame] = []
-    converter = DocumentConverter()
-    conv_res = converter.convert(pdf_path)
     for table_ix, table in enumerate(conv_res.document.tables):
         table_df: pd.DataFrame = table.export_to_dataframe()
         full_table_text = table_df.to_markdown().lower()
@@ -28,10 +44,37 @@ def load_pdf_as_dataframes(pdf_path: str) -> list[pd.DataFrame]:
                 or 'balance' in full_table_text)):
             dataframes.append(table_df)
         else:
-            print(f"Skipping table {table_ix} (invalid columns):\n {full_table_text[0:100]}...")
+            logger.debug("Skipping table %d (invalid columns):\n %s...", table_ix, full_table_text[0:100])
     return dataframes
 
 
+@timed("load_pdf_as_dataframes")
+@memoize_dataframe_to_file
+def load_pdf_as_dataframes(pdf_path: str) -> list[pd.DataFrame]: 
+    logger.info("Reading file '%s'", pdf_path)
+    conv_res = get_document_converter().convert(pdf_path)
+    return statement_tables(conv_res)
+
+
+@timed()
+def load_pdfs_as_dataframes(pdf_paths: list[str]) -> list[list[pd.DataFrame]]:
+    """
+    Load the transaction tables of several PDFs, in the order given.
+
+    Cached statements are read from the memo cache; the rest are handed to
+    Docling together with ``convert_all`` so they share one converter and its
+    batching, and are memoized as they finish.
+    """
+    results = {pdf_path: cached_dataframes(pdf_path) for pdf_path in pdf_paths}
+    misses = [pdf_path for pdf_path, dataframes in results.items() if dataframes is None]
+    if misses:
+        logger.info("Reading %d files: %s", len(misses), ", ".join(misses))
+        for pdf_path, conv_res in zip(misses, get_document_converter().convert_all(misses)):
+            results[pdf_path] = statement_tables(conv_res)
+            store_dataframes(pdf_path, results[pdf_path])
+    return [results[pdf_path] for pdf_path in pdf_paths]
+
+
 def load_pdf(pdf_path) -> list[Document]:
     """
     Loads a PDF file and returns its content as PyPDFLoader documents.
@@ -59,12 +102,13 @@ def all_csvs_in_folder(folder_path) -> list[str]:
 
 
 
-def export_to_csv(data: dict, output_path: str) -> None:
+def export_to_csv(data: list[dict] | pd.DataFrame, output_path: str) -> None:
     """
     Exports data to a CSV file at the given path.
 
     Args:
-        data (list): A list of dictionaries, where each dictionary contains a transaction and its category.
+        data (list | DataFrame): A list of dictionaries, where each dictionary contains a transaction and its category,
+            or a DataFrame with one row per transaction.
         output_path (str): The path to which the CSV file will be written.
 
     Returns:
@@ -85,29 +129,33 @@ def read_csv(csv_path: str):
     except pd.errors.EmptyDataError:
         return pd.DataFrame()
 
+# "could not be converted" fires once per bad row; see clean_numeric_amounts
+unconverted_amount_warning = RepeatedWarning(logger, "amounts that could not be converted")
+
+
 def clean_numeric_amount(value: any, row: pd.Series):
     try:
         if isinstance(value, str):
              # Handle non-string values
             converted = float(value.replace(',', ''))
             if math.isnan(converted):
-                print(f"{row.raw_transaction}: Value {value} could not be converted")
+                unconverted_amount_warning("%s: Value %s could not be converted", row.raw_transaction, value)
                 return 0
             return converted
         elif isinstance(value, float):
             if math.isnan(value):
-                print(f"{row.raw_transaction}: Float value {value} could not be converted")
+                unconverted_amount_warning("%s: Float value %s could not be converted", row.raw_transaction, value)
                 return 0
             return value
         elif isinstance(value, int):
             if math.isnan(value):
-                print(f"{row.raw_transaction}: Integer value {value} could not be converted")
+                unconverted_amount_warning("%s: Integer value %s could not be converted", row.raw_transaction, value)
                 return 0
             return value
-        print(f"{row.raw_transaction}: Value {value} could not be converted")
+        unconverted_amount_warning("%s: Value %s could not be converted", row.raw_transaction, value)
         return 0 
     except AttributeError: 
-        print(f"{row.raw_transaction}: Error converting {value}") 
+        unconverted_amount_warning("%s: Error converting %s", row.raw_transaction, value)
         return 0
 
 
@@ -115,64 +163,92 @@ def clean_numeric_amount(value: any, row: pd.Series):
 # These categories are never subcategories
 IGNORE_CATEGORY = ["IGNORE", "BANKING", "INTEREST", "INVESTMENT","VENMO_PAYMENT", "CASHOUT", "CREDIT_CARD_PAYMENT", "BANK_TRANSFER"]
 
+def clean_numeric_amounts(csv_df: pd.DataFrame) -> list:
+    """
+    Column-wise clean_numeric_amount over csv_df.amount, with the same values and warnings.
+
+    Numeric columns (the usual case for CSVs we wrote) are handled without any
+    per-row Python; other columns fall back to clean_numeric_amount per value.
+    Only the first few warnings are logged, then a count of the rest.
+    """
+    amounts = csv_df["amount"]
+    try:
+        if pd.api.types.is_numeric_dtype(amounts):
+            missing = amounts.isna()
+            if missing.any() and logger.isEnabledFor(logging.WARNING):
+                for row in csv_df[missing].itertuples():
+                    unconverted_amount_warning("%s: Float value %s could not be converted", row.raw_transaction, row.amount)
+            return amounts.where(~missing, 0).tolist()
+        return [clean_numeric_amount(row.amount, row) for row in csv_df.itertuples()]
+    finally:
+        unconverted_amount_warning.flush()
+
+
+@timed()
 def count_categories(csv_df: pd.DataFrame, data: dict | None = None):
     """
     Takes a pandas DataFrame (csv_df) with columns for amount and category and updates a dictionary (data) with the total amount for each category.
     The dictionary is expected to have an additional key "_map" which is a dictionary mapping subcategories to categories.
     The function returns the updated dictionary.
+
+    A category like "FOOD RESTAURANTS" counts towards every level of the path.
+    Totals are rounded after every row, exactly as a running per-row sum would be,
+    so splitting a frame into several calls gives the same result as one call.
     """
     if data is None:
         data = {}
     if "_map" not in data:
         data["_map"] = {}
     # expected to have an amount column and a category column
-    for _, row in csv_df.iterrows():
-        category = row.category
-        if category in IGNORE_CATEGORY:
-            continue
-        amount = clean_numeric_amount(row.amount, row)
-        categories = row.category.split(" ")
-        previous_category = None
-        for sub_category in categories:
-            if previous_category is not None: 
-                # map parent category to subcategory
-                data["_map"][sub_category] = previous_category
-            previous_category = sub_category
-            if sub_category in data:
-                data[sub_category] += amount
-            else:
-                data[sub_category] = amount
-            data[sub_category] = round(data[sub_category]) # round to highest number
+    rows = csv_df[~csv_df["category"].isin(IGNORE_CATEGORY) & csv_df["category"].notna()].reset_index(drop=True)
+    if rows.empty:
+        return data
+    # One entry per (row, level) of each category path, in row order.
+    levels = pd.DataFrame({
+        "category": rows["category"].str.split(" "),
+        "amount": clean_numeric_amounts(rows),
+    }).explode("category")
+    for sub_category, amounts in levels.groupby("category", sort=False)["amount"]:
+        total = data.get(sub_category, 0)
+        for amount in amounts.tolist():
+            total = round(total + amount) # round to highest number
+        data[sub_category] = total
+    # map each subcategory to its parent: first occurrence fixes the key order,
+    # the last occurrence wins, as with a row-by-row update
+    levels["parent"] = levels.groupby(level=0)["category"].shift()
+    pairs = levels[levels["parent"].notna()]
+    last_parent = pairs.drop_duplicates("category", keep="last").set_index("category")["parent"]
+    for sub_category in pairs["category"].drop_duplicates():
+        data["_map"][sub_category] = last_parent[sub_category]
     return data
 
-def sort_budget(budget_data: list, meta: dict):
-    pattern = re.compile(r"(\w+(?: \w+)*) \[(\d+)\](?: (\w+))?")
-    parsed_data = [
-        (match.group(1), int(match.group(2)), match.group(3) or "")
-        for match in pattern.finditer(budget_data)
-    ]
-
+def sort_budget(budget: FlowGraph, meta: dict) -> FlowGraph:
+    """
+    The flows in display order, with fmt_capitalize'd node names: sub-categories
+    sort under their parent, everything else by source and amount, and the
+    Savings flow comes last. Zero and negative flows are dropped.
+    """
     # Sort the data by the numeric value (amount)
-    # sorted_budget = sorted(parsed_data, key=lambda x: x[1])
+    # sorted_budget = sorted(budget.flows(), key=lambda x: x[1])
     # or sort by category & name
-    sorted_budget = sorted(parsed_data, key=lambda x: meta[x[0]] if x[0] in meta else f"{x[0]} {x[1]}")
+    sorted_budget = sorted(budget.flows(), key=lambda x: meta[x[0]] if x[0] in meta else f"{x[0]} {format_amount(x[1])}")
 
-
-    result = ""
-    # Print the sorted data
+    result = FlowGraph()
     for item in sorted_budget:
-        if(item[1] == 0):
-            print(f"ERROR: zero value for {item[2]} ({item[0]}): skipping")
+        if item[1] == 0:
+            logger.warning("Zero value for %s (%s): skipping", item[2], item[0])
+            continue
+        if item[1] < 0:
+            logger.warning("Negative value for %s (%s): skipping", item[2], item[0])
             continue
         if item[0] == 'Overbudget' or item[2] == 'Savings':
             # we always append these to the end
             continue
-        result += f"{fmt_capitalize(item[0])} [{item[1]}] {fmt_capitalize(item[2])}\n"
+        result.add(fmt_capitalize(item[0]), item[1], fmt_capitalize(item[2]))
     for item in sorted_budget:
         if item[0] == 'Overbudget' or item[2] == 'Savings':
-            result += f"{fmt_capitalize(item[0])} [{item[1]}] {fmt_capitalize(item[2])}\n"
+            result.add(fmt_capitalize(item[0]), item[1], fmt_capitalize(item[2]))
             break
-    print('\n\n')
     return result
 
 INCOME_CATEGORIES = ["WAGES", "INCOME", "ZUS", "ZUS_CREDIT", "SALARY", "TAKE_HOME_PAY"]
@@ -191,9 +267,16 @@ def fmt_capitalize(with_underscores: str):
     return " ".join(word.capitalize() for word in words)
 
 # Outputs all categories as a sankeymatic string
+@timed()
+def fmt_sankeymatic(data: dict) -> str:
+    return sankey_graph(data).to_text()
+
+
+# Builds the flow graph of all categories
 # WAGES is a special category that we feed into budget
 # All other categories are considered expenses coming out of budget
-def fmt_sankeymatic(data: dict):
+@timed()
+def sankey_graph(data: dict) -> FlowGraph:
     """   
     Wages [1500] Budget
     Other [250] Budget
@@ -222,57 +305,56 @@ def fmt_sankeymatic(data: dict):
         if parent not in INCOME_CATEGORIES and sub in data:
             expense_sub_totals[parent] = expense_sub_totals.get(parent, 0) + data[sub]
 
-    sankeymatic_str = ""
+    graph = FlowGraph()
     for category, amount in data.items():
         if category in subcategories.keys():
-            print(f"Skipping subcategory {category}")
+            logger.debug("Skipping subcategory %s", category)
             continue
-        print(f"Processing category {category} with amount {amount}")
+        logger.debug("Processing category %s with amount %s", category, amount)
         if category in INCOME_CATEGORIES and amount != 0:
             wages_total += amount
             # Suppress only the WAGES→Wages self-loop; all other income categories
             # (including aggregators like ZUS) should still emit a flow into Wages.
             if fmt_capitalize(category) != "Wages":
-                sankeymatic_str += f"{category} [{amount}] Wages\n"
+                graph.add(category, amount, "Wages")
         else:
             if amount <= 0:
                 # Negative/zero net amounts (refunds that exceed purchases) would be dropped
-                # by sort_budget's positive-integer regex, silently inflating savings.
+                # by sort_budget, silently inflating savings.
                 # Skip them entirely so total_expenses stays in sync with Sankey output.
-                print(f"Skipping non-positive expense {category}: {amount}")
+                logger.info("Skipping non-positive expense %s: %s", category, amount)
                 continue
             # For parent nodes, sum their registered subcategories instead of
             # relying on the accumulated data value, so Budget flows are always
             # grounded in the actual sub-category hierarchy.
             effective = expense_sub_totals.get(category, amount)
             total_expenses += effective
-            sankeymatic_str += f"Budget [{effective}] {category}\n"
-    sankeymatic_str += "\n\n # TOTALS"
-    sankeymatic_str += f"\nWages [{wages_total}] Budget\n"
+            graph.add("Budget", effective, category)
+    # TOTALS
+    graph.add("Wages", wages_total, "Budget")
     # Both savings and overspending are outflows from Budget (right side),
     # keeping Budget's left side as income only.
     if total_expenses > wages_total:
-        sankeymatic_str += f"\nBudget [{total_expenses - wages_total}] Overspending\n"
+        graph.add("Budget", total_expenses - wages_total, "Overspending")
     if total_expenses < wages_total:
-        sankeymatic_str += f"\nBudget [{wages_total - total_expenses}] Savings\n"
+        graph.add("Budget", wages_total - total_expenses, "Savings")
     # go through the subcategories in _map
     for subcategory, category in subcategories.items():
         if subcategory in data and data[subcategory] != 0:
             if category in INCOME_CATEGORIES:
                 # Sub is a paycheck source flowing INTO an income aggregator (e.g. ZUS)
-                sankeymatic_str += f"\n{subcategory} [{data[subcategory]}] {category}\n"
+                graph.add(subcategory, data[subcategory], category)
             else:
-                sankeymatic_str += f"\n{category} [{data[subcategory]}] {subcategory}\n"
+                graph.add(category, data[subcategory], subcategory)
     # For expense parent nodes, emit a "direct" flow for any spend that has no sub-category.
     # This keeps the Needs/Wants nodes balanced (inflow == outflow), analogous to Wages.
-    # Use underscore suffix so sort_budget's single-word regex captures it correctly
-    # (fmt_capitalize will render NEEDS_DIRECT → "Needs Direct").
+    # fmt_capitalize will render NEEDS_DIRECT → "Needs Direct".
     for parent, sub_total in expense_sub_totals.items():
         if parent in data:
             direct = data[parent] - sub_total
             if direct > 0:
-                sankeymatic_str += f"\n{parent} [{direct}] {parent}_DIRECT\n"
-    return sort_budget(sankeymatic_str, subcategories)
+                graph.add(parent, direct, f"{parent}_DIRECT")
+    return sort_budget(graph, subcategories)
 
 
 
@@ -287,6 +369,9 @@ UNCERTAINTY = "If you are less than 100 percent certain of the category, return
 ONLY_PRINT_CATEGORY = "Print no other text than the category. "
 CATEGORY_SINGLE_WORD = "Categories must be single words whenver possible and as short as possible ('HOTEL', not 'HOTEL ACCOMODATION'). "
 CATEGORY_UPPERCASE = "Categories must be in UPPERCASE. "
+# Batch mode: several transactions go in one numbered list through TRANSACTION_PARAM
+BATCH_CATEGORY_PROMPT = "Categorize each of the following numbered transactions, for example STOP & SHOP are Groceries and SHELL OIL is Gas. "
+ONLY_PRINT_NUMBERED_CATEGORIES = "Print exactly one line per transaction, in the same order, formatted as '<number>. <category>', and no other text. "
 
 
 # Personal categorization hints (merchant / payee / payroll names) are kept out
@@ -296,6 +381,15 @@ CATEGORY_UPPERCASE = "Categories must be in UPPERCASE. "
 LOCAL_CATEGORY_HINTS_FILE = "category_hints.local.txt"
 
 
+def read_local_category_hint_lines() -> list[str]:
+    """Return the non-blank, non-comment lines of the local hints file (``[]`` when absent)."""
+    try:
+        with open(LOCAL_CATEGORY_HINTS_FILE, encoding="utf-8") as f:
+            return [ln.strip() for ln in f if ln.strip() and not ln.lstrip().startswith("#")]
+    except FileNotFoundError:
+        return []
+
+
 def load_local_category_hints() -> str:
     """Return user-specific categorization hints from a gitignored local file.
 
@@ -304,12 +398,7 @@ def load_local_category_hints() -> str:
     categorization prompt. Returns ``""`` when the file is absent, so the tool
     runs without any local config.
     """
-    try:
-        with open(LOCAL_CATEGORY_HINTS_FILE, encoding="utf-8") as f:
-            lines = [ln.strip() for ln in f if ln.strip() and not ln.lstrip().startswith("#")]
-    except FileNotFoundError:
-        return ""
-    text = " ".join(lines)
+    text = " ".join(read_local_category_hint_lines())
     return f"{text} " if text else ""
 
 
@@ -330,7 +419,7 @@ def extract_date_and_amount_from_transaction(text: str):
         leading_date = match.group(1)
         trailing_amount = match.group(2)
         return (leading_date, trailing_amount)
-    print(f"Could not extract date or amount from text: '{text}'")
+    logger.warning("Could not extract date or amount from text: '%s'", text)
     return None
 
 